@@ -0,0 +1,137 @@
+"""Sequential evaluation, which stops sending documents to an analyzer as soon
+as its rank by accuracy among the other analyzers is settled
+"""
+
+import math
+import random
+import logging
+
+from scheduler import SKIPPED
+from scores import LABEL_CODES
+
+LOGGER = logging.getLogger('APICompare.Adaptive')
+
+# the number of documents between checks of the ranking
+CHECK_EVERY = 100
+# the number of documents an analyzer processes before it can be retired
+MIN_DOCS = 100
+
+
+def shuffle_docs(docs, stratify=False, seed=None):
+    """Read all documents and put them in random order, so that every prefix
+    of the documents is a random sample of them.
+    :param stratify: interleave the documents of each gold label, so that
+    every prefix also has about the same proportion of labels as the whole
+    :return: a list of (doc_id, text, key) tuples
+    """
+    rng = random.Random(seed)
+    docs = list(docs)
+    rng.shuffle(docs)
+    if not stratify:
+        return docs
+    groups = {}
+    for doc in docs:
+        groups.setdefault(doc[2], []).append(doc)
+    # spread the documents of each label evenly over the order
+    positions = []
+    for group in groups.values():
+        for i, doc in enumerate(group):
+            positions.append(((i + rng.random()) / len(group), doc))
+    positions.sort(key=lambda position: position[0])
+    return [doc for _, doc in positions]
+
+
+class SequentialRanking:
+    """Running accuracy of each analyzer with Hoeffding confidence bounds.
+
+    The bounds are checked every check_every documents; the error
+    probability is split among the analyzers and among the checks, so the
+    bounds hold at all checks at once with the given confidence and looking
+    at them repeatedly does not inflate the error. The rank of an analyzer
+    is settled once its bounds are apart from the bounds of every other
+    analyzer, after which its bounds are no longer updated.
+    """
+
+    def __init__(self, names, confidence=0.95, check_every=CHECK_EVERY,
+                 min_docs=MIN_DOCS):
+        self.names = list(names)
+        self.error = 1.0 - confidence
+        self.check_every = check_every
+        self.min_docs = min_docs
+        self.hits = dict((name, 0) for name in self.names)
+        self.counts = dict((name, 0) for name in self.names)
+        # analyzer names to their bounds when their rank was settled
+        self.settled = {}
+        self.num_docs = 0
+        self.checks = 0
+
+    def add(self, labels, key):
+        """Count the labels assigned to a document, and check the ranking
+        every check_every documents.
+        :param labels: a dict of analyzer names to labels
+        :param key: the gold standard label of the document
+        :return: a list of the analyzers whose rank was settled
+        """
+        if key not in LABEL_CODES:
+            return []
+        for name in self.names:
+            label = labels[name]
+            if label == SKIPPED or name in self.settled:
+                continue
+            self.counts[name] += 1
+            if label == key:
+                self.hits[name] += 1
+        self.num_docs += 1
+        if self.num_docs % self.check_every:
+            return []
+        return self.check()
+
+    def accuracy(self, name):
+        return self.hits[name] / float(max(self.counts[name], 1))
+
+    def bounds(self, name):
+        """:return: the lower and upper confidence bound of the accuracy
+        """
+        if name in self.settled:
+            return self.settled[name]
+        count = self.counts[name]
+        if not count or not self.checks:
+            return 0.0, 1.0
+        error = self.error / (len(self.names) * self.checks *
+                              (self.checks + 1))
+        radius = math.sqrt(math.log(2 / error) / (2 * count))
+        accuracy = self.accuracy(name)
+        return max(accuracy - radius, 0.0), min(accuracy + radius, 1.0)
+
+    def check(self):
+        """:return: a list of the analyzers whose rank was settled
+        """
+        self.checks += 1
+        bounds = dict((name, self.bounds(name)) for name in self.names)
+        settled = []
+        for name in self.names:
+            if name in self.settled or self.counts[name] < self.min_docs:
+                continue
+            low, high = bounds[name]
+            if all(high < bounds[other][0] or low > bounds[other][1]
+                   for other in self.names if other != name):
+                settled.append(name)
+        for name in settled:
+            self.settled[name] = bounds[name]
+            LOGGER.info("The rank of %s is settled after %d documents" %
+                        (name, self.counts[name]))
+        return settled
+
+    def format(self):
+        """Format a table of the analyzers ranked by accuracy
+        """
+        lines = ["%-15s%-12s%-17s%-11s%s" % ('Analyzer', 'Accuracy',
+                                             'Bounds', 'Documents',
+                                             'Settled')]
+        ranked = sorted(self.names, key=lambda name: -self.accuracy(name))
+        for name in ranked:
+            low, high = self.bounds(name)
+            lines.append("%-15s%-12.3f%.3f - %.3f    %-11d%s" % (
+                name, self.accuracy(name), low, high, self.counts[name],
+                'yes' if name in self.settled else 'no'))
+        return '\n'.join(lines)
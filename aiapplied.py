@@ -7,6 +7,8 @@ LOGGER = logging.getLogger('APICompare.AIApplied')
 
 class AIApplied(API):
 
+    batch_size = 100
+
     def __init__(self, api_key, language="en"):
         self.name = "AIApplied"
         self.api_key = api_key
@@ -32,9 +34,9 @@ class AIApplied(API):
         else:
             return '0'
 
-    def analyse(self, text):
-        """Assign the sentiment label for the text.
-        :return label: +, -, or 0
+    def get_request(self, texts):
+        """Build the request parameters for a list of texts, using their
+        positions in the list as ids
         """
         request = {"data": {
                             "api_key": self.api_key,
@@ -45,13 +47,47 @@ class AIApplied(API):
                                         {
                                             "text": text,
                                             "language_iso": self.language,
-                                            "id": 0
+                                            "id": doc_id
                                         }
+                                        for doc_id, text in enumerate(texts)
                                     ]
                                 }
                             }
             }
-        params = {'request': json.dumps(request)}
-        data = self.get_data(params)
+        return {'request': json.dumps(request)}
+
+    def analyse_with_score(self, text):
+        """Assign the sentiment label for the text.
+        :return label: +, -, or 0
+        :return score: the raw score the label is based on, None as the API only
+        returns a class
+        """
+        params = self.get_request([text])
+        data = self.get_data(params, text=text)
         LOGGER.debug("Got response: %r" % data)
-        return self.extract_label(data["response"]["data"][0]['sentiment_class'])
+        label = self.extract_label(data["response"]["data"][0]['sentiment_class'])
+        return label, None
+
+    def fetch_batch(self, texts):
+        """Send the texts in one request and split the response into
+        responses for individual texts
+        """
+        data = self.get_data(self.get_request(texts))
+        LOGGER.debug("Got response: %r" % data)
+        id2doc = dict((doc['id'], doc) for doc in data["response"]["data"])
+        return [{"response": {"data": [id2doc[doc_id]]}}
+                for doc_id in range(len(texts))]
+
+    def analyse_batch(self, texts):
+        """Assign sentiment labels for a list of texts.
+        :return labels: a list of +, -, or 0
+        """
+        return [label for label, _ in self.analyse_batch_with_scores(texts)]
+
+    def analyse_batch_with_scores(self, texts):
+        """Assign sentiment labels for a list of texts.
+        :return: a list of (label, raw score) tuples
+        """
+        responses = self.get_batch_data(texts, self.fetch_batch)
+        return [(self.extract_label(data["response"]["data"][0]['sentiment_class']),
+                 None) for data in responses]
@@ -2,26 +2,142 @@
 """
 
 import urllib
-import urllib2
+import urlparse
 import json
+import logging
+
+from breaker import RETRIES, THRESHOLD, RESET_AFTER
+from budget import METERS
+from cache import cached, cached_batch
+from deadline import run_with_deadline, HEDGE_QUANTILE, HEDGE_MIN_CALLS
+from instrument import INSTRUMENTS
+from pool import POOLS, POOL_SIZE, TIMEOUT, HTTPError
+from ratelimit import LIMITERS, BACKOFF_STATUSES
+
+LOGGER = logging.getLogger('APICompare.API')
 
 
 class API:
 
+    # a ResponseCache shared by the analyzers, if any
+    cache = None
+    # the maximum number of documents sent in one request by analyzers that
+    # implement analyse_batch(texts)
+    batch_size = 1
+    # the number of requests to the API that are sent concurrently
+    concurrency = 4
+    # the maximum number of open connections to the host of the API
+    pool_size = POOL_SIZE
+    # socket timeout, in seconds
+    timeout = TIMEOUT
+    # the number of calls allowed per number of seconds, as a
+    # (calls, seconds) tuple, or None if there is no limit
+    rate_limit = None
+    # the number of times a request is repeated if the API is overloaded
+    max_retries = 3
+    # the number of seconds after which a document is given up on and its
+    # output is a timeout, or None to wait for as long as it takes
+    deadline = None
+    # send a duplicate of a request that takes longer than most requests to
+    # the API and take the first response; only for APIs where repeating a
+    # request is harmless
+    hedge = False
+    # the number of times a call that failed with a transient error is
+    # repeated, the number of consecutive failures after which documents
+    # are skipped, and the seconds between probes of the API until it works
+    # again, see breaker.py
+    transient_retries = RETRIES
+    circuit_threshold = THRESHOLD
+    circuit_reset = RESET_AFTER
+    # the maximum number of characters the API accepts in a document, longer
+    # documents are split into chunks, or None if there is no limit, and how
+    # the outputs for the chunks are combined, see chunking.py
+    max_length = None
+    chunk_strategy = 'mean'
+    # the number of calls to the API allowed in a run, or None if there is
+    # no limit, and the price of a call, see budget.py
+    quota = None
+    cost = 0.0
+
     def __init__(self):
         self.name = None
         self.url = None
 
-    def get_data(self, params, headers=None):
-        """Send a POST request, get a JSON response and return the data
+    def cache_settings(self):
+        """The settings of the analyzer that affect its responses
+        """
+        return {'language': getattr(self, 'language', None),
+                'domain': getattr(self, 'domain', None)}
+
+    def analyse(self, text):
+        """Assign the sentiment label for the text.
+        :return label: +, -, or 0
+        """
+        return self.analyse_with_score(text)[0]
+
+    def get_data(self, params, headers=None, text=None):
+        """Send a POST request, get a JSON response and return the data.
+        If the text is given, the response for it is looked up in the cache
+        first.
+        """
+        if text is None:
+            return self._get_data(params, headers)
+        return cached(self, text, lambda: self._get_data(params, headers))
+
+    def get_batch_data(self, texts, fetch):
+        """Return the responses for each of the texts, calling fetch(texts)
+        for those that are not in the cache.
+        """
+        return cached_batch(self, texts, fetch)
+
+    def hedge_delay(self):
+        """The number of seconds after which a request is hedged, None if
+        it is not hedged
+        """
+        if not self.hedge:
+            return None
+        return INSTRUMENTS.quantile(self.name, HEDGE_QUANTILE, HEDGE_MIN_CALLS)
+
+    def _get_data(self, params, headers=None):
+        """Send the request over a pooled keep-alive connection
         """
-        if not headers:
-            headers = {}
-        opener = urllib2.build_opener(urllib2.HTTPHandler)
-        request = urllib2.Request(self.url, urllib.urlencode(params),
-                                  headers=headers)
-        response = opener.open(request)
-        opener.close()
-        contents = response.read()
+        request_headers = {'Content-Type': 'application/x-www-form-urlencoded',
+                           'Connection': 'keep-alive'}
+        if headers:
+            request_headers.update(headers)
+        url = urlparse.urlsplit(self.url)
+        path = url.path or '/'
+        if url.query:
+            path += '?' + url.query
+        pool = POOLS.get(url.scheme, url.netloc, self.pool_size, self.timeout)
+        limiter = LIMITERS.get(self)
+        body = urllib.urlencode(params)
+
+        def send():
+            METERS.charge(self)
+            with INSTRUMENTS.call(self.name) as call:
+                call.sent = len(body)
+                response = pool.request('POST', path, body, request_headers)
+                call.status = response[0]
+                call.received = len(response[2])
+            return response
+
+        def send_hedge():
+            limiter.acquire()
+            INSTRUMENTS.hedge(self.name)
+            return send()
+
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire()
+            status, reason, contents = run_with_deadline(
+                send, hedge_after=self.hedge_delay(), hedge=send_hedge)
+            if status not in BACKOFF_STATUSES or attempt == self.max_retries:
+                break
+            LOGGER.warning("%s responded with %d %s" % (self.name, status, reason))
+            INSTRUMENTS.retry(self.name)
+            limiter.backoff()
+        if status >= 400:
+            raise HTTPError(status, reason, contents)
+        limiter.succeeded()
         data = json.loads(contents)
         return data
@@ -0,0 +1,168 @@
+"""Benchmark the evaluation engine against the mock server, without calling
+the real APIs.
+
+Usage:
+
+python benchmark.py [--sizes 100,1000] [--concurrency 1,4,16] [--latency <s>]
+                    [--error-rate <p>] [--throttle-rate <p>]
+
+For each corpus size and concurrency setting, reports documents per second,
+the median and 99th percentile latency of calls and the peak resident memory.
+Each configuration runs in its own process, so that its peak memory is not
+that of the configurations before it.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+import compare
+from journal import Journal
+from mockserver import MockServer
+from pool import POOLS
+
+# providers served by the mock server, Semantria is called through its SDK
+PROVIDERS = ['skyttle', 'chatterbox', 'datumbox', 'repustate', 'bitext',
+             'viralheat', 'lymbix', 'aiapplied', 'sentigem']
+
+WORDS = ['good', 'bad', 'great', 'awful', 'fine', 'movie', 'service',
+         'phone', 'really', 'not', 'the', 'is', 'was', 'very']
+
+
+def make_corpus(size):
+    """Generate synthetic (doc_id, text, key) documents
+    """
+    rnd = random.Random(size)
+    for doc_id in range(size):
+        text = ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 20)))
+        yield doc_id, text, rnd.choice('+-0')
+
+
+def get_config(server):
+    """A config with dummy credentials and all analyzers pointed to the
+    mock server, without rate limits
+    """
+    config = {
+        'language': 'en',
+        'mashape_auth': 'x',
+        'datumbox_key': 'x',
+        'repustate_key': 'x',
+        'bitext_user': 'x',
+        'bitext_pwd': 'x',
+        'viralheat_key': 'x',
+        'lymbix_key': 'x',
+        'aiapplied_key': 'x',
+        'sentigem_key': 'x',
+    }
+    for provider in PROVIDERS:
+        config['%s_url' % provider] = server.url(provider)
+        config['%s_rate_limit' % provider] = 'none'
+    return config
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(server, size, concurrency):
+    """Evaluate a synthetic corpus of the size
+    :return: (docs per second, p50 latency, p99 latency) tuple
+    """
+    compare.ANALYZERS[:] = []
+    compare.initialize_analysers(get_config(server))
+    for analyzer in compare.ANALYZERS:
+        analyzer.concurrency = concurrency
+    compare.configure_analysers(get_config(server))
+
+    latencies = []
+
+    class LatencyJournal(Journal):
+        def write(self, doc_id, name, label, latency, score=None):
+            latencies.append(latency)
+            Journal.write(self, doc_id, name, label, latency, score)
+
+    journal = LatencyJournal('journal.tsv')
+    start = time.time()
+    try:
+        compare.evaluate(make_corpus(size), journal)
+    finally:
+        journal.close()
+        # close the keep-alive connections before the server stops
+        POOLS.close()
+    elapsed = time.time() - start
+    return (size / elapsed, percentile(latencies, 0.5),
+            percentile(latencies, 0.99))
+
+
+def measure(server, size, concurrency):
+    """Run one configuration in a child process
+    :return: (docs per second, p50 latency, p99 latency, peak RSS in MB)
+    tuple, the peak RSS is that of the child process
+    """
+    results = multiprocessing.Queue()
+
+    def target():
+        result = run(server, size, concurrency)
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        results.put(result + (peak_rss,))
+
+    process = multiprocessing.Process(target=target)
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main(sizes, concurrencies, latency, error_rate, throttle_rate):
+    compare.setup_logging()
+    compare.ANALYZERS_TO_USE = PROVIDERS
+    server = MockServer(latency=latency, error_rate=error_rate,
+                        throttle_rate=throttle_rate)
+    server.start()
+    cwd = os.getcwd()
+    dirname = tempfile.mkdtemp()
+    os.chdir(dirname)
+    try:
+        print "%8s%13s%10s%12s%12s%14s" % ('Docs', 'Concurrency', 'Docs/s',
+                                          'p50 (ms)', 'p99 (ms)', 'Peak RSS (MB)')
+        for size in sizes:
+            for concurrency in concurrencies:
+                docs_per_sec, p50, p99, peak_rss = measure(server, size,
+                                                           concurrency)
+                print "%8d%13d%10.1f%12.1f%12.1f%14.1f" % (
+                    size, concurrency, docs_per_sec, p50 * 1000, p99 * 1000,
+                    peak_rss)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(dirname)
+        POOLS.close()
+        server.stop()
+
+
+def parse_list(value):
+    return [int(x) for x in value.split(',')]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation engine")
+    parser.add_argument('--sizes', type=parse_list, default=[100, 1000],
+                        help="comma-separated corpus sizes")
+    parser.add_argument('--concurrency', type=parse_list, default=[1, 4, 16],
+                        help="comma-separated concurrency settings")
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help="mean response latency of the mock server, in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    options = parser.parse_args()
+
+    main(options.sizes, options.concurrency, options.latency,
+         options.error_rate, options.throttle_rate)
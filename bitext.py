@@ -13,6 +13,8 @@ LANGUAGE_MAPPING = {
 
 class Bitext(API):
 
+    batch_size = 20
+
     def __init__(self, user, password, language='en'):
         """:param language: en, es, pt, it
         """
@@ -32,9 +34,23 @@ class Bitext(API):
         else:
             return '-'
 
-    def analyse(self, text):
+    score_label = extract_label
+
+    def get_params(self, texts):
+        """Build the request parameters for a list of texts, using their
+        positions in the list as ids
+        """
+        params = [('User', self.user), ('Pass', self.password),
+                  ('Lang', self.language), ('Detail', 'Global'),
+                  ('OutFormat', 'JSON'), ('Normalized', 'Both')]
+        for doc_id, text in enumerate(texts):
+            params += [('Text', text), ('ID', doc_id)]
+        return params
+
+    def analyse_with_score(self, text):
         """Assign the sentiment label for the text.
         :return label: +, -, or 0
+        :return score: the raw score the label is based on
         """
         params = {
             'User': self.user,
@@ -46,6 +62,43 @@ class Bitext(API):
             'OutFormat': 'JSON',
             'Normalized': 'Both'
         }
-        data = self.get_data(params)
+        data = self.get_data(params, text=text)
         LOGGER.debug("Got response: %r" % data)
-        return self.extract_label(data['data'][0]['global_value'])
+        score = data['data'][0]['global_value']
+        return self.extract_label(score), score
+
+    def fetch_batch(self, texts):
+        """Send the texts in one request and split the response into
+        responses for individual texts by their ids
+        :raises ValueError: if a document is missing from the response or
+        returned more than once
+        """
+        data = self.get_data(self.get_params(texts))
+        LOGGER.debug("Got response: %r" % data)
+        id2doc = {}
+        for doc in data['data']:
+            doc_id = str(doc.get('id'))
+            if doc_id in id2doc:
+                raise ValueError("Got document %s more than once" % doc_id)
+            id2doc[doc_id] = doc
+        missing = [str(doc_id) for doc_id in range(len(texts))
+                   if str(doc_id) not in id2doc]
+        if missing:
+            raise ValueError("Got no response for documents %s" %
+                             ', '.join(missing))
+        return [{'data': [id2doc[str(doc_id)]]}
+                for doc_id in range(len(texts))]
+
+    def analyse_batch(self, texts):
+        """Assign sentiment labels for a list of texts.
+        :return labels: a list of +, -, or 0
+        """
+        return [label for label, _ in self.analyse_batch_with_scores(texts)]
+
+    def analyse_batch_with_scores(self, texts):
+        """Assign sentiment labels for a list of texts.
+        :return: a list of (label, raw score) tuples
+        """
+        responses = self.get_batch_data(texts, self.fetch_batch)
+        scores = [data['data'][0]['global_value'] for data in responses]
+        return [(self.extract_label(score), score) for score in scores]
@@ -0,0 +1,161 @@
+"""A circuit breaker per analyzer: transient failures are retried with
+jittered backoff, and after a number of consecutive failures the circuit
+opens, so that documents are skipped at once instead of each waiting for its
+own failure, until a probe in the background finds the provider working again
+"""
+
+import httplib
+import logging
+import random
+import socket
+import threading
+import time
+
+from deadline import DeadlineExceeded
+from instrument import INSTRUMENTS
+from pool import HTTPError
+from ratelimit import BACKOFF_STATUSES
+
+LOGGER = logging.getLogger('APICompare.Breaker')
+
+# the number of consecutive failures after which the circuit opens
+THRESHOLD = 5
+# seconds between probes of a provider while its circuit is open
+RESET_AFTER = 30.0
+# the number of times a call that failed with a transient error is repeated
+RETRIES = 2
+# the delay before the first repeated call, doubled for each further one,
+# and the maximum delay, in seconds
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 10.0
+
+# classes of errors: transient errors are retried and count as failures,
+# timeouts count as failures, fatal errors (a rejected key, an exhausted
+# quota) open the circuit at once, and errors with the document neither;
+# statuses that API._get_data already retried with backoff are not retried
+# again
+RETRY = 'retry'
+FAIL = 'fail'
+FATAL = 'fatal'
+DOCUMENT = 'document'
+
+FATAL_STATUSES = (401, 402, 403)
+
+
+def classify(exc):
+    """The class of an error, see RETRY, FAIL, FATAL and DOCUMENT
+    """
+    if isinstance(exc, HTTPError):
+        if exc.status in FATAL_STATUSES:
+            return FATAL
+        if exc.status in BACKOFF_STATUSES:
+            return FAIL
+        if exc.status >= 500:
+            return RETRY
+        return DOCUMENT
+    if isinstance(exc, (socket.error, httplib.HTTPException)):
+        return RETRY
+    if isinstance(exc, DeadlineExceeded):
+        return FAIL
+    return DOCUMENT
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an analyzer whose circuit is open
+    """
+
+
+class CircuitBreaker:
+    """Guards the calls to one analyzer, shared by all its workers
+    """
+
+    def __init__(self, name, threshold=THRESHOLD, reset_after=RESET_AFTER,
+                 retries=RETRIES):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.retries = retries
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.is_open = False
+        self.stopped = threading.Event()
+        # the number of times the circuit opened
+        self.opened = 0
+
+    def call(self, function):
+        """Call the function, repeating it after transient errors.
+        :raises CircuitOpen: if the circuit is open
+        """
+        for attempt in range(self.retries + 1):
+            if self.is_open:
+                raise CircuitOpen("The circuit of %s is open" % self.name)
+            try:
+                result = function()
+            except Exception, exc:
+                kind = classify(exc)
+                if kind == DOCUMENT:
+                    raise
+                self.failed(function, kind == FATAL)
+                if kind != RETRY or attempt == self.retries or self.is_open:
+                    raise
+                LOGGER.warning("%s failed, retrying: %r" % (self.name, exc))
+                INSTRUMENTS.retry(self.name)
+                time.sleep(random.uniform(0, min(MAX_RETRY_DELAY,
+                                                 RETRY_DELAY * 2 ** attempt)))
+                continue
+            self.succeeded()
+            return result
+
+    def succeeded(self):
+        with self.lock:
+            self.failures = 0
+
+    def failed(self, probe, fatal=False):
+        """Count a failure, and open the circuit after too many in a row
+        :param probe: a call to repeat in the background to find out when
+        the provider works again
+        """
+        with self.lock:
+            self.failures += 1
+            if self.is_open or (self.failures < self.threshold and not fatal):
+                return
+            self.is_open = True
+            self.opened += 1
+        LOGGER.error("Opening the circuit of %s after %d failures" %
+                     (self.name, self.failures))
+        thread = threading.Thread(target=self._probe, args=(probe,))
+        thread.daemon = True
+        thread.start()
+
+    def _probe(self, probe):
+        """Repeat the call every reset_after seconds, with jitter, until it
+        succeeds or the breaker is stopped, then close the circuit
+        """
+        while not self.stopped.wait(self.reset_after *
+                                    random.uniform(0.8, 1.2)):
+            try:
+                probe()
+            except Exception, exc:
+                if classify(exc) != DOCUMENT:
+                    LOGGER.info("%s is still failing: %r" % (self.name, exc))
+                    continue
+            with self.lock:
+                self.failures = 0
+                self.is_open = False
+            LOGGER.warning("Closing the circuit of %s" % self.name)
+            return
+
+    def stop(self):
+        """Stop probing
+        """
+        self.stopped.set()
+
+
+def get_breaker(analyzer):
+    """A breaker with the settings of the analyzer, given by its
+    circuit_threshold, circuit_reset and transient_retries attributes
+    """
+    return CircuitBreaker(analyzer.name,
+                          getattr(analyzer, 'circuit_threshold', THRESHOLD),
+                          getattr(analyzer, 'circuit_reset', RESET_AFTER),
+                          getattr(analyzer, 'transient_retries', RETRIES))
@@ -0,0 +1,277 @@
+"""Quotas and costs of the APIs: a plan of how many documents each analyzer
+is sent so that a run fits the quotas and a budget, and meters that count
+the calls to each API as they are made and stop an analyzer before it goes
+over its quota or the budget.
+
+The quota of an analyzer is the number of calls it may make in a run and its
+cost the price of a call, given as <analyzer>_quota and <analyzer>_cost in
+the config. If a run does not fit, expensive analyzers are sent a sample of
+the documents, stratified by gold label; the samples are nested, so that the
+documents sent to an analyzer with a smaller sample are also sent to those
+with larger ones.
+
+The quotas and the budget hold across the shards of a run, which each get
+an equal share of them, and across resumed runs, which count the calls
+recorded in the journal of the interrupted run first.
+"""
+
+import math
+import zlib
+import logging
+import threading
+from collections import Counter
+
+from chunking import split_text
+from journal import iter_journal
+
+LOGGER = logging.getLogger('APICompare.Budget')
+
+
+class QuotaExhausted(Exception):
+    """Raised instead of making a call that would go over the quota of an
+    analyzer or the budget
+    """
+
+
+class Meters:
+    """Counts the calls to each API and what they cost
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, budget=None):
+        """:param budget: the most the calls to all APIs may cost, or None
+        """
+        with self.lock:
+            self.budget = budget
+            self.calls = Counter()
+            self.spent = Counter()
+
+    def charge(self, analyzer, calls=1):
+        """Count calls to the API of an analyzer before they are made
+        :raises QuotaExhausted: if they would go over its quota or the budget
+        """
+        name = analyzer.name
+        quota = getattr(analyzer, 'quota', None)
+        cost = getattr(analyzer, 'cost', 0.0) * calls
+        with self.lock:
+            if quota is not None and self.calls[name] + calls > quota:
+                raise QuotaExhausted("%s has used its quota of %d calls" %
+                                     (name, quota))
+            if self.budget is not None and cost and \
+                    sum(self.spent.values()) + cost > self.budget:
+                raise QuotaExhausted("%s would go over the budget of %.2f" %
+                                     (name, self.budget))
+            self.calls[name] += calls
+            self.spent[name] += cost
+
+    def record(self, analyzer, calls):
+        """Count calls that were already made, e.g. by an interrupted run,
+        without checking the quota or the budget
+        """
+        with self.lock:
+            self.calls[analyzer.name] += calls
+            self.spent[analyzer.name] += getattr(analyzer, 'cost', 0.0) * calls
+
+    def format(self, num_docs=None):
+        """Format a table of the calls to each API and what they cost
+        :param num_docs: a dict of analyzer names to the number of documents
+        they processed, to show the documents per unit of cost
+        """
+        lines = ["%-15s%10s%10s%12s" % ('Analyzer', 'Calls', 'Spent',
+                                        'Docs/cost')]
+        with self.lock:
+            for name in sorted(self.calls):
+                per_cost = ''
+                if num_docs and self.spent[name]:
+                    per_cost = '%.1f' % (num_docs.get(name, 0) /
+                                         self.spent[name])
+                lines.append("%-15s%10d%10.2f%12s" % (
+                    name, self.calls[name], self.spent[name], per_cost))
+            lines.append("%-15s%10d%10.2f" % ('Total', sum(self.calls.values()),
+                                              sum(self.spent.values())))
+        return '\n'.join(lines)
+
+
+METERS = Meters()
+
+
+def estimate_calls(analyzer, docs):
+    """Estimate the calls needed to send the documents to an analyzer, from
+    its batch size and the chunks long documents are split into; responses
+    in the cache and retries are not taken into account
+    """
+    max_length = getattr(analyzer, 'max_length', None)
+    texts = sum(len(split_text(doc[1], max_length)) for doc in docs)
+    batch_size = 1
+    if hasattr(analyzer, 'analyse_batch'):
+        batch_size = max(1, getattr(analyzer, 'batch_size', 1))
+    return int(math.ceil(texts / float(batch_size)))
+
+
+def journal_calls(analyzers, docs, fname):
+    """Estimate the calls an interrupted run made, from the documents in its
+    journal that were sent to each analyzer; outputs, errors and timeouts
+    all cost calls, skipped documents none
+    :param docs: a list of (doc_id, text, key) tuples
+    :return: a dict of analyzer names to calls
+    """
+    sent = {}
+    for doc_id, name, label, _, _ in iter_journal(fname):
+        if label != 'Skipped':
+            sent.setdefault(name, set()).add(doc_id)
+    calls = {}
+    for analyzer in analyzers:
+        doc_ids = sent.get(analyzer.name, ())
+        calls[analyzer.name] = estimate_calls(
+            analyzer, [doc for doc in docs if str(doc[0]) in doc_ids])
+    return calls
+
+
+def share(analyzers, budget, count):
+    """Divide the quotas and rate limits of the analyzers and the budget
+    between count shards, so that all shards together stay within them
+    :return: the budget of a shard
+    """
+    for analyzer in analyzers:
+        if getattr(analyzer, 'quota', None) is not None:
+            analyzer.quota //= count
+        if getattr(analyzer, 'rate_limit', None):
+            calls, seconds = analyzer.rate_limit
+            analyzer.rate_limit = calls, seconds * count
+    if budget is None:
+        return None
+    return budget / float(count)
+
+
+def _sample_order(doc_id, seed):
+    return zlib.crc32('%s:%s' % (seed, doc_id)) & 0xffffffff
+
+
+def stratified_sample(docs, fraction, seed=0):
+    """Take a fraction of the documents with each gold label
+    :return: a set of doc ids
+    """
+    groups = {}
+    for doc in docs:
+        groups.setdefault(doc[2], []).append(doc[0])
+    sample = set()
+    for doc_ids in groups.values():
+        doc_ids.sort(key=lambda doc_id: _sample_order(doc_id, seed))
+        sample.update(doc_ids[:int(math.ceil(fraction * len(doc_ids)))])
+    return sample
+
+
+def fit_budget(costs, caps, budget):
+    """Find the fraction of the documents each analyzer can be sent: the
+    largest fraction that all analyzers with a cost are sent, up to their
+    caps, so that the costs fit the budget
+    :param costs: a dict of analyzer names to the cost of the whole run
+    :param caps: a dict of analyzer names to the largest fraction allowed
+    by their quotas
+    :return: a dict of analyzer names to fractions
+    """
+    def total(fraction):
+        return sum(cost * min(fraction, caps[name])
+                   for name, cost in costs.items())
+
+    low, high = 0.0, 1.0
+    if total(high) > budget:
+        for _ in range(50):
+            middle = (low + high) / 2
+            if total(middle) > budget:
+                high = middle
+            else:
+                low = middle
+        high = low
+    return dict((name, min(high, caps[name]) if costs[name] else caps[name])
+                for name in costs)
+
+
+class Plan:
+    """The documents each analyzer is sent, to fit the quotas and the budget
+    """
+
+    def __init__(self, analyzers, docs, budget=None, seed=0, done=None,
+                 used=None):
+        """:param docs: a list of (doc_id, text, key) tuples
+        :param budget: the most the run may cost, or None for no limit
+        :param done: the outputs of an interrupted run, a dict of doc ids (as
+        strings) to dicts of analyzer names to outputs; documents are only
+        planned for the analyzers that have not processed them
+        :param used: a dict of analyzer names to the calls they made in the
+        interrupted run, which count against their quotas and the budget
+        """
+        done = done or {}
+        used = used or {}
+        self.budget = budget
+        # analyzer names to the documents that are still to be sent to them
+        self.docs = {}
+        self.calls = {}
+        self.costs = {}
+        self.spent = 0.0
+        caps = {}
+        for analyzer in analyzers:
+            name = analyzer.name
+            cost = getattr(analyzer, 'cost', 0.0)
+            self.docs[name] = [doc for doc in docs
+                               if name not in done.get(str(doc[0]), ())]
+            self.calls[name] = estimate_calls(analyzer, self.docs[name])
+            self.costs[name] = self.calls[name] * cost
+            self.spent += used.get(name, 0) * cost
+            quota = getattr(analyzer, 'quota', None)
+            caps[name] = 1.0
+            if quota is not None:
+                left = max(0, quota - used.get(name, 0))
+                if self.calls[name] > left:
+                    caps[name] = left / float(self.calls[name])
+        if budget is None:
+            self.fractions = caps
+        else:
+            self.fractions = fit_budget(self.costs, caps,
+                                        max(0.0, budget - self.spent))
+        # analyzer names to the doc ids they are sent, None for all
+        self.samples = {}
+        for name, fraction in self.fractions.items():
+            if fraction < 1.0:
+                self.samples[name] = stratified_sample(self.docs[name],
+                                                       fraction, seed)
+                LOGGER.info("Sending %d of %d documents to %s" %
+                            (len(self.samples[name]), len(self.docs[name]),
+                             name))
+            else:
+                self.samples[name] = None
+
+    def selects(self, name, doc_id):
+        """:return: whether the analyzer is sent the document
+        """
+        sample = self.samples.get(name)
+        return sample is None or doc_id in sample
+
+    def num_docs(self, name):
+        """:return: the number of documents the analyzer is sent
+        """
+        sample = self.samples.get(name)
+        return len(self.docs[name]) if sample is None else len(sample)
+
+    def format(self):
+        """Format a table of the estimated calls and costs of each analyzer
+        """
+        lines = ["%-15s%10s%10s%10s%10s" % ('Analyzer', 'Docs', 'Sampled',
+                                            'Calls', 'Cost')]
+        total = 0.0
+        for name in sorted(self.calls):
+            fraction = self.fractions[name]
+            cost = self.costs[name] * fraction
+            total += cost
+            lines.append("%-15s%10d%10.3f%10d%10.2f" % (
+                name, self.num_docs(name), fraction,
+                int(math.ceil(self.calls[name] * fraction)), cost))
+        budget = '' if self.budget is None else ' of %.2f' % self.budget
+        if self.spent:
+            lines.append("Already spent: %.2f" % self.spent)
+            total += self.spent
+        lines.append("Estimated cost: %.2f%s" % (total, budget))
+        return '\n'.join(lines)
@@ -0,0 +1,158 @@
+"""A persistent cache of API responses, stored in an SQLite file
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+LOGGER = logging.getLogger('APICompare.Cache')
+
+# default maximum size of the cached responses, in bytes
+MAX_SIZE = 512 * 1024 * 1024
+
+
+class CacheMiss(Exception):
+    """Raised in the cache-only mode when a response is not in the cache
+    """
+
+
+class ResponseCache:
+    """Responses are keyed on the name of the provider, the settings of the
+    analyzer that affect the response (e.g. language, domain) and the hash of
+    the text. Labels are extracted from cached responses anew each time, so
+    changing thresholds in extract_label does not invalidate the cache.
+    """
+
+    def __init__(self, fname, max_size=MAX_SIZE, cache_only=False):
+        """:param max_size: the least recently used responses are evicted when
+        the total size of responses exceeds this number of bytes
+        :param cache_only: raise CacheMiss instead of calling the API when
+        the response is not in the cache
+        """
+        self.fname = fname
+        self.max_size = max_size
+        self.cache_only = cache_only
+        self.hits = Counter()
+        self.misses = Counter()
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(fname, check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                               key TEXT PRIMARY KEY,
+                               provider TEXT,
+                               data TEXT,
+                               size INTEGER,
+                               accessed REAL)""")
+        self.db.execute("""CREATE INDEX IF NOT EXISTS responses_accessed
+                           ON responses (accessed)""")
+        self.db.commit()
+        self.size = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def make_key(self, provider, settings, text):
+        """Build the key for a response
+        :param settings: a dict of settings of the analyzer
+        """
+        if isinstance(text, unicode):
+            text = text.encode('utf8')
+        text_hash = hashlib.sha1(text).hexdigest()
+        return '%s:%s:%s' % (provider, json.dumps(settings, sort_keys=True),
+                             text_hash)
+
+    def get(self, provider, settings, text):
+        """Look up a response.
+        :return data: the cached response, or None if there is none
+        :raise CacheMiss: in the cache-only mode, if there is no response
+        """
+        key = self.make_key(provider, settings, text)
+        with self.lock:
+            row = self.db.execute("SELECT data FROM responses WHERE key = ?",
+                                  (key,)).fetchone()
+            if row is None:
+                self.misses[provider] += 1
+            else:
+                self.hits[provider] += 1
+                self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?",
+                                (time.time(), key))
+                self.db.commit()
+        if row is not None:
+            return json.loads(row[0])
+        if self.cache_only:
+            raise CacheMiss('No cached response from %s for %r' %
+                            (provider, text))
+        return None
+
+    def put(self, provider, settings, text, data):
+        """Store a response, evicting the least recently used ones if the
+        cache grows over its maximum size
+        """
+        key = self.make_key(provider, settings, text)
+        contents = json.dumps(data)
+        size = len(contents)
+        with self.lock:
+            row = self.db.execute("SELECT size FROM responses WHERE key = ?",
+                                  (key,)).fetchone()
+            if row is not None:
+                self.size -= row[0]
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                            (key, provider, contents, size, time.time()))
+            self.size += size
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        """Delete the least recently used responses until the cache fits
+        into its maximum size
+        """
+        while self.size > self.max_size:
+            rows = self.db.execute("""SELECT key, size FROM responses
+                                      ORDER BY accessed LIMIT 100""").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self.size <= self.max_size:
+                    break
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.size -= size
+                LOGGER.debug("Evicted %s" % key)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def cached(analyzer, text, fetch):
+    """Return the response of the analyzer for the text from its cache, or
+    call fetch() and store its result in the cache.
+    """
+    cache = getattr(analyzer, 'cache', None)
+    if cache is None:
+        return fetch()
+    settings = analyzer.cache_settings()
+    data = cache.get(analyzer.name, settings, text)
+    if data is None:
+        data = fetch()
+        cache.put(analyzer.name, settings, text, data)
+    return data
+
+
+def cached_batch(analyzer, texts, fetch):
+    """Return the responses of the analyzer for the texts, taking those that
+    are in its cache from the cache, and calling fetch(texts) for the rest,
+    which should return a list of responses in the order of the texts.
+    """
+    cache = getattr(analyzer, 'cache', None)
+    if cache is None:
+        return fetch(texts)
+    settings = analyzer.cache_settings()
+    responses = [cache.get(analyzer.name, settings, text) for text in texts]
+    missing = [i for i, data in enumerate(responses) if data is None]
+    if missing:
+        fetched = fetch([texts[i] for i in missing])
+        for i, data in zip(missing, fetched):
+            cache.put(analyzer.name, settings, texts[i], data)
+            responses[i] = data
+    return responses
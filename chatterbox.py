@@ -24,12 +24,16 @@ class Chatterbox(API):
         else:
             return '-'
 
-    def analyse(self, text):
+    score_label = extract_label
+
+    def analyse_with_score(self, text):
         """Assign the sentiment label for the text.
         :return label: +, -, or 0
+        :return score: the raw score the label is based on
         """
         params = {'text': text, 'lang': self.language}
         headers = {'X-Mashape-Authorization': self.mashape_auth}
-        data = self.get_data(params, headers)
+        data = self.get_data(params, headers, text=text)
         LOGGER.debug("Got response: %r" % data)
-        return self.extract_label(data['value'])
+        score = data['value']
+        return self.extract_label(score), score
@@ -0,0 +1,143 @@
+"""Splitting of documents longer than an analyzer accepts into chunks on
+sentence boundaries, and combination of the outputs for the chunks into one
+output for the document
+"""
+
+import re
+import logging
+import threading
+from collections import Counter
+
+LOGGER = logging.getLogger('APICompare.Chunk')
+
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+SPACE_RE = re.compile(r'\s+')
+
+# ways to combine the outputs for the chunks of a document: the label of the
+# mean of their raw scores, weighted by the length of the chunks, or the
+# label of most chunks
+STRATEGIES = ('mean', 'vote')
+
+
+def _pack(pieces, max_length, separator):
+    """Join consecutive pieces into chunks of up to max_length characters
+    """
+    chunks = []
+    current = u''
+    for piece in pieces:
+        if not current:
+            current = piece
+        elif len(current) + len(separator) + len(piece) <= max_length:
+            current += separator + piece
+        else:
+            chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text, max_length):
+    """Split a text into chunks of up to max_length characters, on sentence
+    boundaries where possible, then on whitespace, and only cut through
+    words that are longer than max_length
+    :return: a list of chunks, just the text if it is short enough
+    """
+    if not max_length or len(text) <= max_length:
+        return [text]
+    pieces = []
+    for sentence in SENTENCE_END_RE.split(text.strip()):
+        if len(sentence) <= max_length:
+            pieces.append(sentence)
+            continue
+        for word in _pack(SPACE_RE.split(sentence), max_length, u' '):
+            while len(word) > max_length:
+                pieces.append(word[:max_length])
+                word = word[max_length:]
+            pieces.append(word)
+    return _pack(pieces, max_length, u' ')
+
+
+def combine(outputs, lengths, strategy='mean', score_label=None):
+    """Combine the outputs for the chunks of a document.
+    :param outputs: a list of (label, raw score) tuples, one per chunk
+    :param lengths: the lengths of the chunks
+    :param score_label: a function from a raw score to a label; without it,
+    or if a chunk has no raw score, the mean strategy falls back to a vote
+    weighted by the lengths of the chunks
+    :return: a (label, raw score) tuple, the score is the mean of the raw
+    scores weighted by the lengths of the chunks, or None if a chunk has none
+    """
+    total = float(sum(lengths))
+    scores = [score for _, score in outputs]
+    score = None
+    if None not in scores:
+        score = sum(s * length for s, length in zip(scores, lengths)) / total
+    if strategy == 'mean' and score is not None and score_label is not None:
+        return score_label(score), score
+    counts = Counter()
+    weights = Counter()
+    for (label, _), length in zip(outputs, lengths):
+        counts[label] += 1
+        weights[label] += length
+    if strategy == 'mean':
+        counts = weights
+    label = max(counts, key=lambda label: (counts[label], weights[label]))
+    return label, score
+
+
+def analyse_chunks(analyzer, texts, analyse_texts):
+    """Analyse texts, splitting those longer than the max_length of the
+    analyzer into chunks and combining the outputs for them with its
+    chunk_strategy.
+    :param analyse_texts: a function that takes a list of texts and returns
+    a list of (label, raw score) tuples
+    :return: a list of (label, raw score) tuples, one per text
+    """
+    max_length = getattr(analyzer, 'max_length', None)
+    if not max_length:
+        return analyse_texts(texts)
+    doc_chunks = [split_text(text, max_length) for text in texts]
+    outputs = analyse_texts([chunk for chunks in doc_chunks
+                             for chunk in chunks])
+    strategy = getattr(analyzer, 'chunk_strategy', 'mean')
+    score_label = getattr(analyzer, 'score_label', None)
+    results = []
+    start = 0
+    for chunks in doc_chunks:
+        chunk_outputs = outputs[start:start + len(chunks)]
+        start += len(chunks)
+        if len(chunks) == 1:
+            results.append(chunk_outputs[0])
+        else:
+            results.append(combine(chunk_outputs,
+                                   [len(chunk) for chunk in chunks],
+                                   strategy, score_label))
+    return results
+
+
+def analyse_in_parallel(analyse, texts):
+    """Call analyse with each of the texts, each in its own thread if there
+    are several
+    :return: a list of the results, in the order of the texts
+    """
+    if len(texts) == 1:
+        return [analyse(texts[0])]
+    results = [None] * len(texts)
+
+    def call(i):
+        try:
+            results[i] = analyse(texts[i]), None
+        except Exception, exc:
+            results[i] = None, exc
+
+    threads = [threading.Thread(target=call, args=(i,))
+               for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for _, exc in results:
+        if exc is not None:
+            raise exc
+    return [result for result, _ in results]
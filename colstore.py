@@ -0,0 +1,301 @@
+"""A columnar on-disk store of the results of a run: a directory with a file
+per column, which can be memory-mapped without parsing or copying, and which
+is appended to as documents complete.
+
+Usage:
+
+python colstore.py export <results directory> [--results <file>]
+python colstore.py disagree <results directory> [--limit <n>]
+
+Columns are stored as raw arrays: the gold label codes and the label codes
+of each analyzer as int8 (see scores.LABEL_CODES), raw scores and latencies
+of each analyzer as float32 (NaN where there is none), and doc ids and texts
+once each, as UTF-8 strings concatenated into one file with an int64 file of
+their end offsets. meta.json holds the names of the analyzers and the number
+of documents written completely, which readers map.
+"""
+
+import os
+import csv
+import json
+import argparse
+import logging
+
+import numpy as np
+
+from scores import label_code, code_label
+
+LOGGER = logging.getLogger('APICompare.ColumnStore')
+
+# the number of documents after which the columns are flushed to disk
+FLUSH_EVERY = 1000
+
+META_FNAME = 'meta.json'
+
+
+def column_fname(dirname, column, name=None):
+    """The file of a column, or of the column of an analyzer
+    """
+    if name is None:
+        return os.path.join(dirname, column)
+    return os.path.join(dirname, '%s.%s' % (name, column))
+
+
+class ColumnWriter:
+    """Appends documents to the columns of a results directory, buffering
+    them in memory and flushing them every flush_every documents
+    """
+
+    def __init__(self, dirname, names, append=False, flush_every=FLUSH_EVERY):
+        """:param names: the names of the analyzers
+        :param append: add documents to an existing results directory
+        """
+        self.dirname = dirname
+        self.names = list(names)
+        self.flush_every = flush_every
+        self.num_docs = 0
+        self.offsets = {'doc_ids': 0, 'texts': 0}
+        if append and os.path.exists(os.path.join(dirname, META_FNAME)):
+            meta = read_meta(dirname)
+            if meta['names'] != self.names:
+                raise ValueError("%s has results of %s" %
+                                 (dirname, ', '.join(meta['names'])))
+            self.num_docs = meta['num_docs']
+            self.offsets = meta['offsets']
+            self._truncate()
+        elif not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        mode = 'ab' if append else 'wb'
+        self.files = {}
+        self.buffers = {}
+        for column, _ in self.columns():
+            self.files[column] = open(os.path.join(dirname, column), mode)
+            self.buffers[column] = []
+        self.strings = {'doc_ids': [], 'texts': []}
+        for column in self.strings:
+            self.files[column] = open(column_fname(dirname, column + '.bin'),
+                                      mode)
+        self._write_meta()
+
+    def columns(self):
+        """The file names and types of the array columns
+        """
+        yield 'gold.i8', np.int8
+        yield 'doc_ids.end.i64', np.int64
+        yield 'texts.end.i64', np.int64
+        for name in self.names:
+            yield '%s.labels.i8' % name, np.int8
+            yield '%s.scores.f32' % name, np.float32
+            yield '%s.latencies.f32' % name, np.float32
+
+    def _truncate(self):
+        """Cut off anything written after the last complete flush, in case
+        the writer was interrupted
+        """
+        for column, dtype in self.columns():
+            fname = os.path.join(self.dirname, column)
+            with open(fname, 'r+b') as fh:
+                fh.truncate(self.num_docs * np.dtype(dtype).itemsize)
+        for column in ('doc_ids', 'texts'):
+            fname = column_fname(self.dirname, column + '.bin')
+            with open(fname, 'r+b') as fh:
+                fh.truncate(self.offsets[column])
+
+    def append(self, doc_id, text, key, labels, scores=None, latencies=None):
+        """Add a document
+        :param labels: a dict of analyzer names to their labels or outputs
+        :param scores: a dict of analyzer names to raw scores
+        :param latencies: a dict of analyzer names to latencies in seconds
+        """
+        scores = scores or {}
+        latencies = latencies or {}
+        self.buffers['gold.i8'].append(label_code(key))
+        for column, string in (('doc_ids', unicode(doc_id)),
+                               ('texts', text)):
+            if isinstance(string, unicode):
+                string = string.encode('utf8')
+            self.strings[column].append(string)
+            self.offsets[column] += len(string)
+            self.buffers['%s.end.i64' % column].append(self.offsets[column])
+        for name in self.names:
+            score = scores.get(name)
+            latency = latencies.get(name)
+            self.buffers['%s.labels.i8' % name].append(label_code(labels[name]))
+            self.buffers['%s.scores.f32' % name].append(
+                float('nan') if score is None else score)
+            self.buffers['%s.latencies.f32' % name].append(
+                float('nan') if latency is None else latency)
+        self.num_docs += 1
+        if self.num_docs % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered documents, then record them in meta.json, so
+        that readers never see partly written documents
+        """
+        for column, dtype in self.columns():
+            buffered = self.buffers[column]
+            np.asarray(buffered, dtype=dtype).tofile(self.files[column])
+            del buffered[:]
+        for column, strings in self.strings.items():
+            self.files[column].write(''.join(strings))
+            del strings[:]
+        for fh in self.files.values():
+            fh.flush()
+            os.fsync(fh.fileno())
+        self._write_meta()
+
+    def _write_meta(self):
+        fname = os.path.join(self.dirname, META_FNAME)
+        with open(fname + '.tmp', 'w') as fh:
+            json.dump({'names': self.names, 'num_docs': self.num_docs,
+                       'offsets': self.offsets}, fh)
+        os.rename(fname + '.tmp', fname)
+
+    def close(self):
+        self.flush()
+        for fh in self.files.values():
+            fh.close()
+
+
+def read_meta(dirname):
+    with open(os.path.join(dirname, META_FNAME)) as fh:
+        return json.load(fh)
+
+
+def _map(fname, dtype, length):
+    """Map the first length items of a column, read-only
+    """
+    if not length:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(fname, dtype=dtype, mode='r', shape=(length,))
+
+
+class ColumnStore:
+    """Reads a results directory, mapping the columns into memory. It has
+    the methods of a ScoreStore used by metrics, stats and sweep, so those
+    can be computed on it without loading the results.
+    """
+
+    def __init__(self, dirname):
+        self.dirname = dirname
+        meta = read_meta(dirname)
+        self.names = meta['names']
+        self.num_docs = meta['num_docs']
+        self.gold = _map(column_fname(dirname, 'gold.i8'), np.int8,
+                         self.num_docs)
+        self.ends = {}
+        self.blobs = {}
+        for column in ('doc_ids', 'texts'):
+            self.ends[column] = _map(column_fname(dirname, column + '.end.i64'),
+                                     np.int64, self.num_docs)
+            size = meta['offsets'][column]
+            self.blobs[column] = _map(column_fname(dirname, column + '.bin'),
+                                      np.uint8, size)
+
+    def __len__(self):
+        return self.num_docs
+
+    def _column(self, name, column, dtype):
+        return _map(column_fname(self.dirname, column, name), dtype,
+                    self.num_docs)
+
+    def labels(self, name):
+        """:return: the label codes of an analyzer, memory-mapped
+        """
+        return self._column(name, 'labels.i8', np.int8)
+
+    def scores(self, name):
+        """:return: the raw scores of an analyzer, memory-mapped
+        """
+        return self._column(name, 'scores.f32', np.float32)
+
+    def latencies(self, name):
+        """:return: the latencies of an analyzer, memory-mapped
+        """
+        return self._column(name, 'latencies.f32', np.float32)
+
+    def _string(self, column, i):
+        start = self.ends[column][i - 1] if i else 0
+        return self.blobs[column][start:self.ends[column][i]].tostring() \
+            .decode('utf8')
+
+    def doc_id(self, i):
+        return self._string('doc_ids', i)
+
+    def text(self, i):
+        return self._string('texts', i)
+
+    def gold_array(self):
+        """:return: the gold label codes, memory-mapped
+        """
+        return self.gold
+
+    def label_matrix(self, names=None):
+        """:return: an int8 array of label codes, one row per analyzer
+        """
+        names = names or self.names
+        matrix = np.empty((len(names), len(self)), dtype=np.int8)
+        for i, name in enumerate(names):
+            matrix[i] = self.labels(name)
+        return matrix
+
+    def score_matrix(self, names=None):
+        """:return: a float32 array of raw scores, one row per analyzer
+        """
+        names = names or self.names
+        matrix = np.empty((len(names), len(self)), dtype=np.float32)
+        for i, name in enumerate(names):
+            matrix[i] = self.scores(name)
+        return matrix
+
+    def disagreements(self, names=None):
+        """Find the documents the analyzers assigned different labels to,
+        leaving out analyzers without a label for a document
+        :return: an array of row numbers
+        """
+        labels = self.label_matrix(names).astype(np.int16)
+        valid = labels >= 0
+        highest = np.where(valid, labels, -1).max(axis=0)
+        lowest = np.where(valid, labels, 3).min(axis=0)
+        return np.flatnonzero(valid.any(axis=0) & (highest != lowest))
+
+    def export_csv(self, fname):
+        """Write the results as a tab-separated table, like results.csv
+        """
+        writer = csv.writer(open(fname, 'wb'), delimiter='\t')
+        writer.writerow(['doc_id', 'text', 'gold standard'] + self.names)
+        columns = [self.labels(name) for name in self.names]
+        for i in range(len(self)):
+            row = [self.doc_id(i), self.text(i), code_label(self.gold[i])] + \
+                [code_label(column[i]) for column in columns]
+            writer.writerow([field.encode('utf8') for field in row])
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Export or query a columnar results directory")
+    commands = parser.add_subparsers(dest='command')
+    export_parser = commands.add_parser('export', help="export to CSV")
+    export_parser.add_argument('dirname', help="the results directory")
+    export_parser.add_argument('--results', default='results.csv',
+                               help="the file to write the table to")
+    disagree_parser = commands.add_parser(
+        'disagree', help="list documents the analyzers disagree on")
+    disagree_parser.add_argument('dirname', help="the results directory")
+    disagree_parser.add_argument('--limit', type=int, default=None,
+                                 help="the maximum number of documents")
+    options = parser.parse_args()
+
+    store = ColumnStore(options.dirname)
+    if options.command == 'export':
+        store.export_csv(options.results)
+    else:
+        rows = store.disagreements()[:options.limit]
+        print '\t'.join(['doc_id', 'gold standard'] + store.names + ['text'])
+        for i in rows:
+            line = u'\t'.join([store.doc_id(i), code_label(store.gold[i])] +
+                              [code_label(store.labels(name)[i])
+                               for name in store.names] + [store.text(i)])
+            print line.encode('utf8')
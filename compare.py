@@ -1,28 +1,100 @@
 """Usage:
 
 python compare.py <path to text file with annotated data> <path to config file>
+
+Options:
+
+--analyzers <names> a comma-separated list of the analyzers to use, e.g.
+                    skyttle,datumbox (default: the analyzers setting in the
+                    config, or all)
+--check-credentials send a text to each analyzer before the run, and stop if
+                    an API rejects its credentials
+--cache <file>      a file to cache API responses in (default: cache.db, or
+                    cache-<i>-of-<n>.db for a shard)
+--no-cache          do not cache API responses
+--cache-size <MB>   the maximum size of the cache
+--cache-only        only use responses from the cache, do not call the APIs
+--concurrency <n>   the number of concurrent requests to each API
+--deadline <s>      give up on a document after this number of seconds and
+                    output Timeout for it, overridden by <analyzer>_deadline
+                    in the config
+--chunk-strategy <s> combine the outputs for the chunks of documents longer
+                    than an API accepts by the mean of their raw scores,
+                    weighted by length, or by a vote (default: mean),
+                    overridden by <analyzer>_chunk_strategy in the config
+--budget <amount>   the most the calls to the APIs may cost, with the price
+                    of a call to each API set as <analyzer>_cost and the
+                    number of calls allowed as <analyzer>_quota in the
+                    config; analyzers that do not fit are sent a sample of
+                    the documents, see budget.py. With --shard, each shard
+                    gets an equal share of the budget and the quotas, and
+                    with --resume, the calls of the interrupted run count
+                    against them
+--plan-only         estimate the calls and the cost of the run, and exit
+--journal <file>    a file to record outputs in (default: journal.tsv)
+--resume            resume an interrupted run from its journal
+--manifest <file>   a file to record the outputs for each text in at the end
+                    of the run (default: manifest.tsv)
+--incremental       only send the documents whose text is not in the
+                    manifest of the previous run, see manifest.py
+--bootstrap <n>     the number of bootstrap replicates for confidence
+                    intervals and significance tests, 0 to skip them
+                    (default: 1000)
+--processes <n>     the number of processes to resample in
+--adaptive          stop sending documents to an analyzer once its rank by
+                    accuracy is settled
+--confidence <p>    the confidence the ranking is settled with (default: 0.95)
+--order <order>     random or stratified order of documents in an adaptive run
+                    (default: stratified)
+--seed <n>          the seed for the order of documents, and for the samples
+                    of documents in a run with a budget
+--dedup <mode>      send documents with the same text once: exact texts,
+                    normalized texts, or none (default: normalized)
+--shard <i>/<n>     only evaluate shard i (from 0) of n, see shard.py
+--shard-by <how>    assign documents to shards by the hash of their ids or
+                    in consecutive ranges (default: hash)
+--results <file>    a file to write the results table to
+                    (default: results.csv, or results-<i>-of-<n>.csv for
+                    a shard)
+--columns <dir>     a directory to write the results to in columns, see
+                    colstore.py (default: results.cols, or
+                    results-<i>-of-<n>.cols for a shard)
+--no-columns        do not write the results in columns
+--log <file>        a file to write the log to (default: compare.log, or
+                    compare-<i>-of-<n>.log for a shard)
+--metrics-port <n>  serve metrics of the calls to the APIs in the Prometheus
+                    text format at http://localhost:<n>/metrics during the run
 """
 
 import sys
 import os
+import argparse
 import codecs
 import csv
 import logging
 from collections import Counter
 
-from bitext import Bitext
-from chatterbox import Chatterbox
-from datumbox import Datumbox
-from lymbix import Lymbix
-from repustate import Repustate
-from semantria_api import Semantria
-from skyttle import Skyttle
-from viralheat import Viralheat
-from aiapplied import AIApplied
-from sentigem import Sentigem
 from thr import Thr
-
-
+from scheduler import Scheduler, SKIPPED, TIMEOUT
+from cache import ResponseCache
+from ratelimit import LIMITERS, parse_rate_limit
+from journal import Journal, read_journal
+from scores import ScoreStore
+from metrics import store_metrics
+from stats import format_evaluation
+from adaptive import SequentialRanking, shuffle_docs
+from dedup import DedupIndex, NORMALIZERS
+from shard import parse_shard, shard_fname, shard_docs
+from colstore import ColumnWriter
+from instrument import INSTRUMENTS, start_server
+from registry import build_analyzers, check_analyzers, parse_names
+from chunking import STRATEGIES
+from budget import Plan, METERS, journal_calls, share
+from manifest import Manifest, ManifestWriter
+
+
+# the analyzers used unless others are selected with --analyzers or the
+# analyzers setting in the config, see registry.py
 ANALYZERS_TO_USE = [
                     'skyttle',
                     'chatterbox',
@@ -36,14 +108,36 @@ ANALYZERS_TO_USE = [
                     'sentigem'
                 ]
 ANALYZERS = []
-LOGGER = None
-
-
-def setup_logging():
+LOGGER = logging.getLogger('APICompare')
+# log progress every this number of documents
+PROGRESS_EVERY = 1000
+
+# settings of analyzers that can be set in the config as <name>_<setting>
+ANALYZER_SETTINGS = {
+    'url': str,
+    'batch_size': int,
+    'concurrency': int,
+    'pool_size': int,
+    'timeout': float,
+    'rate_limit': parse_rate_limit,
+    'poll_interval': float,
+    'queue_batch_size': int,
+    'deadline': float,
+    'hedge': lambda value: value.lower() in ('1', 'yes', 'true'),
+    'transient_retries': int,
+    'circuit_threshold': int,
+    'circuit_reset': float,
+    'max_length': int,
+    'chunk_strategy': str,
+    'quota': int,
+    'cost': float,
+}
+
+
+def setup_logging(fname='compare.log'):
     """Log debug or higher to a file, errors to stderr
     """
     global LOGGER
-    fname = 'compare.log'
     if os.path.exists(fname):
          os.unlink(fname)
 
@@ -59,13 +153,12 @@ def setup_logging():
     LOGGER.addHandler(streamhandler)
 
 
-def read_evaluation_data(fname):
-    """Read the gold standard data.
-    :return doc_id2doc: document id to the text of the document
-    :return doc_id2key: document id to the manually assigned sentiment label
+def iter_evaluation_data(fname):
+    """Read the gold standard data one document at a time. Documents marked
+    as irrelevant are skipped.
+    :return: a generator of (doc_id, text, key) tuples, key is None if the
+    document has no manually assigned label
     """
-    doc_id2key = {}
-    doc_id2doc = {}
     doc_id = 0
     for line in codecs.open(fname, 'r', 'utf8'):
         line = line.strip()
@@ -77,11 +170,23 @@ def read_evaluation_data(fname):
             document = document.strip()
         except ValueError:
             document = line
+            key = None
         if key == 'X':
             continue
+        yield doc_id, document, key
+        doc_id += 1
+
+
+def read_evaluation_data(fname):
+    """Read the gold standard data.
+    :return doc_id2doc: document id to the text of the document
+    :return doc_id2key: document id to the manually assigned sentiment label
+    """
+    doc_id2key = {}
+    doc_id2doc = {}
+    for doc_id, document, key in iter_evaluation_data(fname):
         doc_id2key[doc_id] = key
         doc_id2doc[doc_id] = document
-        doc_id += 1
     return doc_id2doc, doc_id2key
 
 
@@ -97,83 +202,52 @@ def read_config(config_fname=None):
     return config
 
 
-def initialize_analysers(config):
-    """Initialise analysers
+def initialize_analysers(config, names=None):
+    """Initialise analysers, importing only the modules of the selected ones
+    :param names: the names of the analyzers to use, by default those in the
+    analyzers setting of the config, or ANALYZERS_TO_USE
     """
-    if 'skyttle' in ANALYZERS_TO_USE:
-        skyttle = Skyttle(mashape_auth=config['mashape_auth'],
-                          language=config['language'])
-        ANALYZERS.append(skyttle)
-
-    if 'chatterbox' in ANALYZERS_TO_USE:
-        chatterbox = Chatterbox(mashape_auth=config['mashape_auth'],
-                          language=config['language'])
-        ANALYZERS.append(chatterbox)
-
-    if 'datumbox' in ANALYZERS_TO_USE:
-        datumbox = Datumbox(api_key=config['datumbox_key'])
-        ANALYZERS.append(datumbox)
-
-    if 'repustate' in ANALYZERS_TO_USE:
-        repustate = Repustate(api_key=config['repustate_key'])
-        ANALYZERS.append(repustate)
-
-    if 'bitext' in ANALYZERS_TO_USE:
-        bitext = Bitext(user=config['bitext_user'],
-                        password=config['bitext_pwd'],
-                        language=config['language'])
-        ANALYZERS.append(bitext)
-
-    if 'semantria' in ANALYZERS_TO_USE:
-        semantria = Semantria(consumer_key=config['semantria_consumer_key'],
-                              consumer_secret=config['semantria_consumer_secret'])
-        ANALYZERS.append(semantria)
-
-    if 'viralheat' in ANALYZERS_TO_USE:
-        viralheat = Viralheat(api_key=config['viralheat_key'])
-        ANALYZERS.append(viralheat)
-
-    if 'lymbix' in ANALYZERS_TO_USE:
-        lymbix = Lymbix(api_key=config['lymbix_key'])
-        ANALYZERS.append(lymbix)
-
-    if 'aiapplied' in ANALYZERS_TO_USE:
-        aiapplied = AIApplied(api_key=config['aiapplied_key'],
-                              language=config['language'])
-        ANALYZERS.append(aiapplied)
-
-    if 'sentigem' in ANALYZERS_TO_USE:
-        sentigem = Sentigem(api_key=config['sentigem_key'])
-        ANALYZERS.append(sentigem)
+    if not names:
+        names = parse_names(config.get('analyzers')) or ANALYZERS_TO_USE
+    ANALYZERS.extend(build_analyzers(names, config))
 
-def process_one_doc(text, key):
-    """Process one document in all analyzers
+
+def configure_analysers(config, analyzers=None):
+    """Apply per-analyzer settings from the config, given as
+    <analyzer name>_<setting>, e.g. skyttle_batch_size
+    :param analyzers: the analyzers to configure, by default ANALYZERS
+    """
+    for analyzer in ANALYZERS if analyzers is None else analyzers:
+        for setting, convert in ANALYZER_SETTINGS.items():
+            key = '%s_%s' % (analyzer.name.lower(), setting)
+            if key in config:
+                setattr(analyzer, setting, convert(config[key]))
+
+
+def output_label(output):
+    """The label in the output of an analyzer, or 'Error' if it failed
+    """
+    if isinstance(output, tuple) and not output[0]:
+        return 'Error'
+    return output
+
+
+def score_outputs(outputs, key):
+    """Compare the outputs of the analyzers for one document with its key
+    :param outputs: a dict of analyzer names to their outputs
     :return result_list: a list of outputs for all analyzers
     :return hits: a Counter with hits for all analyzers
     :return errors: a Counter with errors for all analyzers
     """
-    global ANALYZERS
-
     hits = Counter()
     errors = Counter()
     results = {}
-    Thr.outputs = {}
-    Thr.inputs = {}
-
-    threads = []
-    for analyser in ANALYZERS:
-        thr = Thr(analyser, [text])
-        threads.append(thr)
-        thr.start()
-    for thr in threads:
-        thr.join()
 
-    for name, output in Thr.outputs.items():
-        if isinstance(output, tuple) and not output[0]:
-            output = 'Error'
+    for name, output in outputs.items():
+        output = output_label(output)
         if output == key:
             hits[name] += 1
-        elif output != 'Error':
+        elif output not in ('Error', TIMEOUT):
             if key == '0' or output == '0':
                 errors[name] += 1
             else:
@@ -185,88 +259,438 @@ def process_one_doc(text, key):
     return result_list, hits, errors
 
 
+def process_one_doc(text, key):
+    """Process one document in all analyzers
+    :return result_list: a list of outputs for all analyzers
+    :return hits: a Counter with hits for all analyzers
+    :return errors: a Counter with errors for all analyzers
+    """
+    global ANALYZERS
+
+    Thr.outputs = {}
+    Thr.inputs = {}
+
+    threads = []
+    for analyser in ANALYZERS:
+        thr = Thr(analyser, [text])
+        threads.append(thr)
+        thr.start()
+    for thr in threads:
+        thr.join()
+
+    return score_outputs(Thr.outputs, key)
+
+
 def get_max_weighted_errors(doc_id2key):
     """Determine the maximum possible sum of weighted errors
     """
     max_errors = 0
     for gs_key in doc_id2key.values():
-        if gs_key == '0':
-            max_errors += 1
-        else:
-            max_errors += 2
+        max_errors += get_max_error(gs_key)
     return float(max_errors)
 
 
-def evaluate(doc_id2text, doc_id2key):
+def get_max_error(key):
+    """The weight of the worst possible error for a document with the key
+    """
+    if key == '0':
+        return 1
+    else:
+        return 2
+
+
+def evaluate(docs, journal=None, done=None, store=None, ranking=None,
+             dedup=None, results_fname='results.csv', columns=None, plan=None,
+             manifest=None, previous=None, analyzers=None, workers=None):
     """Send evaluation documents to each API, output all results into a table,
-    and if doc_id2key are available, output accuracy and error rate.
+    and if keys are available, output accuracy and error rate.
+
+    Each analyzer works through the documents independently of the others,
+    rows of the table are written in the order of doc ids as they complete.
+
+    :param docs: an iterable of (doc_id, text, key) tuples, documents are
+    read from it as they are sent
+    :param journal: a Journal to record each output in as soon as it is known
+    :param done: outputs read from the journal of an interrupted run, a dict
+    of doc ids (as strings) to dicts of analyzer names to (label, raw score,
+    latency) tuples, these documents are not sent to the analyzers again
+    :param store: a ScoreStore to collect gold labels, outputs and raw scores
+    of completed documents in, which metrics can be computed on while the
+    run is going
+    :param ranking: a SequentialRanking, analyzers are no longer sent
+    documents once their rank is settled, and their metrics are computed on
+    the documents they were sent
+    :param dedup: a DedupIndex, documents with the same text as an earlier
+    one are not sent to the analyzers but get the outputs of the earlier one
+    :param results_fname: the file to write the table to
+    :param columns: a ColumnWriter to append the labels, raw scores and
+    latencies of each document to as it completes
+    :param plan: a budget.Plan of the documents each analyzer is sent, the
+    metrics of analyzers that are sent a sample are computed on the sample
+    :param manifest: a ManifestWriter to record the outputs for each
+    document in
+    :param previous: the Manifest of a previous run, documents whose text is
+    in it are not sent to the analyzers again but get the outputs recorded
+    for the text
+    :param analyzers: the analyzers to send the documents to, by default
+    ANALYZERS
+    :param workers: a scheduler.WorkerPool shared with other runs, see
+    service.py
     """
-    total_hits = Counter()
-    total_errors = Counter()
     accuracy = Counter()
     error_rate = Counter()
-
-    cvswriter = csv.writer(codecs.open('results.csv', 'wb', 'utf8'), delimiter='\t')
-    col_names = ['doc_id', 'text', 'gold standard'] + [x.name for x in ANALYZERS]
+    if analyzers is None:
+        analyzers = ANALYZERS
+    names = [x.name for x in analyzers]
+    if store is None:
+        store = ScoreStore(names)
+
+    cvswriter = csv.writer(codecs.open(results_fname, 'wb', 'utf8'), delimiter='\t')
+    col_names = ['doc_id', 'text', 'gold standard'] + names
     cvswriter.writerow(col_names)
 
-    for doc_id, text in sorted(doc_id2text.items()):
-        key = doc_id2key.get(doc_id)
-        results, doc_hits, doc_errors = process_one_doc(text, key)
-        if doc_hits:
-            total_hits += doc_hits
-        if doc_errors:
-            total_errors += doc_errors
+    # raw scores and latencies of documents that are not complete yet
+    pending_scores = {}
+    # raw scores and latencies of outputs taken from the journal of an
+    # interrupted run or the manifest of a previous run, by doc ids as strings
+    stored_scores = {}
+    # the labels of those outputs, which the scheduler does not send again
+    done_labels = {}
+    for doc_id, outputs in (done or {}).items():
+        for name, (label, score, latency) in outputs.items():
+            done_labels.setdefault(doc_id, {})[name] = label
+            stored_scores[(doc_id, name)] = score, latency
+    if previous is not None:
+        docs = previous.reuse(docs, done_labels, stored_scores)
+
+    def on_result(doc, name, output, latency, score):
+        pending_scores[(doc[0], name)] = score, latency
+        if journal:
+            journal.write(doc[0], name, output_label(output), latency, score)
+
+    scheduler = Scheduler(analyzers, on_result=on_result, dedup=dedup,
+                          plan=plan, workers=workers)
+    for (doc_id, text, key), outputs in scheduler.run(docs, done_labels):
+        results = [output_label(outputs[name]) for name in names]
+        store.add_doc(doc_id, key)
+        scores = {}
+        latencies = {}
+        for name, label in zip(names, results):
+            scores[name], latencies[name] = pending_scores.pop(
+                (doc_id, name),
+                stored_scores.pop((str(doc_id), name), (None, None)))
+            store.set_output(doc_id, name, label, scores[name])
+            if label == SKIPPED and journal:
+                journal.write(doc_id, name, label, 0.0)
         cvswriter.writerow([doc_id, text, key] + results)
+        if manifest:
+            manifest.write(text, key, dict(zip(names, results)), scores)
+        if columns:
+            columns.append(doc_id, text, key, dict(zip(names, results)),
+                           scores, latencies)
+        if ranking:
+            for name in ranking.add(dict(zip(names, results)), key):
+                scheduler.retire(name)
+        if len(store) % PROGRESS_EVERY == 0:
+            LOGGER.info("Processed %d documents" % len(store))
+
+    name2metrics = store_metrics(store, names)
+    for name in names:
+        accuracy[name] = float(name2metrics[name]['accuracy'])
+        error_rate[name] = float(name2metrics[name]['error_rate'])
+
+    return accuracy, error_rate
 
-    num_docs = float(len(doc_id2text))
-    max_errors = get_max_weighted_errors(doc_id2key)
 
+def print_cache_stats(cache):
+    """Print the number of cache hits and misses for each analyzer
+    """
+    print "%-15s%8s%8s" % ('Analyzer', 'Hits', 'Misses')
     for analyzer in ANALYZERS:
         name = analyzer.name
-        accuracy[name] = total_hits.get(name, 0.0)/num_docs
-        error_rate[name] = total_errors.get(name, 0.0)/max_errors
+        print "%-15s%8d%8d" % (name, cache.hits[name], cache.misses[name])
 
-    return accuracy, error_rate
 
+def print_dedup_stats(dedup):
+    """Print the number of documents that were not sent to the analyzers
+    because they duplicate an earlier one
+    """
+    print "%-15s%10s%10s%8s" % ('Documents', 'Unique', 'Dupes', 'Ratio')
+    print "%-15d%10d%10d%8.3f" % (dedup.num_docs, dedup.num_unique,
+                                  dedup.num_docs - dedup.num_unique,
+                                  dedup.ratio())
 
-def main(eval_data_fname, config_fname):
-    """Main function
+
+def print_throttling_stats():
+    """Print the time each analyzer spent waiting for its rate limit
     """
+    print "%-15s%14s%10s" % ('Analyzer', 'Throttled (s)', 'Backoffs')
+    for analyzer in ANALYZERS:
+        bucket = LIMITERS.get(analyzer)
+        print "%-15s%14.1f%10d" % (analyzer.name, bucket.throttled,
+                                   bucket.backoffs)
+        for worker, seconds in sorted(bucket.throttled_by_thread.items()):
+            LOGGER.info("%s throttled for %.1f s" % (worker, seconds))
 
-    setup_logging()
 
-    # read test data
-    doc_id2text, doc_id2key = read_evaluation_data(eval_data_fname)
+def main(eval_data_fname, config_fname, options=None):
+    """Main function
+    """
+    if options is None:
+        options = parse_args([eval_data_fname])
+
+    setup_logging(options.log)
 
     # read config
     config = read_config(config_fname)
 
     # initialise relevant analysers
-    initialize_analysers(config)
+    initialize_analysers(config, options.analyzers)
+    if options.concurrency:
+        for analyzer in ANALYZERS:
+            analyzer.concurrency = options.concurrency
+    if options.deadline:
+        for analyzer in ANALYZERS:
+            analyzer.deadline = options.deadline
+    if options.chunk_strategy:
+        for analyzer in ANALYZERS:
+            analyzer.chunk_strategy = options.chunk_strategy
+    configure_analysers(config)
+    budget = options.budget
+    if options.shard:
+        # every shard gets its share, so that all shards together stay
+        # within the quotas, rate limits and the budget
+        budget = share(ANALYZERS, budget, options.shard[1])
+    if options.check_credentials:
+        check_analyzers(ANALYZERS)
+
+    docs = iter_evaluation_data(eval_data_fname)
+    if options.shard:
+        total = None
+        if options.shard_by == 'range':
+            total = sum(1 for _ in iter_evaluation_data(eval_data_fname))
+        docs = shard_docs(docs, options.shard[0], options.shard[1],
+                          options.shard_by, total)
+
+    # the outputs for the texts of the previous run
+    previous = None
+    if options.incremental:
+        previous = Manifest(options.manifest)
+
+    # resume from the journal of an interrupted run
+    done = None
+    if options.resume:
+        done = read_journal(options.journal)
+
+    # estimate the cost of the run, and sample the documents sent to
+    # analyzers that it would take over their quotas or the budget
+    plan = None
+    if options.budget is not None or options.plan_only or \
+            any(getattr(x, 'quota', None) is not None or getattr(x, 'cost', 0)
+                for x in ANALYZERS):
+        docs = list(docs)
+        to_send = docs
+        if previous is not None:
+            to_send = [doc for doc in docs if not previous.has_text(doc[1])]
+        # the calls of the interrupted run count against the quotas and the
+        # budget, and the documents it processed are not planned again
+        used = {}
+        if options.resume:
+            used = journal_calls(ANALYZERS, docs, options.journal)
+        plan = Plan(ANALYZERS, to_send, budget, options.seed or 0, done, used)
+        print plan.format()
+        print
+        if options.plan_only:
+            return
+        METERS.reset(budget)
+        for analyzer in ANALYZERS:
+            METERS.record(analyzer, used.get(analyzer.name, 0))
+
+    server = None
+    if options.metrics_port is not None:
+        server = start_server(options.metrics_port)
+
+    # set up the response cache
+    cache = None
+    if options.cache:
+        cache = ResponseCache(options.cache,
+                              max_size=options.cache_size * 1024 * 1024,
+                              cache_only=options.cache_only)
+        for analyzer in ANALYZERS:
+            analyzer.cache = cache
+
+    journal = Journal(options.journal, append=options.resume)
+    columns = None
+    if options.columns:
+        columns = ColumnWriter(options.columns, [x.name for x in ANALYZERS])
+    manifest = ManifestWriter(options.manifest)
 
     # evaluate
-    accuracy, error_rate = evaluate(doc_id2text, doc_id2key)
+    store = ScoreStore([x.name for x in ANALYZERS])
+    ranking = None
+    if options.adaptive:
+        ranking = SequentialRanking([x.name for x in ANALYZERS],
+                                    options.confidence)
+        docs = shuffle_docs(docs, options.order == 'stratified', options.seed)
+    dedup = None
+    if options.dedup != 'none':
+        dedup = DedupIndex(NORMALIZERS[options.dedup])
+    try:
+        evaluate(docs, journal, done, store, ranking, dedup, options.results,
+                 columns, plan, manifest, previous)
+        manifest.close()
+    finally:
+        journal.close()
+        if columns:
+            columns.close()
+
+    # accuracy and error rate, with confidence intervals and the significance
+    # of the differences between analyzers if bootstrapping
+    print format_evaluation(store, replicates=options.bootstrap,
+                            processes=options.processes)
+    if ranking:
+        print
+        print ranking.format()
+
+    if dedup:
+        print
+        print_dedup_stats(dedup)
+
+    if previous is not None:
+        print
+        print previous.format()
 
-    print "%-15s%s" % ('Analyzer', 'Accuracy')
-    for name, score in accuracy.most_common():
-        print "%-15s%.3f" % (name, score)
     print
-    print "%-15s%s" % ('Analyzer', 'Error rate')
-    for name, score in reversed(error_rate.most_common()):
-        print "%-15s%.3f" % (name, score)
-
+    print_throttling_stats()
 
-if __name__ == "__main__":
+    print
+    print INSTRUMENTS.format_summary()
+    if plan:
+        print
+        print METERS.format(INSTRUMENTS.documents)
+    skipped = sum(INSTRUMENTS.skipped.values())
+    if skipped:
+        print
+        print "%d documents were skipped while APIs were failing, run again " \
+              "with --resume to send them" % skipped
+    if server:
+        server.shutdown()
+
+    if cache:
+        print
+        print_cache_stats(cache)
+        cache.close()
+
+
+def parse_analyzers(value):
+    try:
+        return parse_names(value)
+    except ValueError, exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def parse_args(argv):
+    """Parse command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Evaluate sentiment analysis APIs against a gold standard")
+    parser.add_argument('eval_data_fname',
+                        help="path to the text file with annotated data")
+    parser.add_argument('config_fname', nargs='?', default=None,
+                        help="path to the config file")
+    parser.add_argument('--analyzers', type=parse_analyzers, default=None,
+                        help="a comma-separated list of the analyzers to use")
+    parser.add_argument('--check-credentials', action='store_true',
+                        help="send a text to each analyzer before the run to "
+                             "check its credentials")
+    parser.add_argument('--cache', default=None,
+                        help="a file to cache API responses in")
+    parser.add_argument('--no-cache', dest='cache', action='store_const',
+                        const='', help="do not cache API responses")
+    parser.add_argument('--cache-size', type=int, default=512,
+                        help="the maximum size of the cache, in MB")
+    parser.add_argument('--cache-only', action='store_true',
+                        help="only use responses from the cache")
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help="the number of concurrent requests to each API, "
+                             "overridden by <analyzer>_concurrency in the config")
+    parser.add_argument('--deadline', type=float, default=None,
+                        help="give up on a document after this number of "
+                             "seconds, overridden by <analyzer>_deadline in "
+                             "the config")
+    parser.add_argument('--chunk-strategy', choices=STRATEGIES, default=None,
+                        help="how to combine the outputs for the chunks of "
+                             "long documents, overridden by "
+                             "<analyzer>_chunk_strategy in the config")
+    parser.add_argument('--budget', type=float, default=None,
+                        help="the most the calls to the APIs may cost")
+    parser.add_argument('--plan-only', action='store_true',
+                        help="estimate the calls and the cost of the run "
+                             "without running it")
+    parser.add_argument('--journal', default=None,
+                        help="a file to record the output of each analyzer in")
+    parser.add_argument('--resume', action='store_true',
+                        help="resume an interrupted run from its journal")
+    parser.add_argument('--manifest', default=None,
+                        help="a file to record the outputs for each text in")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only send the documents whose text is not in "
+                             "the manifest of the previous run")
+    parser.add_argument('--bootstrap', type=int, default=1000,
+                        help="the number of bootstrap replicates for "
+                             "confidence intervals, 0 to skip them")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="the number of processes to resample in")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="stop sending documents to an analyzer once its "
+                             "rank by accuracy is settled")
+    parser.add_argument('--confidence', type=float, default=0.95,
+                        help="the confidence the ranking is settled with")
+    parser.add_argument('--order', choices=['random', 'stratified'],
+                        default='stratified',
+                        help="the order of documents in an adaptive run")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="the seed for the order of documents and for "
+                             "samples of documents")
+    parser.add_argument('--dedup', choices=['none', 'exact', 'normalized'],
+                        default='normalized',
+                        help="send documents with the same text once")
+    parser.add_argument('--shard', type=parse_shard, default=None,
+                        help="only evaluate shard <i>/<n>, i counting from 0")
+    parser.add_argument('--shard-by', choices=['hash', 'range'],
+                        default='hash',
+                        help="how to assign documents to shards")
+    parser.add_argument('--results', default=None,
+                        help="a file to write the results table to")
+    parser.add_argument('--columns', default=None,
+                        help="a directory to write the results to in columns")
+    parser.add_argument('--no-columns', dest='columns', action='store_const',
+                        const='', help="do not write the results in columns")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="serve metrics of the calls to the APIs on this "
+                             "port")
+    parser.add_argument('--log', default=None,
+                        help="a file to write the log to")
+    options = parser.parse_args(argv)
+    if options.cache_only and not options.cache:
+        parser.error("--cache-only requires a cache")
+    if options.shard and options.adaptive:
+        parser.error("--adaptive ranks analyzers on all documents, it cannot "
+                     "be used with --shard")
+    for option, default in (('cache', 'cache.db'),
+                            ('log', 'compare.log'),
+                            ('journal', 'journal.tsv'),
+                            ('manifest', 'manifest.tsv'),
+                            ('results', 'results.csv'),
+                            ('columns', 'results.cols')):
+        if getattr(options, option) is None:
+            if options.shard:
+                default = shard_fname(default, *options.shard)
+            setattr(options, option, default)
+    return options
 
-    eval_data_fname = None
-    config_fname = None
 
-    if len(sys.argv) > 1:
-        eval_data_fname = sys.argv[1]
-        if len(sys.argv) == 3:
-            config_fname = sys.argv[2]
-    else:
-        raise Exception("Please specify the path to the file with evaluation data")
+if __name__ == "__main__":
 
-    main(eval_data_fname, config_fname)
+    options = parse_args(sys.argv[1:])
+    main(options.eval_data_fname, options.config_fname, options)
@@ -0,0 +1,77 @@
+"""Deadlines for calls to the analyzers, and hedged requests, which send a
+duplicate of a request that takes longer than usual and take the first
+response
+"""
+
+import threading
+import time
+import logging
+import Queue
+
+LOGGER = logging.getLogger('APICompare.Deadline')
+
+# the quantile of latencies after which a request is hedged
+HEDGE_QUANTILE = 0.95
+# the number of requests to a provider before its latencies are used to
+# decide when to hedge
+HEDGE_MIN_CALLS = 20
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call does not return before its deadline
+    """
+
+
+def _start(function, results):
+    def attempt():
+        try:
+            results.put((True, function()))
+        except Exception, exc:
+            results.put((False, exc))
+    thread = threading.Thread(target=attempt)
+    thread.daemon = True
+    thread.start()
+
+
+def run_with_deadline(function, deadline=None, hedge_after=None, hedge=None):
+    """Call a function, giving up after deadline seconds. Calls that are
+    given up on are left to finish in the background, their results are
+    discarded.
+    :param hedge_after: if the call has not returned after this number of
+    seconds, call hedge, and return the result of whichever returns first
+    :param hedge: the function to call as a hedge, function by default
+    :return: the result of the first call to return
+    :raises DeadlineExceeded: if no call returned in time; if all calls fail,
+    the exception of the last one is raised
+    """
+    if deadline is None and hedge_after is None:
+        return function()
+    results = Queue.Queue()
+    start = time.time()
+    _start(function, results)
+    running = 1
+    hedged = hedge_after is None
+    while True:
+        now = time.time()
+        timeout = None
+        if deadline is not None:
+            timeout = start + deadline - now
+        if not hedged:
+            wait = start + hedge_after - now
+            timeout = wait if timeout is None else min(timeout, wait)
+        try:
+            if timeout is not None and timeout <= 0:
+                raise Queue.Empty
+            succeeded, result = results.get(timeout=timeout)
+        except Queue.Empty:
+            if not hedged and time.time() >= start + hedge_after:
+                _start(hedge or function, results)
+                hedged = True
+                running += 1
+                continue
+            raise DeadlineExceeded("No response in %.1f s" % deadline)
+        running -= 1
+        if succeeded:
+            return result
+        if not running:
+            raise result
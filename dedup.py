@@ -0,0 +1,77 @@
+"""An index of the texts of documents, so that each distinct text is sent to
+the analyzers once and its outputs are shared by all its duplicates
+"""
+
+import re
+import hashlib
+import logging
+import unicodedata
+
+LOGGER = logging.getLogger('APICompare.Dedup')
+
+RETWEET_RE = re.compile(r'^(rt\s+@\w+:?\s*)+')
+URL_RE = re.compile(r'https?://\S+|www\.\S+')
+MENTION_RE = re.compile(r'@\w+')
+SPACE_RE = re.compile(r'\s+')
+
+
+def exact_text(text):
+    return text
+
+
+def normalize_text(text):
+    """Normalize the text of a document, so that retweets, copies with other
+    links or mentions and copies that only differ in case, whitespace or
+    Unicode forms are duplicates
+    """
+    if not isinstance(text, unicode):
+        text = text.decode('utf8')
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = RETWEET_RE.sub(u'', text)
+    text = URL_RE.sub(u'<url>', text)
+    text = MENTION_RE.sub(u'<user>', text)
+    return SPACE_RE.sub(u' ', text).strip()
+
+
+NORMALIZERS = {
+    'exact': exact_text,
+    'normalized': normalize_text,
+}
+
+
+class DedupIndex:
+    """Maps the hash of the normalized text of each document to the first
+    document with that text
+    """
+
+    def __init__(self, normalize=normalize_text):
+        self.normalize = normalize
+        self.first = {}
+        self.num_docs = 0
+
+    def lookup(self, seq, text):
+        """Register a document.
+        :param seq: the position of the document in the run
+        :return: the position of the first document with the same text, or
+        None if the text was not seen before
+        """
+        text = self.normalize(text)
+        if isinstance(text, unicode):
+            text = text.encode('utf8')
+        key = hashlib.sha1(text).digest()
+        self.num_docs += 1
+        first = self.first.setdefault(key, seq)
+        if first == seq:
+            return None
+        return first
+
+    @property
+    def num_unique(self):
+        return len(self.first)
+
+    def ratio(self):
+        """:return: the proportion of documents that are duplicates
+        """
+        if not self.num_docs:
+            return 0.0
+        return 1.0 - self.num_unique / float(self.num_docs)
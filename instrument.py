@@ -0,0 +1,330 @@
+"""Instrumentation of the calls to the APIs: latency histograms, requests by
+status, errors by class, requests in flight, bytes transferred and time spent
+throttled, for each provider. The numbers can be scraped in the Prometheus
+text format from a local endpoint while a run is going, and are summarised
+in a table at the end.
+"""
+
+import bisect
+import logging
+import threading
+import time
+import BaseHTTPServer
+from collections import Counter
+
+from budget import METERS
+from ratelimit import LIMITERS
+
+LOGGER = logging.getLogger('APICompare.Instrument')
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Counts of observations in buckets with fixed upper bounds
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        # the last bucket is for observations above all bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile, interpolating within its bucket
+        """
+        if not self.count:
+            return float('nan')
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = self.bounds[i - 1] if i else 0.0
+                if i == len(self.bounds):
+                    return low
+                return low + (self.bounds[i] - low) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+class Call:
+    """A request in flight, see Instruments.call
+    """
+
+    def __init__(self, instruments, provider):
+        self.instruments = instruments
+        self.provider = provider
+        self.status = None
+        self.sent = 0
+        self.received = 0
+
+    def __enter__(self):
+        self.start = time.time()
+        self.instruments._started(self.provider)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        status = self.status
+        if exc_type is not None:
+            status = exc_type.__name__
+        self.instruments._finished(self.provider, time.time() - self.start,
+                                   status, self.sent, self.received)
+        return False
+
+
+class Instruments:
+    """Thread-safe counters of the calls to each provider
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.latencies = {}
+            self.requests = Counter()
+            self.errors = Counter()
+            self.in_flight = Counter()
+            self.peak_in_flight = Counter()
+            self.retries = Counter()
+            self.hedges = Counter()
+            self.timeouts = Counter()
+            self.skipped = Counter()
+            self.sent = Counter()
+            self.received = Counter()
+            self.documents = Counter()
+            self.queues = {}
+
+    def call(self, provider):
+        """Measure a request to a provider, to be used as
+        with INSTRUMENTS.call(name) as call: ... call.status = status
+        :return: a Call, set its status and the number of bytes sent and
+        received; exceptions are recorded as the status, by their class
+        """
+        return Call(self, provider)
+
+    def _started(self, provider):
+        with self.lock:
+            self.in_flight[provider] += 1
+            self.peak_in_flight[provider] = max(self.peak_in_flight[provider],
+                                                self.in_flight[provider])
+
+    def _finished(self, provider, latency, status, sent, received):
+        with self.lock:
+            self.in_flight[provider] -= 1
+            if provider not in self.latencies:
+                self.latencies[provider] = Histogram()
+            self.latencies[provider].observe(latency)
+            self.requests[(provider, str(status))] += 1
+            self.sent[provider] += sent
+            self.received[provider] += received
+
+    def retry(self, provider):
+        with self.lock:
+            self.retries[provider] += 1
+
+    def hedge(self, provider):
+        with self.lock:
+            self.hedges[provider] += 1
+
+    def timed_out(self, provider, num_docs=1):
+        """Count documents an analyzer did not process before its deadline
+        """
+        with self.lock:
+            self.documents[provider] += num_docs
+            self.timeouts[provider] += num_docs
+
+    def skip(self, provider, num_docs=1):
+        """Count documents skipped because the circuit of the analyzer was
+        open
+        """
+        with self.lock:
+            self.skipped[provider] += num_docs
+
+    def quantile(self, provider, q, min_count=1):
+        """Estimate a quantile of the latencies of requests to a provider
+        :return: the quantile in seconds, or None if there were fewer than
+        min_count requests
+        """
+        with self.lock:
+            histogram = self.latencies.get(provider)
+            if histogram is None or histogram.count < min_count:
+                return None
+            return histogram.quantile(q)
+
+    def analysed(self, provider, num_docs=1, exc=None):
+        """Count documents an analyzer processed, or failed to process
+        with the exception exc
+        """
+        with self.lock:
+            self.documents[provider] += num_docs
+            if exc is not None:
+                self.errors[(provider, exc.__class__.__name__)] += num_docs
+
+    def watch_queue(self, provider, queue):
+        """Report the number of documents waiting in the queue of a provider
+        """
+        with self.lock:
+            self.queues[provider] = queue
+
+    def providers(self):
+        names = set(self.latencies) | set(self.documents) | set(self.queues)
+        return sorted(names)
+
+    def render(self):
+        """Format the metrics in the Prometheus text exposition format
+        """
+        lines = []
+
+        def metric(name, kind, help):
+            lines.append('# HELP %s %s' % (name, help))
+            lines.append('# TYPE %s %s' % (name, kind))
+
+        with self.lock:
+            metric('api_request_duration_seconds', 'histogram',
+                   'Latency of requests to the API')
+            for provider, histogram in sorted(self.latencies.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + ('+Inf',),
+                                        histogram.counts):
+                    cumulative += count
+                    lines.append('api_request_duration_seconds_bucket'
+                                 '{provider="%s",le="%s"} %d' %
+                                 (provider, bound, cumulative))
+                lines.append('api_request_duration_seconds_sum'
+                             '{provider="%s"} %f' % (provider, histogram.total))
+                lines.append('api_request_duration_seconds_count'
+                             '{provider="%s"} %d' % (provider, histogram.count))
+            metric('api_requests_total', 'counter',
+                   'Requests by HTTP status or exception class')
+            for (provider, status), count in sorted(self.requests.items()):
+                lines.append('api_requests_total{provider="%s",status="%s"} %d'
+                             % (provider, status, count))
+            metric('api_requests_in_flight', 'gauge', 'Requests in flight')
+            for provider, count in sorted(self.in_flight.items()):
+                lines.append('api_requests_in_flight{provider="%s"} %d' %
+                             (provider, count))
+            metric('api_retries_total', 'counter',
+                   'Requests repeated because the API was overloaded')
+            for provider, count in sorted(self.retries.items()):
+                lines.append('api_retries_total{provider="%s"} %d' %
+                             (provider, count))
+            metric('api_hedged_requests_total', 'counter',
+                   'Duplicate requests sent because a request was slow')
+            for provider, count in sorted(self.hedges.items()):
+                lines.append('api_hedged_requests_total{provider="%s"} %d' %
+                             (provider, count))
+            for name, counter, help in (
+                    ('api_request_bytes_total', self.sent,
+                     'Bytes of request bodies sent'),
+                    ('api_response_bytes_total', self.received,
+                     'Bytes of response bodies received')):
+                metric(name, 'counter', help)
+                for provider, count in sorted(counter.items()):
+                    lines.append('%s{provider="%s"} %d' % (name, provider, count))
+            metric('analyzer_documents_total', 'counter',
+                   'Documents processed by the analyzer')
+            for provider, count in sorted(self.documents.items()):
+                lines.append('analyzer_documents_total{provider="%s"} %d' %
+                             (provider, count))
+            metric('analyzer_errors_total', 'counter',
+                   'Documents the analyzer failed on, by exception class')
+            for (provider, error), count in sorted(self.errors.items()):
+                lines.append('analyzer_errors_total{provider="%s",error="%s"} %d'
+                             % (provider, error, count))
+            metric('analyzer_timeouts_total', 'counter',
+                   'Documents the analyzer did not process before its deadline')
+            for provider, count in sorted(self.timeouts.items()):
+                lines.append('analyzer_timeouts_total{provider="%s"} %d' %
+                             (provider, count))
+            metric('analyzer_skipped_total', 'counter',
+                   'Documents skipped while the circuit of the analyzer was '
+                   'open')
+            for provider, count in sorted(self.skipped.items()):
+                lines.append('analyzer_skipped_total{provider="%s"} %d' %
+                             (provider, count))
+            metric('analyzer_queued_documents', 'gauge',
+                   'Documents waiting to be sent to the analyzer')
+            for provider, queue in sorted(self.queues.items()):
+                lines.append('analyzer_queued_documents{provider="%s"} %d' %
+                             (provider, queue.qsize()))
+        with LIMITERS.lock:
+            buckets = sorted(LIMITERS.buckets.items())
+        metric('api_throttled_seconds_total', 'counter',
+               'Time spent waiting for the rate limit')
+        for provider, bucket in buckets:
+            lines.append('api_throttled_seconds_total{provider="%s"} %f' %
+                         (provider, bucket.throttled))
+        metric('api_backoffs_total', 'counter',
+               'Times the rate was lowered because the API was overloaded')
+        for provider, bucket in buckets:
+            lines.append('api_backoffs_total{provider="%s"} %d' %
+                         (provider, bucket.backoffs))
+        with METERS.lock:
+            spent = sorted(METERS.spent.items())
+        metric('api_spent_total', 'counter', 'The cost of the calls to the API')
+        for provider, amount in spent:
+            lines.append('api_spent_total{provider="%s"} %f' %
+                         (provider, amount))
+        return '\n'.join(lines) + '\n'
+
+    def format_summary(self):
+        """Format a table of the calls to each provider
+        """
+        lines = ["%-15s%10s%8s%10s%9s%10s%10s%10s%10s" % (
+            'Analyzer', 'Requests', 'Errors', 'Timeouts', 'Skipped',
+            'p50 (ms)', 'p99 (ms)', 'In flight', 'MB in')]
+        with self.lock:
+            for provider in self.providers():
+                histogram = self.latencies.get(provider, Histogram())
+                errors = sum(count for (name, _), count in self.errors.items()
+                             if name == provider)
+                lines.append("%-15s%10d%8d%10d%9d%10.0f%10.0f%10d%10.2f" % (
+                    provider, histogram.count, errors, self.timeouts[provider],
+                    self.skipped[provider],
+                    histogram.quantile(0.5) * 1000,
+                    histogram.quantile(0.99) * 1000,
+                    self.peak_in_flight[provider],
+                    self.received[provider] / 1048576.0))
+        return '\n'.join(lines)
+
+
+INSTRUMENTS = Instruments()
+
+
+class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = INSTRUMENTS.render()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(format % args)
+
+
+def start_server(port):
+    """Serve the metrics at http://localhost:<port>/metrics in a background
+    thread
+    :return: the server, call shutdown() to stop it
+    """
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    LOGGER.info("Serving metrics on port %d" % server.server_address[1])
+    return server
@@ -0,0 +1,89 @@
+"""An append-only journal of the outputs of analyzers, used to resume
+interrupted evaluation runs
+"""
+
+import codecs
+import os
+import threading
+import logging
+
+LOGGER = logging.getLogger('APICompare.Journal')
+
+# the number of records after which the journal is flushed to disk
+FLUSH_EVERY = 100
+
+
+class Journal:
+    """Each line of the journal is a tab-separated record of doc_id,
+    analyzer name, label, latency in seconds and the raw score (empty if the
+    analyzer does not return one).
+    """
+
+    def __init__(self, fname, append=False, flush_every=FLUSH_EVERY):
+        """:param append: keep the records already in the journal
+        """
+        self.fname = fname
+        self.flush_every = flush_every
+        self.unflushed = 0
+        self.lock = threading.Lock()
+        self.fh = codecs.open(fname, 'a' if append else 'w', 'utf8')
+
+    def write(self, doc_id, name, label, latency, score=None):
+        score = '' if score is None else repr(float(score))
+        with self.lock:
+            self.fh.write(u'%s\t%s\t%s\t%.4f\t%s\n' % (doc_id, name, label,
+                                                     latency, score))
+            self.unflushed += 1
+            if self.unflushed >= self.flush_every:
+                self._flush()
+
+    def _flush(self):
+        self.fh.flush()
+        os.fsync(self.fh.fileno())
+        self.unflushed = 0
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.fh.close()
+
+
+def iter_journal(fname):
+    """Read the records of a journal.
+    :return: a generator of (doc_id, analyzer name, label, latency, score)
+    tuples, doc_id is a string and score is None if there is none
+    """
+    if not os.path.exists(fname):
+        return
+    for line in codecs.open(fname, 'r', 'utf8'):
+        fields = line.rstrip('\n').split('\t')
+        if len(fields) == 4:
+            # journals written before raw scores were recorded
+            fields.append('')
+        if len(fields) != 5:
+            # the last line may be incomplete if the run was interrupted
+            LOGGER.warning("Skipping malformed journal line %r" % line)
+            continue
+        doc_id, name, label, latency, score = fields
+        try:
+            latency = float(latency)
+            score = float(score) if score else None
+        except ValueError:
+            LOGGER.warning("Skipping malformed journal line %r" % line)
+            continue
+        yield doc_id, name, label, latency, score
+
+
+def read_journal(fname):
+    """Read the outputs recorded in a journal. Errors, timeouts and
+    documents skipped in an adaptive run are left out, so that the documents
+    are sent to the analyzers again.
+    :return done: a dict of doc ids (as strings) to dicts of analyzer names
+    to (label, raw score, latency) tuples
+    """
+    done = {}
+    for doc_id, name, label, latency, score in iter_journal(fname):
+        if label in ('Error', 'Skipped', 'Timeout'):
+            continue
+        done.setdefault(doc_id, {})[name] = label, score, latency
+    return done
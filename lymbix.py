@@ -22,14 +22,17 @@ class Lymbix(API):
         else:
             return '0'
 
-    def analyse(self, text):
+    def analyse_with_score(self, text):
         """Assign the sentiment label for the text.
         :return label: +, -, or 0
+        :return score: the raw score the label is based on, if the API returns
+        one
         """
         params = {'article': text, 'return_fields': [u'article_sentiment']}
         headers = {'Authentication': self.api_key,
                    'Accept': 'application/json',
                    'Version': '2.2'}
-        data = self.get_data(params, headers)
+        data = self.get_data(params, headers, text=text)
         LOGGER.debug("Got response: %r" % data)
-        return self.extract_label(data['article_sentiment']['sentiment'])
+        sentiment = data['article_sentiment']
+        return self.extract_label(sentiment['sentiment']), sentiment.get('score')
@@ -0,0 +1,150 @@
+"""A manifest of the outputs of the analyzers for each document of a run,
+identified by the hash of its text rather than its position in the gold
+standard file, so that a later run on an edited file only sends the
+documents whose text is new or changed to the analyzers. The outputs for
+the other documents are taken from the manifest and scored against their
+current labels, and documents removed from the file are dropped.
+"""
+
+import codecs
+import hashlib
+import logging
+import os
+
+LOGGER = logging.getLogger('APICompare.Manifest')
+
+# outputs that are not reused, so that the documents are sent again
+NOT_REUSED = ('Error', 'Skipped', 'Timeout')
+
+
+def text_hash(text):
+    """The identity of a document across runs: the SHA-1 of its text
+    """
+    if isinstance(text, unicode):
+        text = text.encode('utf8')
+    return hashlib.sha1(text).hexdigest()
+
+
+class ManifestWriter:
+    """Each line of the manifest is a tab-separated record of the hash of a
+    text, its gold label (empty if it has none), an analyzer name, the label
+    the analyzer output and its raw score (empty if there is none).
+
+    The manifest is written to a temporary file that replaces the manifest
+    of the previous run when it is closed, so that an interrupted run
+    leaves the previous manifest in place.
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.tmp_fname = fname + '.tmp'
+        self.fh = codecs.open(self.tmp_fname, 'w', 'utf8')
+
+    def write(self, text, key, labels, scores=None):
+        """Record the outputs for a document
+        :param labels: a dict of analyzer names to their labels
+        :param scores: a dict of analyzer names to raw scores
+        """
+        scores = scores or {}
+        digest = text_hash(text)
+        for name in sorted(labels):
+            score = scores.get(name)
+            score = '' if score is None else repr(float(score))
+            self.fh.write(u'%s\t%s\t%s\t%s\t%s\n' % (digest, key or '', name,
+                                                     labels[name], score))
+
+    def close(self):
+        self.fh.close()
+        if os.path.exists(self.fname):
+            os.remove(self.fname)
+        os.rename(self.tmp_fname, self.fname)
+
+
+class Manifest:
+    """The outputs recorded in the manifest of a previous run
+    """
+
+    def __init__(self, fname):
+        # hashes of texts to their gold labels and to dicts of analyzer names
+        # to (label, raw score) tuples
+        self.keys = {}
+        self.outputs = {}
+        self.seen = set()
+        self.num_reused = 0
+        self.num_relabelled = 0
+        self.num_new = 0
+        if not os.path.exists(fname):
+            LOGGER.warning("There is no manifest %s, sending all documents" %
+                           fname)
+            return
+        for line in codecs.open(fname, 'r', 'utf8'):
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != 5:
+                LOGGER.warning("Skipping malformed manifest line %r" % line)
+                continue
+            digest, key, name, label, score = fields
+            self.keys[digest] = key or None
+            outputs = self.outputs.setdefault(digest, {})
+            if label in NOT_REUSED:
+                continue
+            try:
+                outputs[name] = label, float(score) if score else None
+            except ValueError:
+                LOGGER.warning("Skipping malformed manifest line %r" % line)
+
+    def __len__(self):
+        return len(self.outputs)
+
+    def has_text(self, text):
+        """:return: whether there are outputs for the text in the manifest
+        """
+        return bool(self.outputs.get(text_hash(text)))
+
+    def lookup(self, text, key=None):
+        """Find the outputs for a text, and count it as reused, relabelled or
+        new.
+        :return: a dict of analyzer names to (label, raw score) tuples, empty
+        if the text is not in the manifest
+        """
+        digest = text_hash(text)
+        outputs = self.outputs.get(digest)
+        if outputs is not None:
+            self.seen.add(digest)
+        if not outputs:
+            self.num_new += 1
+            return {}
+        self.num_reused += 1
+        if self.keys[digest] != key:
+            self.num_relabelled += 1
+        return outputs
+
+    def reuse(self, docs, done, scores):
+        """Take the outputs of documents from the manifest as they are read.
+        :param docs: an iterable of (doc_id, text, key) tuples
+        :param done: a dict of doc ids, as strings, to dicts of analyzer
+        names to their labels, see Scheduler.run, which the labels in the
+        manifest are added to
+        :param scores: a dict of (doc id as a string, analyzer name) tuples
+        to (raw score, latency) tuples, which the raw scores in the manifest
+        are added to, with no latency
+        :return: a generator of the documents
+        """
+        for doc in docs:
+            for name, (label, score) in self.lookup(doc[1], doc[2]).items():
+                outputs = done.setdefault(str(doc[0]), {})
+                if name not in outputs:
+                    outputs[name] = label
+                    scores[(str(doc[0]), name)] = score, None
+            yield doc
+
+    @property
+    def num_removed(self):
+        """The number of documents in the manifest that were not in the run
+        """
+        return len(self.outputs) - len(self.seen)
+
+    def format(self):
+        return "Reused the outputs for %d documents (%d relabelled), sent " \
+               "%d new or changed documents, dropped %d removed documents" % (
+                   self.num_reused, self.num_relabelled, self.num_new,
+                   self.num_removed)
@@ -0,0 +1,122 @@
+"""Vectorized evaluation metrics over label codes of many analyzers at once.
+
+Gold labels are an int8 array with one code per document and predictions an
+int8 array with one row per analyzer, using the codes in scores.LABEL_CODES;
+MISSING marks documents without a gold label or without an output, and
+SKIPPED documents an analyzer was not sent, which are left out of its metrics.
+"""
+
+import numpy as np
+
+from scores import LABELS, SKIPPED
+
+NUM_LABELS = len(LABELS)
+
+# the weight of confusing a gold label (row) with a predicted one (column):
+# 1 if one of them is neutral, 2 if positive is confused with negative
+ERROR_WEIGHTS = np.array([[0, 1, 2],
+                          [1, 0, 1],
+                          [2, 1, 0]])
+MAX_ERRORS = ERROR_WEIGHTS.max(axis=1)
+
+
+def confusion_matrices(gold, labels):
+    """Count documents by gold and predicted label for each analyzer.
+    :param gold: an array of gold label codes, of shape (docs,)
+    :param labels: an array of predicted label codes, of shape (analyzers, docs)
+    :return: an array of shape (analyzers, 3, 3), gold labels in rows and
+    predicted labels in columns
+    """
+    labels = np.atleast_2d(labels)
+    num_analyzers = labels.shape[0]
+    valid = (gold >= 0) & (labels >= 0)
+    cells = gold.astype(np.int64) * NUM_LABELS + labels
+    cells += np.arange(num_analyzers)[:, None] * NUM_LABELS * NUM_LABELS
+    counts = np.bincount(cells[valid],
+                         minlength=num_analyzers * NUM_LABELS * NUM_LABELS)
+    return counts.reshape(num_analyzers, NUM_LABELS, NUM_LABELS)
+
+
+def _divide(numerator, denominator):
+    """Divide elementwise, with 0 where the denominator is 0
+    """
+    denominator = np.asarray(denominator, dtype=float)
+    safe = np.where(denominator > 0, denominator, 1.0)
+    return np.where(denominator > 0, numerator / safe, 0.0)
+
+
+def compute_metrics(gold, labels):
+    """Compute all metrics in one pass.
+    :return: a dict of metric names to arrays with one value (or one value
+    per class, in the order of LABELS) per analyzer
+    """
+    labels = np.atleast_2d(labels)
+    matrices = confusion_matrices(gold, labels)
+    evaluated = labels != SKIPPED
+    num_evaluated = evaluated.sum(axis=1)
+    num_gold = (evaluated & (gold >= 0)).sum(axis=1)
+    correct = np.trace(matrices, axis1=1, axis2=2)
+    predicted = matrices.sum(axis=1)
+    actual = matrices.sum(axis=2)
+
+    precision = _divide(np.diagonal(matrices, axis1=1, axis2=2), predicted)
+    recall = _divide(np.diagonal(matrices, axis1=1, axis2=2), actual)
+    f1 = _divide(2 * precision * recall, precision + recall)
+
+    # Cohen's kappa over the documents the analyzer labelled
+    num_labelled = matrices.sum(axis=(1, 2)).astype(float)
+    observed = _divide(correct, num_labelled)
+    expected = _divide((predicted * actual).sum(axis=1), num_labelled ** 2)
+    kappa = _divide(observed - expected, 1 - expected)
+
+    doc_max_errors = np.where(gold >= 0, MAX_ERRORS[np.maximum(gold, 0)], 0)
+    errors = (matrices * ERROR_WEIGHTS).sum(axis=(1, 2))
+    max_errors = (evaluated * doc_max_errors).sum(axis=1)
+
+    return {
+        'confusion': matrices,
+        # outputs missing for a document count as wrong, documents the
+        # analyzer was not sent do not count
+        'accuracy': _divide(correct, num_evaluated),
+        'coverage': _divide(num_labelled, num_gold),
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'macro_f1': f1.mean(axis=1),
+        'kappa': kappa,
+        'error_rate': _divide(errors, max_errors),
+    }
+
+
+def store_metrics(store, names=None):
+    """Compute metrics for the analyzers in a ScoreStore, which may be
+    still filling up during a run
+    :return: a dict of analyzer names to dicts of metric names to values
+    """
+    names = names or store.names
+    results = compute_metrics(store.gold_array(), store.label_matrix(names))
+    return dict((name, dict((metric, values[i])
+                            for metric, values in results.items()))
+                for i, name in enumerate(names))
+
+
+def format_metrics(name2metrics):
+    """Format a table of per-class and overall metrics
+    """
+    header = "%-15s" % 'Analyzer'
+    for label in LABELS:
+        header += "%7s%7s%7s" % ('P(%s)' % label, 'R(%s)' % label,
+                                 'F1(%s)' % label)
+    header += "%10s%8s" % ('Macro F1', 'Kappa')
+    lines = [header]
+    ranked = sorted(name2metrics.items(),
+                    key=lambda item: -item[1]['macro_f1'])
+    for name, values in ranked:
+        line = "%-15s" % name
+        for code in range(NUM_LABELS):
+            line += "%7.3f%7.3f%7.3f" % (values['precision'][code],
+                                         values['recall'][code],
+                                         values['f1'][code])
+        line += "%10.3f%8.3f" % (values['macro_f1'], values['kappa'])
+        lines.append(line)
+    return '\n'.join(lines)
@@ -0,0 +1,202 @@
+"""A local stand-in for the APIs, serving synthetic or recorded responses in
+the format of each provider, with configurable latency, errors and throttling.
+
+Usage:
+
+python mockserver.py [--port <port>] [--latency <s>] [--error-rate <p>]
+                     [--throttle-rate <p>] [--recorded <file>]
+
+Point an analyzer to the server by setting <analyzer>_url to
+http://localhost:<port>/<analyzer>/ in the config.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import urlparse
+import BaseHTTPServer
+import SocketServer
+
+LOGGER = logging.getLogger('APICompare.MockServer')
+
+
+def get_score(text):
+    """A synthetic sentiment score between -1 and 1, the same for the same
+    text every time
+    """
+    if isinstance(text, unicode):
+        text = text.encode('utf8')
+    digest = hashlib.md5(text).hexdigest()
+    return int(digest[:8], 16) / float(0xffffffff) * 2 - 1
+
+
+def get_polarity(score):
+    if score > 0.2:
+        return 'positive'
+    elif score < -0.2:
+        return 'negative'
+    return 'neutral'
+
+
+def skyttle_doc(text):
+    score = get_score(text)
+    return {'sentiment_scores': {'pos': max(score, 0) * 100,
+                                 'neg': max(-score, 0) * 100,
+                                 'neu': (1 - abs(score)) * 100}}
+
+
+def bitext_doc(text, doc_id):
+    return {'id': doc_id, 'global_value': get_score(text) * 2}
+
+
+# functions building the response of each provider from the posted form
+RESPONSES = {
+    'skyttle': lambda form: {
+        'docs': [skyttle_doc(text) for text in form['text']]},
+    'chatterbox': lambda form: {
+        'value': get_score(form['text'][0])},
+    'datumbox': lambda form: {
+        'output': {'result': get_polarity(get_score(form['text'][0]))}},
+    'repustate': lambda form: {
+        'score': get_score(form['text'][0])},
+    'bitext': lambda form: {
+        'data': [bitext_doc(text, doc_id)
+                 for text, doc_id in zip(form['Text'], form['ID'])]},
+    'viralheat': lambda form: {
+        'mood': get_polarity(get_score(form['text'][0])),
+        'prob': abs(get_score(form['text'][0]))},
+    'lymbix': lambda form: {
+        'article_sentiment': {
+            'sentiment': get_polarity(get_score(form['article'][0])).capitalize(),
+            'score': get_score(form['article'][0]) * 10}},
+    'aiapplied': lambda form: {
+        'response': {'data': [
+            {'id': doc['id'],
+             'sentiment_class': get_polarity(get_score(doc['text']))}
+            for doc in json.loads(form['request'][0])['data']['call']['data']]}},
+    'sentigem': lambda form: {
+        'polarity': get_polarity(get_score(form['text'][0]))},
+}
+
+# the form field with the text for each provider, for recorded responses
+TEXT_FIELDS = {
+    'lymbix': 'article',
+    'bitext': 'Text',
+}
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # buffer the response, so that it is sent in one packet
+    wbufsize = -1
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        provider = self.path.strip('/').split('/')[0].lower()
+        with server.lock:
+            server.requests[provider] += 1
+        if server.latency:
+            time.sleep(random.expovariate(1.0 / server.latency))
+        draw = random.random()
+        if provider not in RESPONSES:
+            self.respond(404, {'error': 'Unknown provider %s' % provider})
+        elif draw < server.throttle_rate:
+            self.respond(429, {'error': 'Too many requests'})
+        elif draw < server.throttle_rate + server.error_rate:
+            self.respond(500, {'error': 'Internal server error'})
+        else:
+            form = urlparse.parse_qs(body, keep_blank_values=True)
+            form = dict((key, [value.decode('utf8') for value in values])
+                        for key, values in form.items())
+            self.respond(200, self.get_response(provider, form))
+
+    def get_response(self, provider, form):
+        recorded = self.server.recorded.get(provider, {})
+        texts = form.get(TEXT_FIELDS.get(provider, 'text'), [])
+        if len(texts) == 1 and texts[0] in recorded:
+            return recorded[texts[0]]
+        return RESPONSES[provider](form)
+
+    def respond(self, status, data):
+        body = json.dumps(data)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(format % args)
+
+
+class MockServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Serves the responses of all providers under /<provider name>/
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, throttle_rate=0.0,
+                 recorded=None):
+        """:param latency: the mean of the exponentially distributed delay
+        of responses, in seconds
+        :param error_rate: the probability of a 500 response
+        :param throttle_rate: the probability of a 429 response
+        :param recorded: a dict of provider names to dicts of texts to
+        recorded responses, served instead of synthetic ones
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', port), Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.recorded = recorded or {}
+        self.lock = threading.Lock()
+        self.requests = dict((provider, 0) for provider in RESPONSES)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def url(self, provider):
+        return 'http://127.0.0.1:%d/%s/' % (self.port, provider)
+
+    def start(self):
+        """Serve in a background thread
+        """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Serve mock API responses")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="mean response latency, in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="the proportion of 500 responses")
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help="the proportion of 429 responses")
+    parser.add_argument('--recorded', default=None,
+                        help="a JSON file with recorded responses, as "
+                             "{provider: {text: response}}")
+    options = parser.parse_args()
+
+    recorded = None
+    if options.recorded:
+        with open(options.recorded) as fh:
+            recorded = json.load(fh)
+    server = MockServer(options.port, options.latency, options.error_rate,
+                        options.throttle_rate, recorded)
+    print "Serving on port %d" % server.port
+    server.serve_forever()
@@ -0,0 +1,136 @@
+"""Pools of persistent HTTP connections, one pool per host
+"""
+
+import httplib
+import logging
+import socket
+import threading
+import Queue
+
+LOGGER = logging.getLogger('APICompare.Pool')
+
+# the default maximum number of connections to one host
+POOL_SIZE = 10
+# the default socket timeout, in seconds
+TIMEOUT = 60
+
+
+class HTTPError(Exception):
+    """Raised when the server responds with an HTTP error status
+    """
+
+    def __init__(self, status, reason, body=''):
+        Exception.__init__(self, 'HTTP %d: %s' % (status, reason))
+        self.status = status
+        self.reason = reason
+        self.body = body
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive connections to one host. At most
+    size connections are open at a time, callers wait for a free one.
+    """
+
+    def __init__(self, scheme, host, size=POOL_SIZE, timeout=TIMEOUT):
+        """:param host: host name, optionally followed by :port
+        """
+        if scheme == 'https':
+            self.connection_class = httplib.HTTPSConnection
+        else:
+            self.connection_class = httplib.HTTPConnection
+        self.host = host
+        self.size = size
+        self.timeout = timeout
+        self.slots = threading.Semaphore(size)
+        self.idle = Queue.LifoQueue()
+
+    def grow(self, size):
+        """Allow up to size connections, if that is more than now
+        """
+        for _ in range(size - self.size):
+            self.slots.release()
+        self.size = max(self.size, size)
+
+    def _get_connection(self):
+        try:
+            conn = self.idle.get_nowait()
+        except Queue.Empty:
+            return self.connection_class(self.host, timeout=self.timeout)
+        # the timeout may have been raised since the connection was opened
+        if conn.timeout != self.timeout:
+            conn.timeout = self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(self.timeout)
+        return conn
+
+    def request(self, method, path, body=None, headers=None):
+        """Send a request, reusing an idle connection if there is one.
+        :return: a (status, reason, response body) tuple
+        """
+        self.slots.acquire()
+        try:
+            # an idle connection may have been closed by the server, in which
+            # case the request is retried once on a new connection
+            for attempt in range(2):
+                fresh = self.idle.empty()
+                conn = self._get_connection()
+                try:
+                    conn.request(method, path, body, headers or {})
+                    response = conn.getresponse()
+                    contents = response.read()
+                except (httplib.HTTPException, socket.error), exc:
+                    conn.close()
+                    if fresh or attempt:
+                        raise
+                    LOGGER.debug("Stale connection to %s: %r" % (self.host, exc))
+                    continue
+                if response.will_close:
+                    conn.close()
+                else:
+                    self.idle.put(conn)
+                return response.status, response.reason, contents
+        finally:
+            self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except Queue.Empty:
+                break
+
+
+class PoolManager:
+    """Keeps one ConnectionPool per (scheme, host), shared by the analyzers
+    of APIs on the same host. If they ask for different sizes or timeouts,
+    the pool gets the largest of each.
+    """
+
+    def __init__(self):
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def get(self, scheme, host, size=POOL_SIZE, timeout=TIMEOUT):
+        with self.lock:
+            key = (scheme, host)
+            if key not in self.pools:
+                self.pools[key] = ConnectionPool(scheme, host, size, timeout)
+                return self.pools[key]
+            pool = self.pools[key]
+            if size > pool.size or timeout > pool.timeout:
+                LOGGER.warning("Conflicting settings for the connections to "
+                               "%s: size %d and timeout %s, was size %d and "
+                               "timeout %s; using the largest" %
+                               (host, size, timeout, pool.size, pool.timeout))
+                pool.grow(size)
+                pool.timeout = max(pool.timeout, timeout)
+            return pool
+
+    def close(self):
+        with self.lock:
+            for pool in self.pools.values():
+                pool.close()
+            self.pools = {}
+
+
+POOLS = PoolManager()
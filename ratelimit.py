@@ -0,0 +1,117 @@
+"""Token-bucket rate limiting per provider, with adaptive backoff
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+
+LOGGER = logging.getLogger('APICompare.RateLimit')
+
+# HTTP statuses that signal that the provider is overloaded
+BACKOFF_STATUSES = (429, 503)
+# the initial and maximum delay after a provider signals it is overloaded
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+# the lowest fraction of the declared rate that backoff reduces the rate to
+MIN_RATE_FACTOR = 0.1
+
+
+def parse_rate_limit(value):
+    """Parse a rate limit given as <calls>/<seconds>, e.g. 1/5
+    :return: a (calls, seconds) tuple, or None if there is no limit
+    """
+    value = value.strip()
+    if not value or value.lower() == 'none':
+        return None
+    calls, _, seconds = value.partition('/')
+    return float(calls), float(seconds or 1)
+
+
+class TokenBucket:
+    """Allows calls at a steady rate, with bursts of up to capacity calls.
+    When the provider reports it is overloaded, the rate is reduced and calls
+    are paused for an exponentially growing delay; successful calls restore
+    the rate gradually.
+    """
+
+    def __init__(self, rate_limit=None, capacity=1):
+        """:param rate_limit: a (calls, seconds) tuple, or None for no limit
+        """
+        self.rate = None
+        if rate_limit:
+            calls, seconds = rate_limit
+            self.rate = float(calls) / seconds
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.time()
+        self.factor = 1.0
+        self.delay = MIN_BACKOFF
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+        # seconds spent waiting, in total and by thread name
+        self.throttled = 0.0
+        self.throttled_by_thread = Counter()
+        self.backoffs = 0
+
+    def acquire(self):
+        """Wait until a call is allowed.
+        :return: the number of seconds waited
+        """
+        with self.lock:
+            now = time.time()
+            wait = 0.0
+            if self.rate:
+                rate = self.rate * self.factor
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.updated) * rate)
+                self.updated = now
+                self.tokens -= 1
+                if self.tokens < 0:
+                    wait = -self.tokens / rate
+            wait = max(wait, self.blocked_until - now)
+            if wait > 0:
+                self.throttled += wait
+                self.throttled_by_thread[threading.current_thread().name] += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def backoff(self):
+        """Slow down after the provider reported that it is overloaded
+        """
+        with self.lock:
+            self.backoffs += 1
+            self.factor = max(MIN_RATE_FACTOR, self.factor / 2)
+            self.blocked_until = max(self.blocked_until, time.time() + self.delay)
+            LOGGER.warning("Backing off for %.1f s" % self.delay)
+            self.delay = min(MAX_BACKOFF, self.delay * 2)
+
+    def succeeded(self):
+        """Speed up again after a successful call
+        """
+        with self.lock:
+            self.delay = MIN_BACKOFF
+            self.factor = min(1.0, self.factor * 1.1)
+
+
+class Limiters:
+    """Keeps one TokenBucket per provider
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def get(self, analyzer):
+        """Get the bucket of the analyzer, created from its rate_limit
+        attribute when first used
+        """
+        with self.lock:
+            if analyzer.name not in self.buckets:
+                rate_limit = getattr(analyzer, 'rate_limit', None)
+                self.buckets[analyzer.name] = TokenBucket(rate_limit)
+            return self.buckets[analyzer.name]
+
+
+LIMITERS = Limiters()
@@ -0,0 +1,149 @@
+"""A registry of the analyzers: their names mapped to the modules and classes
+that implement them and the config keys of their arguments. The module of an
+analyzer is only imported when the analyzer is selected, so that runs with a
+few analyzers do not load the others or their dependencies, e.g. the
+Semantria SDK.
+"""
+
+import importlib
+import logging
+import threading
+
+from breaker import classify, FATAL
+
+LOGGER = logging.getLogger('APICompare.Registry')
+
+# analyzer names to (module, class, {argument: config key}) tuples
+REGISTRY = {
+    'skyttle': ('skyttle', 'Skyttle',
+                {'mashape_auth': 'mashape_auth', 'language': 'language'}),
+    'chatterbox': ('chatterbox', 'Chatterbox',
+                   {'mashape_auth': 'mashape_auth', 'language': 'language'}),
+    'datumbox': ('datumbox', 'Datumbox', {'api_key': 'datumbox_key'}),
+    'repustate': ('repustate', 'Repustate', {'api_key': 'repustate_key'}),
+    'bitext': ('bitext', 'Bitext',
+               {'user': 'bitext_user', 'password': 'bitext_pwd',
+                'language': 'language'}),
+    'semantria': ('semantria_api', 'Semantria',
+                  {'consumer_key': 'semantria_consumer_key',
+                   'consumer_secret': 'semantria_consumer_secret'}),
+    'viralheat': ('viralheat', 'Viralheat', {'api_key': 'viralheat_key'}),
+    'lymbix': ('lymbix', 'Lymbix', {'api_key': 'lymbix_key'}),
+    'aiapplied': ('aiapplied', 'AIApplied',
+                  {'api_key': 'aiapplied_key', 'language': 'language'}),
+    'sentigem': ('sentigem', 'Sentigem', {'api_key': 'sentigem_key'}),
+}
+
+# the text sent to each analyzer to check its credentials
+CHECK_TEXT = u'This is good.'
+
+
+def register(name, module, class_name, arguments=None):
+    """Add an analyzer to the registry
+    :param arguments: a dict of the arguments of the class to the config
+    keys they are read from
+    """
+    REGISTRY[name] = (module, class_name, arguments or {})
+
+
+def parse_names(value):
+    """Parse a comma-separated list of analyzer names
+    :return: a list of names, empty if none are given
+    """
+    names = [name.strip().lower() for name in (value or '').split(',')]
+    names = [name for name in names if name]
+    unknown = [name for name in names if name not in REGISTRY]
+    if unknown:
+        raise ValueError("Unknown analyzers %s, choose from %s" %
+                         (', '.join(unknown), ', '.join(sorted(REGISTRY))))
+    return names
+
+
+def missing_settings(names, config):
+    """:return: the config keys that the analyzers need and are not set
+    """
+    missing = []
+    for name in names:
+        for key in sorted(REGISTRY[name][2].values()):
+            if not config.get(key) and key not in missing:
+                missing.append(key)
+    return missing
+
+
+def load_class(name):
+    """Import the module of an analyzer
+    :return: the class of the analyzer
+    """
+    module, class_name, _ = REGISTRY[name]
+    return getattr(importlib.import_module(module), class_name)
+
+
+def check_credentials(analyzer):
+    """Send a short text to the analyzer, raising the error if the API
+    rejected the credentials or the quota is used up
+    """
+    try:
+        analyzer.analyse(CHECK_TEXT)
+    except Exception, exc:
+        if classify(exc) == FATAL:
+            raise
+        LOGGER.warning("Could not check the credentials of %s: %r" %
+                       (analyzer.name, exc))
+
+
+def build_analyzer(name, config):
+    """Import and construct an analyzer
+    """
+    cls = load_class(name)
+    arguments = dict((argument, config[key]) for argument, key
+                     in REGISTRY[name][2].items())
+    return cls(**arguments)
+
+
+def _in_threads(function, items):
+    """Call the function with each of the items, each in its own thread
+    :return: a list of the results, in the order of the items
+    :raises: the exception of the first item that failed
+    """
+    results = [None] * len(items)
+
+    def call(i):
+        try:
+            results[i] = function(items[i])
+        except Exception, exc:
+            results[i] = exc
+
+    threads = [threading.Thread(target=call, args=(i,))
+               for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for item, result in zip(items, results):
+        if isinstance(result, Exception):
+            LOGGER.error("%s failed: %r" % (getattr(item, 'name', item),
+                                            result))
+            raise result
+    return results
+
+
+def build_analyzers(names, config):
+    """Build the analyzers in parallel.
+    :param names: the names of the analyzers, in the order they are returned
+    :return: a list of analyzers
+    :raises ValueError: if settings the analyzers need are missing from the
+    config, before any analyzer is built
+    """
+    names = parse_names(','.join(names))
+    missing = missing_settings(names, config)
+    if missing:
+        raise ValueError("Missing settings in the config: %s" %
+                         ', '.join(missing))
+    return _in_threads(lambda name: build_analyzer(name, config), names)
+
+
+def check_analyzers(analyzers):
+    """Check the credentials of the analyzers in parallel, see
+    check_credentials
+    """
+    _in_threads(check_credentials, analyzers)
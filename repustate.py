@@ -24,11 +24,15 @@ class Repustate(API):
         else:
             return '-'
 
-    def analyse(self, text):
+    score_label = extract_label
+
+    def analyse_with_score(self, text):
         """Assign the sentiment label for the text.
         :return label: +, -, or 0
+        :return score: the raw score the label is based on
         """
         params = {'text': text, 'lang': self.language}
-        data = self.get_data(params)
+        data = self.get_data(params, text=text)
         LOGGER.debug("Got response: %r" % data)
-        return self.extract_label(data['score'])
+        score = data['score']
+        return self.extract_label(score), score
@@ -0,0 +1,579 @@
+"""A pipelined scheduler that runs every analyzer on its own queue of documents
+"""
+
+import threading
+import logging
+import time
+import Queue
+from collections import deque
+
+from breaker import CircuitOpen, classify, get_breaker, DOCUMENT
+from budget import QuotaExhausted
+from chunking import analyse_chunks, analyse_in_parallel
+from deadline import run_with_deadline, DeadlineExceeded
+from instrument import INSTRUMENTS
+
+LOGGER = logging.getLogger('APICompare.Scheduler')
+
+# the number of documents a fast analyzer may run ahead of the slowest one
+MAX_AHEAD = 10000
+# the output of an analyzer that was retired before it got the document, or
+# whose circuit was open
+SKIPPED = 'Skipped'
+# the output of an analyzer that did not process the document before its
+# deadline
+TIMEOUT = 'Timeout'
+# the raw score of an output that a first document did not get from a worker
+# in the run, e.g. from the journal of a resumed run
+NOT_SENT = object()
+
+
+class Lane:
+    """The documents of one run queued for an analyzer, with the queue their
+    outputs are sent to and the set of the names of the analyzers retired in
+    the run
+    """
+
+    def __init__(self, results, retired, max_ahead=MAX_AHEAD, analyzer=None):
+        """:param analyzer: the analyzer of the run to send the documents
+        to, if it is not the one the workers were started with, e.g. the
+        same provider for another language or domain
+        """
+        self.results = results
+        self.retired = retired
+        self.max_ahead = max_ahead
+        self.analyzer = analyzer
+        self.tasks = deque()
+
+
+class FairQueue:
+    """The queue of one analyzer, with a lane for each run that is sending it
+    documents. The workers of the analyzer take documents from the lanes in
+    turn, so that concurrent runs get equal shares of its workers.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.lanes = []
+        self.next = 0
+        self.closed = False
+
+    def add_lane(self, lane):
+        with self.cond:
+            self.lanes.append(lane)
+
+    def remove_lane(self, lane):
+        """Remove the lane of a run, with the documents still in it
+        """
+        with self.cond:
+            if lane in self.lanes:
+                self.lanes.remove(lane)
+            self.cond.notify_all()
+
+    def put(self, lane, task):
+        """Queue a document, waiting while the lane is full
+        """
+        with self.cond:
+            while len(lane.tasks) >= lane.max_ahead and lane in self.lanes:
+                self.cond.wait()
+            lane.tasks.append(task)
+            self.cond.notify_all()
+
+    def get(self):
+        """Take the next document, from the lane after the one the previous
+        document was taken from
+        :return: a (lane, task) tuple, or None once the queue is closed and
+        empty
+        """
+        with self.cond:
+            while True:
+                for i in range(len(self.lanes)):
+                    index = (self.next + i) % len(self.lanes)
+                    lane = self.lanes[index]
+                    if lane.tasks:
+                        self.next = index + 1
+                        self.cond.notify_all()
+                        return lane, lane.tasks.popleft()
+                if self.closed:
+                    return None
+                self.cond.wait()
+
+    def get_nowait(self, lane):
+        """Take the next document of a lane if there is one
+        :raises Queue.Empty: if there is none
+        """
+        with self.cond:
+            if not lane.tasks:
+                raise Queue.Empty()
+            self.cond.notify_all()
+            return lane.tasks.popleft()
+
+    def qsize(self):
+        with self.cond:
+            return sum(len(lane.tasks) for lane in self.lanes)
+
+    def close(self):
+        """Let the workers stop once the queue is empty
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class Worker(threading.Thread):
+    """A thread that takes documents off the queue of one analyzer and sends
+    (seq, analyzer name, output, latency, score) tuples to the results
+    queue of the run they came from. Analyzers that implement
+    analyse_batch(texts) get documents in batches.
+    """
+
+    def __init__(self, analyzer, tasks, breaker=None):
+        """:param tasks: the FairQueue of the analyzer
+        :param breaker: the CircuitBreaker of the analyzer, shared by its
+        workers
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.analyzer = analyzer
+        self.tasks = tasks
+        self.deadline = getattr(analyzer, 'deadline', None)
+        self.breaker = breaker or get_breaker(analyzer)
+
+    def use(self, lane):
+        """Send the next documents to the analyzer of their lane, if it has
+        one
+        """
+        if lane.analyzer is not None and lane.analyzer is not self.analyzer:
+            self.analyzer = lane.analyzer
+            self.deadline = getattr(lane.analyzer, 'deadline', None)
+
+    def skip(self, lane, seq):
+        lane.results.put((seq, self.analyzer.name, SKIPPED, 0.0, None))
+
+    def exhausted(self, lane, exc):
+        """Retire the analyzer once its quota or the budget is used up
+        """
+        if self.analyzer.name not in lane.retired:
+            LOGGER.warning("Stopping %s: %s" % (self.analyzer.name, exc))
+            lane.retired.add(self.analyzer.name)
+
+    def call(self, analyse):
+        """Call the analyzer through its circuit breaker. The deadline is
+        for the document, so each attempt only gets the time that is left.
+        """
+        if self.deadline is None:
+            return self.breaker.call(analyse)
+        end = time.time() + self.deadline
+
+        def attempt():
+            left = end - time.time()
+            if left <= 0:
+                raise DeadlineExceeded("No response in %.1f s" %
+                                       self.deadline)
+            return run_with_deadline(analyse, left)
+
+        return self.breaker.call(attempt)
+
+    def log_error(self, exc):
+        """Log errors with documents in full, and provider failures, which
+        may repeat for many documents, in one line
+        """
+        if classify(exc) == DOCUMENT:
+            LOGGER.exception(exc)
+        else:
+            LOGGER.warning("%s failed: %r" % (self.analyzer.name, exc))
+
+    def run(self):
+        if hasattr(self.analyzer, 'analyse_batch') and \
+                self.analyzer.batch_size > 1:
+            self.run_batches(self.analyzer.batch_size)
+        else:
+            self.run_single()
+
+    def analyse(self, lane, seq, text):
+        """Send one document. The raw score is None unless the analyzer
+        implements analyse_with_score(text). Documents longer than the
+        max_length of the analyzer are split into chunks, which are sent
+        concurrently, see chunking.py. Documents are skipped once the
+        analyzer is retired, has used up its quota or the budget (see
+        budget.py), or while its circuit is open, so that a resumed run
+        sends them again. The output for a document that is not processed
+        before the deadline is TIMEOUT.
+        """
+        if self.analyzer.name in lane.retired:
+            self.skip(lane, seq)
+            return
+        start = time.time()
+        score = None
+        if hasattr(self.analyzer, 'analyse_with_score'):
+            analyse_text = self.analyzer.analyse_with_score
+        else:
+            analyse_text = lambda text: (self.analyzer.analyse(text), None)
+        analyse = lambda: analyse_chunks(
+            self.analyzer, [text],
+            lambda texts: analyse_in_parallel(analyse_text, texts))[0]
+        try:
+            output, score = self.call(analyse)
+        except CircuitOpen:
+            INSTRUMENTS.skip(self.analyzer.name)
+            self.skip(lane, seq)
+            return
+        except QuotaExhausted, exc:
+            self.exhausted(lane, exc)
+            self.skip(lane, seq)
+            return
+        except DeadlineExceeded, exc:
+            LOGGER.warning("%s: %s" % (self.analyzer.name, exc))
+            output = TIMEOUT
+            INSTRUMENTS.timed_out(self.analyzer.name)
+        except Exception, exc:
+            self.log_error(exc)
+            output = (None, exc)
+            INSTRUMENTS.analysed(self.analyzer.name, exc=exc)
+        else:
+            INSTRUMENTS.analysed(self.analyzer.name)
+        latency = time.time() - start
+        lane.results.put((seq, self.analyzer.name, output, latency, score))
+
+    def run_single(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            lane, (seq, text) = task
+            self.use(lane)
+            self.analyse(lane, seq, text)
+
+    def analyse_batches(self, texts):
+        """Send the texts in batches of up to batch_size
+        :return: a list of (label, raw score) tuples
+        """
+        outputs = []
+        batch_size = self.analyzer.batch_size
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            if hasattr(self.analyzer, 'analyse_batch_with_scores'):
+                outputs += self.analyzer.analyse_batch_with_scores(batch)
+            else:
+                outputs += [(output, None) for output
+                            in self.analyzer.analyse_batch(batch)]
+        return outputs
+
+    def run_batches(self, batch_size):
+        """Send the documents of a run that are already queued in batches of
+        up to batch_size, falling back to one document at a time if a batch
+        fails. The raw scores are None unless the analyzer implements
+        analyse_batch_with_scores(texts). Batches are skipped as documents
+        are in analyse(), and the output for all the documents of a batch
+        that is not processed before the deadline is TIMEOUT.
+        """
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            lane, task = task
+            self.use(lane)
+            batch = [task]
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self.tasks.get_nowait(lane))
+                except Queue.Empty:
+                    break
+            if self.analyzer.name in lane.retired:
+                for seq, _ in batch:
+                    self.skip(lane, seq)
+                continue
+            texts = [text for _, text in batch]
+            start = time.time()
+            analyse = lambda: analyse_chunks(self.analyzer, texts,
+                                             self.analyse_batches)
+            try:
+                outputs = self.call(analyse)
+            except CircuitOpen:
+                INSTRUMENTS.skip(self.analyzer.name, len(batch))
+                for seq, _ in batch:
+                    self.skip(lane, seq)
+                continue
+            except QuotaExhausted, exc:
+                self.exhausted(lane, exc)
+                for seq, _ in batch:
+                    self.skip(lane, seq)
+                continue
+            except DeadlineExceeded, exc:
+                LOGGER.warning("%s: %s" % (self.analyzer.name, exc))
+                INSTRUMENTS.timed_out(self.analyzer.name, len(batch))
+                for seq, _ in batch:
+                    lane.results.put((seq, self.analyzer.name, TIMEOUT,
+                                      time.time() - start, None))
+                continue
+            except Exception, exc:
+                self.log_error(exc)
+                for seq, text in batch:
+                    self.analyse(lane, seq, text)
+                continue
+            latency = time.time() - start
+            INSTRUMENTS.analysed(self.analyzer.name, len(batch))
+            for (seq, _), (output, score) in zip(batch, outputs):
+                lane.results.put((seq, self.analyzer.name, output, latency,
+                                  score))
+
+
+class WorkerPool:
+    """The workers of analyzers, which may be shared by several runs. Each
+    analyzer has a fixed number of workers, set by its concurrency
+    attribute, taking the documents of all runs from its FairQueue, and a
+    circuit breaker shared by all its workers. Analyzers with the same name,
+    e.g. for different languages or domains, share the workers started for
+    the first one, which send the documents of each run to the analyzer of
+    the run.
+    """
+
+    def __init__(self, analyzers=()):
+        self.lock = threading.Lock()
+        # analyzer names to their queues and breakers
+        self.queues = {}
+        self.breakers = {}
+        self.workers = []
+        for analyzer in analyzers:
+            self.add(analyzer)
+
+    def add(self, analyzer):
+        """Start the workers of an analyzer, unless they are running
+        """
+        with self.lock:
+            if analyzer.name in self.queues:
+                return
+            tasks = FairQueue()
+            self.queues[analyzer.name] = tasks
+            INSTRUMENTS.watch_queue(analyzer.name, tasks)
+            breaker = get_breaker(analyzer)
+            self.breakers[analyzer.name] = breaker
+            for i in range(max(1, getattr(analyzer, 'concurrency', 1))):
+                worker = Worker(analyzer, tasks, breaker)
+                worker.name = '%s-%d' % (analyzer.name, i)
+                worker.start()
+                self.workers.append(worker)
+
+    def lane(self, analyzer, results, retired, max_ahead=MAX_AHEAD):
+        """Open a lane for a run in the queue of an analyzer
+        :return: the FairQueue and the Lane
+        """
+        self.add(analyzer)
+        tasks = self.queues[analyzer.name]
+        lane = Lane(results, retired, max_ahead, analyzer)
+        tasks.add_lane(lane)
+        return tasks, lane
+
+    def close(self):
+        """Stop the workers once their queues are empty
+        """
+        with self.lock:
+            for tasks in self.queues.values():
+                tasks.close()
+            for breaker in self.breakers.values():
+                breaker.stop()
+        for worker in self.workers:
+            worker.join()
+
+
+class Scheduler:
+    """Send documents to all analyzers, letting each one proceed at its own
+    pace, and yield the outputs in the order the documents came in.
+
+    Each analyzer has a fixed number of workers sharing its queue, set by its
+    concurrency attribute, so that many requests to a provider can be in
+    flight without starting a thread per request. The workers are started
+    for the run, or taken from a WorkerPool shared with other runs.
+
+    Transient failures of an analyzer are retried, and after repeated
+    failures its circuit opens and documents are skipped, see breaker.py.
+
+    With a DedupIndex, only the first document with a given text is sent to
+    the analyzers, and its outputs are copied to the later duplicates.
+    """
+
+    def __init__(self, analyzers, max_ahead=MAX_AHEAD, on_result=None,
+                 dedup=None, plan=None, workers=None):
+        """:param on_result: a function called with (doc, analyzer name,
+        output, latency, raw score) as soon as an analyzer has processed a
+        document, with a latency of 0 for duplicates
+        :param dedup: a DedupIndex, or None to send every document
+        :param plan: a budget.Plan, the output of analyzers for documents
+        that it does not send them is SKIPPED
+        :param workers: a WorkerPool shared with other runs, or None to start
+        workers for the run and stop them at the end
+        """
+        self.analyzers = analyzers
+        self.max_ahead = max_ahead
+        self.on_result = on_result
+        self.dedup = dedup
+        self.plan = plan
+        self.workers = workers
+        self.retired = set()
+        # guards the outputs of the first documents with a text and the
+        # lists of their duplicates
+        self.lock = threading.Lock()
+        # positions of first documents to their outputs while they are
+        # pending, then to a tuple of the output and raw score of each
+        # analyzer, which takes less memory
+        self.first_outputs = {}
+        # positions of pending first documents to dicts of the raw scores
+        # of the outputs they got from the workers, and to the positions of
+        # their duplicates
+        self.first_scores = {}
+        self.duplicates = {}
+
+    def retire(self, name):
+        """Stop sending documents to an analyzer, its output for the
+        documents it has not processed yet is SKIPPED
+        """
+        self.retired.add(name)
+
+    def _feed(self, docs, queues, pending, state, done):
+        """Put every document on the queue of every analyzer, except those
+        that the analyzer has already processed, until all analyzers are
+        retired
+        """
+        names = set(analyzer.name for analyzer in self.analyzers)
+        seq = 0
+        try:
+            for doc in docs:
+                if self.retired >= names:
+                    break
+                outputs = dict((name, output) for name, output
+                               in done.get(str(doc[0]), {}).items()
+                               if name in names)
+                for name in list(self.retired):
+                    outputs.setdefault(name, SKIPPED)
+                if self.plan is not None:
+                    for name in names:
+                        if not self.plan.selects(name, doc[0]):
+                            outputs.setdefault(name, SKIPPED)
+                first = None
+                if self.dedup is not None:
+                    first = self.dedup.lookup(seq, doc[1])
+                if first is None:
+                    with self.lock:
+                        if self.dedup is not None:
+                            self.first_outputs[seq] = outputs
+                            self.first_scores[seq] = {}
+                        pending[seq] = [doc, outputs]
+                    for analyzer, (tasks, lane) in zip(self.analyzers, queues):
+                        if analyzer.name not in outputs:
+                            tasks.put(lane, (seq, doc[1]))
+                else:
+                    self._copy_outputs(first, seq, doc, outputs, pending)
+                seq += 1
+        finally:
+            state['total'] = seq
+            # wake up the collector in case it is waiting for more results
+            self.results.put(None)
+
+    def _copy_outputs(self, first, seq, doc, outputs, pending):
+        """Give a duplicate the outputs its first document already has, and
+        the rest as they come in. The outputs the first document got from
+        the workers are put on the results queue for the duplicate, with a
+        latency of 0, so that they are reported to on_result.
+        """
+        with self.lock:
+            record = self.first_outputs[first]
+            if isinstance(record, tuple):
+                names = [analyzer.name for analyzer in self.analyzers]
+                scores = dict(zip(names, record[1::2]))
+                record = dict(zip(names, record[::2]))
+            else:
+                scores = self.first_scores[first]
+                self.duplicates.setdefault(first, []).append(seq)
+            sent = []
+            for name, output in record.items():
+                if name in outputs:
+                    continue
+                if scores.get(name, NOT_SENT) is NOT_SENT:
+                    outputs[name] = output
+                else:
+                    sent.append((seq, name, output, 0.0, scores[name]))
+            pending[seq] = [doc, outputs]
+        for result in sent:
+            self.results.put(result)
+
+    def _compact(self, seq, outputs):
+        """Keep only the outputs and raw scores of a first document once it
+        is done, for its later duplicates
+        """
+        with self.lock:
+            if seq not in self.first_outputs:
+                return
+            scores = self.first_scores.pop(seq)
+            self.duplicates.pop(seq, None)
+            record = []
+            for analyzer in self.analyzers:
+                record += [outputs[analyzer.name],
+                           scores.get(analyzer.name, NOT_SENT)]
+            self.first_outputs[seq] = tuple(record)
+
+    def run(self, docs, done=None):
+        """Process the documents.
+        :param docs: an iterable of (doc_id, text, key) tuples
+        :param done: a dict of doc ids, as strings, to dicts of outputs of
+        analyzers that have already processed the documents
+        :return: a generator of ((doc_id, text, key), outputs) tuples, where
+        outputs maps analyzer names to their outputs, in the order of docs;
+        the output of an analyzer for documents it was not sent because it
+        was retired, or while its circuit was open, is SKIPPED
+        """
+        self.results = Queue.Queue()
+        workers = self.workers or WorkerPool(self.analyzers)
+        queues = [workers.lane(analyzer, self.results, self.retired,
+                               self.max_ahead)
+                  for analyzer in self.analyzers]
+        try:
+            for item in self._collect(docs, queues, done):
+                yield item
+        finally:
+            for tasks, lane in queues:
+                tasks.remove_lane(lane)
+            if workers is not self.workers:
+                workers.close()
+
+    def _collect(self, docs, queues, done):
+        """Feed the documents to the queues of the analyzers in a thread, and
+        yield them with their outputs in order as the outputs come in
+        """
+        pending = {}
+        state = {'total': None}
+        feeder = threading.Thread(target=self._feed,
+                                  args=(docs, queues, pending, state,
+                                        {} if done is None else done))
+        feeder.daemon = True
+        feeder.start()
+
+        num_analyzers = len(self.analyzers)
+        next_seq = 0
+        while True:
+            while next_seq in pending and \
+                    len(pending[next_seq][1]) == num_analyzers:
+                doc, outputs = pending.pop(next_seq)
+                self._compact(next_seq, outputs)
+                next_seq += 1
+                yield doc, outputs
+            if state['total'] is not None and next_seq >= state['total']:
+                break
+            result = self.results.get()
+            if result is None:
+                continue
+            seq, name, output, latency, score = result
+            with self.lock:
+                pending[seq][1][name] = output
+                if seq in self.first_scores:
+                    self.first_scores[seq][name] = score
+                duplicates = [dup for dup in self.duplicates.get(seq, ())
+                              if dup in pending and
+                              name not in pending[dup][1]]
+                for dup in duplicates:
+                    pending[dup][1][name] = output
+            if self.on_result and output is not SKIPPED:
+                self.on_result(pending[seq][0], name, output, latency, score)
+                for dup in duplicates:
+                    self.on_result(pending[dup][0], name, output, 0.0, score)
+
+        feeder.join()
@@ -0,0 +1,126 @@
+"""A compact store of gold labels and the labels and raw scores output by the
+analyzers, one row per document
+"""
+
+import math
+from array import array
+
+import numpy as np
+
+from journal import iter_journal
+from scheduler import SKIPPED as SKIPPED_OUTPUT, TIMEOUT as TIMEOUT_OUTPUT
+
+LABELS = ['-', '0', '+']
+LABEL_CODES = {'-': 0, '0': 1, '+': 2}
+# the code for documents without a gold label, and for missing outputs
+MISSING = -1
+# the code for documents an analyzer was not sent in an adaptive run, which
+# are left out of its metrics
+SKIPPED = -2
+# the code for failed calls
+ERROR = -3
+# the code for documents an analyzer did not process before its deadline
+TIMEOUT = -4
+# codes of outputs that are not labels
+OUTPUT_CODES = {SKIPPED_OUTPUT: SKIPPED, 'Error': ERROR,
+                TIMEOUT_OUTPUT: TIMEOUT}
+CODE_OUTPUTS = dict((code, output) for output, code in OUTPUT_CODES.items())
+
+
+def label_code(label):
+    """The code of a label, or of another output of an analyzer
+    """
+    if label in LABEL_CODES:
+        return LABEL_CODES[label]
+    return OUTPUT_CODES.get(label, MISSING)
+
+
+def code_label(code):
+    """The label or other output with a code, empty if it is MISSING
+    """
+    if code >= 0:
+        return LABELS[code]
+    return CODE_OUTPUTS.get(code, '')
+
+
+class ScoreStore:
+    """Labels are stored as small integer codes (see LABEL_CODES) and raw
+    scores as floats, NaN where an analyzer did not return a score, in
+    growable arrays that can be viewed as NumPy arrays without parsing.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self.doc_ids = []
+        self.rows = {}
+        self.gold = array('b')
+        self.labels = {}
+        self.scores = {}
+        for name in names:
+            self.add_analyzer(name)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def add_analyzer(self, name):
+        if name in self.labels:
+            return
+        self.names.append(name)
+        self.labels[name] = array('b', [MISSING] * len(self))
+        self.scores[name] = array('f', [float('nan')] * len(self))
+
+    def add_doc(self, doc_id, key):
+        """Add a row for a document with the gold label key
+        """
+        doc_id = str(doc_id)
+        self.rows[doc_id] = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.gold.append(LABEL_CODES.get(key, MISSING))
+        for name in self.names:
+            self.labels[name].append(MISSING)
+            self.scores[name].append(float('nan'))
+
+    def set_output(self, doc_id, name, label, score=None):
+        """Record the output of an analyzer for a document that was added
+        """
+        self.add_analyzer(name)
+        row = self.rows[str(doc_id)]
+        self.labels[name][row] = label_code(label)
+        if score is not None and not math.isnan(score):
+            self.scores[name][row] = score
+
+    def gold_array(self):
+        """:return: an int8 array of gold label codes
+        """
+        return np.frombuffer(self.gold, dtype=np.int8).copy()
+
+    def label_matrix(self, names=None):
+        """:return: an int8 array of label codes, one row per analyzer
+        """
+        names = names or self.names
+        matrix = np.empty((len(names), len(self)), dtype=np.int8)
+        for i, name in enumerate(names):
+            matrix[i] = np.frombuffer(self.labels[name], dtype=np.int8)
+        return matrix
+
+    def score_matrix(self, names=None):
+        """:return: a float32 array of raw scores, one row per analyzer
+        """
+        names = names or self.names
+        matrix = np.empty((len(names), len(self)), dtype=np.float32)
+        for i, name in enumerate(names):
+            matrix[i] = np.frombuffer(self.scores[name], dtype=np.float32)
+        return matrix
+
+
+def load_scores(docs, journal_fname):
+    """Build a store from the gold standard and the journal of a run
+    :param docs: an iterable of (doc_id, text, key) tuples
+    """
+    store = ScoreStore()
+    for doc_id, _, key in docs:
+        store.add_doc(doc_id, key)
+    for doc_id, name, label, _, score in iter_journal(journal_fname):
+        if doc_id in store.rows and label != 'Error':
+            store.set_output(doc_id, name, label, score)
+    return store
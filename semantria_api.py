@@ -3,8 +3,16 @@
 
 import semantria
 import uuid
+import json
 import time
 import logging
+import threading
+
+from budget import METERS
+from cache import cached
+from deadline import DeadlineExceeded
+from instrument import INSTRUMENTS
+from ratelimit import LIMITERS
 
 
 LOGGER = logging.getLogger('APICompare.Semantria')
@@ -15,12 +23,36 @@ def onError(sender, result):
 
 
 class Semantria:
+    """Documents are queued in batches and collected by a single background
+    poller, which routes processed documents back to the callers waiting for
+    them by id, so many documents can be in flight at a time.
+    """
+
+    cache = None
+    # the number of documents waiting to be processed at a time
+    concurrency = 100
+    # the maximum number of documents queued in one request
+    queue_batch_size = 100
+    # the number of calls allowed per number of seconds, or None
+    rate_limit = None
+    # seconds between requests for processed documents
+    poll_interval = 1.0
+    # the number of seconds after which a document is given up on, or None
+    # to wait until it is processed
+    deadline = None
 
     def __init__(self, consumer_key, consumer_secret):
         self.name = 'semantria'
         serializer = semantria.JsonSerializer()
         self.session = semantria.Session(consumer_key, consumer_secret, serializer)
         self.session.Error += onError
+        self.lock = threading.Lock()
+        # documents to be queued
+        self.outgoing = []
+        # document id to a dict with the event to set when it is processed
+        # and the processed document or the exception
+        self.waiting = {}
+        self.polling = False
 
     def extract_label(self, score):
         """Given scores for pos, neg and neu, output the label
@@ -32,16 +64,122 @@ class Semantria:
         else:
             return '0'
 
+    score_label = extract_label
+
+    def cache_settings(self):
+        """The settings of the analyzer that affect its responses
+        """
+        return {}
+
+    def _queue_documents(self, limiter):
+        """Queue the documents that were submitted since the last poll
+        """
+        with self.lock:
+            docs = self.outgoing[:self.queue_batch_size]
+            del self.outgoing[:self.queue_batch_size]
+        if not docs:
+            return
+        limiter.acquire()
+        try:
+            with INSTRUMENTS.call(self.name) as call:
+                call.sent = len(json.dumps(docs))
+                call.status = self.session.queueBatch(docs)
+        except Exception, exc:
+            LOGGER.exception(exc)
+            with self.lock:
+                for doc in docs:
+                    self._finish(doc['id'], exc)
+
+    def _collect_documents(self, limiter):
+        """Route processed documents to the callers waiting for them
+        """
+        limiter.acquire()
+        with INSTRUMENTS.call(self.name) as call:
+            status = self.session.getProcessedDocuments()
+            # the SDK returns the HTTP status instead of the documents if
+            # there are none, the status of a response with documents is
+            # not known
+            if isinstance(status, int):
+                call.status = status
+            call.received = len(json.dumps(status))
+        if not isinstance(status, list):
+            return
+        LOGGER.debug("Got response: %r" % status)
+        with self.lock:
+            for doc in status:
+                if doc['id'] in self.waiting:
+                    self._finish(doc['id'], doc)
+                else:
+                    LOGGER.warning("Got unexpected document %s" % doc['id'])
+
+    def _finish(self, doc_id, result):
+        """Hand the result over to the caller waiting for the document, the
+        lock must be held
+        """
+        waiting = self.waiting.pop(doc_id)
+        waiting['result'] = result
+        waiting['event'].set()
+
+    def _poll(self):
+        """Queue submitted documents and collect processed ones until no
+        document is waiting
+        """
+        limiter = LIMITERS.get(self)
+        while True:
+            try:
+                while self.outgoing:
+                    self._queue_documents(limiter)
+                time.sleep(self.poll_interval)
+                self._collect_documents(limiter)
+            except Exception, exc:
+                LOGGER.exception(exc)
+            with self.lock:
+                if not self.waiting:
+                    self.polling = False
+                    return
+
+    def get_data(self, text):
+        """Submit the document and wait until it is processed
+        """
+        METERS.charge(self)
+        doc = {"id": str(uuid.uuid1()).replace("-", ""), "text": text}
+        waiting = {'event': threading.Event(), 'result': None}
+        with self.lock:
+            self.waiting[doc['id']] = waiting
+            self.outgoing.append(doc)
+            if not self.polling:
+                self.polling = True
+                poller = threading.Thread(target=self._poll)
+                poller.daemon = True
+                poller.start()
+        if not waiting['event'].wait(self.deadline):
+            with self.lock:
+                # stop waiting for the document, so that the poller stops
+                # once no other document is waiting
+                if self.waiting.pop(doc['id'], None) is not None:
+                    if doc in self.outgoing:
+                        self.outgoing.remove(doc)
+                    raise DeadlineExceeded("Semantria did not process "
+                                           "document %s in %.1f s" %
+                                           (doc['id'], self.deadline))
+        result = waiting['result']
+        if isinstance(result, Exception):
+            raise result
+        if result.get('status') == 'FAILED':
+            raise ValueError("Semantria failed to process document %s" % doc['id'])
+        return result
+
     def analyse(self, text):
         """Assign the sentiment label for the text.
         :return label: +, -, or 0
         """
-        doc = {"id": str(uuid.uuid1()).replace("", ""), "text": text}
-        status = self.session.queueDocument(doc)
-        time.sleep(5)
-        status = self.session.getProcessedDocuments()
-        while not isinstance(status, list):
-            status = self.session.getProcessedDocuments()
-        LOGGER.debug("Got response: %r" % status)
-        score = status[0]['sentiment_score']
-        return self.extract_label(score)
+        return self.analyse_with_score(text)[0]
+
+    def analyse_with_score(self, text):
+        """Assign the sentiment label for the text.
+        :return label: +, -, or 0
+        :return score: the raw score the label is based on
+        """
+        data = cached(self, text, lambda: self.get_data(text))
+        score = data['sentiment_score']
+        return self.extract_label(score), score
@@ -22,11 +22,13 @@ class Sentigem(API):
         else:
             return '0'
 
-    def analyse(self, text):
+    def analyse_with_score(self, text):
         """Assign the sentiment label for the text.
         :return label: +, -, or 0
+        :return score: the raw score the label is based on, None as the API only
+        returns a class
         """
         params = {'text': text, 'api-key': self.api_key}
-        data = self.get_data(params)
+        data = self.get_data(params, text=text)
         LOGGER.debug("Got response: %r" % data)
-        return self.extract_label(data['polarity'])
+        return self.extract_label(data['polarity']), None
@@ -0,0 +1,420 @@
+"""A long-running evaluation service: jobs are submitted over a local HTTP
+API, on a TCP port or a Unix socket, and run concurrently on one set of
+analyzers that is built once and kept warm. Each provider has one pool of
+workers, shared by all jobs whatever their language or domain, whose queues
+serve the running jobs in turn, so that the capacity of each provider is
+shared fairly between them;
+rate limits, connections and circuit breakers are per provider, so limits
+are respected across all jobs.
+
+Usage:
+
+python service.py <path to config file> [--port <port>] [--socket <path>]
+                  [--max-jobs <n>] [--results-dir <dir>] [--cache <file>]
+                  [--check-credentials]
+
+API:
+
+POST /jobs                  submit a job, with a JSON object of the path to
+                            the gold standard file ("gold"), and optionally
+                            "analyzers" (a comma-separated list), "language"
+                            and "domain"; responds with the job
+GET /jobs                   the status of all jobs
+GET /jobs/<id>              the status of a job, with the metrics of the
+                            documents processed so far
+GET /jobs/<id>/progress     the status of a job as a line of JSON every
+                            second (?interval=<s>) until the job is done
+GET /metrics                metrics of the calls to the APIs, see
+                            instrument.py
+
+For example:
+
+curl -d '{"gold": "data/evaluation_data.txt", "analyzers": "skyttle"}' \\
+    http://localhost:8700/jobs
+"""
+
+import argparse
+import BaseHTTPServer
+import json
+import logging
+import os
+import Queue
+import signal
+import SocketServer
+import sys
+import threading
+import time
+import urlparse
+
+import numpy as np
+
+import compare
+from cache import ResponseCache
+from dedup import DedupIndex
+from instrument import INSTRUMENTS
+from metrics import compute_metrics
+from registry import build_analyzer, check_credentials, missing_settings, \
+    parse_names
+from scheduler import WorkerPool
+from scores import ScoreStore
+
+LOGGER = logging.getLogger('APICompare.Service')
+
+PORT = 8700
+# the number of jobs that run at the same time, later jobs wait in the queue
+MAX_JOBS = 4
+# seconds between the lines of the progress of a job
+PROGRESS_INTERVAL = 1.0
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def partial_metrics(store, names):
+    """Compute metrics on the documents in a ScoreStore that a run may still
+    be adding documents to in another thread
+    :return: a dict of analyzer names to dicts of accuracy, error rate,
+    macro F1 and kappa
+    """
+    num_docs = min([len(store.gold)] +
+                   [len(store.labels[name]) for name in names])
+    if not num_docs:
+        return {}
+    gold = np.frombuffer(store.gold[:num_docs], dtype=np.int8)
+    labels = np.array([np.frombuffer(store.labels[name][:num_docs],
+                                     dtype=np.int8) for name in names])
+    results = compute_metrics(gold, labels)
+    return dict((name, dict((metric, float(results[metric][i])) for metric
+                            in ('accuracy', 'error_rate', 'macro_f1',
+                                'kappa')))
+                for i, name in enumerate(names))
+
+
+class Job:
+    """An evaluation of the analyzers on one gold standard file
+    """
+
+    def __init__(self, job_id, gold, names, language=None, domain=None):
+        self.id = job_id
+        self.gold = gold
+        self.names = names
+        self.language = language
+        self.domain = domain
+        self.status = QUEUED
+        self.error = None
+        self.results_fname = None
+        self.store = ScoreStore(names)
+        self.submitted = time.time()
+        self.started = None
+        self.finished = threading.Event()
+
+    def progress(self):
+        """:return: a dict of the status of the job and the metrics of the
+        documents processed so far
+        """
+        elapsed = None
+        if self.started:
+            elapsed = round(time.time() - self.started, 1)
+        return {'id': self.id, 'status': self.status, 'gold': self.gold,
+                'analyzers': self.names, 'language': self.language,
+                'domain': self.domain, 'documents': len(self.store),
+                'elapsed': elapsed, 'results': self.results_fname,
+                'error': self.error,
+                'metrics': partial_metrics(self.store, self.names)}
+
+
+class Service:
+    """Runs jobs on analyzers that are built when a job first needs them
+    and kept for later jobs
+    """
+
+    def __init__(self, config, max_jobs=MAX_JOBS, results_dir='jobs',
+                 cache=None, check=False):
+        """:param cache: a ResponseCache shared by all analyzers, if any
+        :param check: check the credentials of each analyzer when it is built
+        """
+        self.config = config
+        self.results_dir = results_dir
+        self.cache = cache
+        self.check = check
+        self.lock = threading.Lock()
+        # (name, language, domain) tuples to dicts with the event set once
+        # the analyzer is built, and the analyzer or the error building it
+        self.analyzers = {}
+        self.workers = WorkerPool()
+        self.jobs = {}
+        self.queue = Queue.Queue()
+        self.runners = []
+        for i in range(max_jobs):
+            runner = threading.Thread(target=self._run_jobs)
+            runner.name = 'job-runner-%d' % i
+            runner.daemon = True
+            runner.start()
+            self.runners.append(runner)
+
+    def build(self, name, language=None, domain=None):
+        """Build an analyzer for the language and domain, and check its
+        credentials if the service checks them
+        """
+        config = dict(self.config)
+        if language:
+            config['language'] = language
+        analyzer = build_analyzer(name, config)
+        if domain and hasattr(analyzer, 'domain'):
+            analyzer.domain = domain
+        compare.configure_analysers(config, [analyzer])
+        analyzer.cache = self.cache
+        if self.check:
+            check_credentials(analyzer)
+        return analyzer
+
+    def get_analyzer(self, name, language=None, domain=None):
+        """Build an analyzer for the language and domain, or return the one
+        built for an earlier job. The analyzer is built without holding the
+        lock, so that checking its credentials does not hold up other
+        requests, and jobs that need it while it is built wait for it.
+        :raises Exception: the error building the analyzer, which is built
+        again for a later job
+        """
+        key = (name, language, domain)
+        with self.lock:
+            building = key not in self.analyzers
+            if building:
+                self.analyzers[key] = {'ready': threading.Event(),
+                                       'analyzer': None, 'error': None}
+            future = self.analyzers[key]
+        if not building:
+            future['ready'].wait()
+            if future['error'] is not None:
+                raise future['error']
+            return future['analyzer']
+        try:
+            analyzer = self.build(name, language, domain)
+        except Exception, exc:
+            future['error'] = exc
+            with self.lock:
+                del self.analyzers[key]
+            raise
+        else:
+            future['analyzer'] = analyzer
+        finally:
+            future['ready'].set()
+        return analyzer
+
+    def submit(self, gold, analyzers=None, language=None, domain=None):
+        """Queue a job
+        :param analyzers: a comma-separated list of analyzer names, by
+        default those in the analyzers setting of the config, or all
+        :return: the Job
+        :raises ValueError: if the gold standard file does not exist, an
+        analyzer is unknown or settings it needs are missing from the config
+        """
+        if not gold or not os.path.exists(gold):
+            raise ValueError("There is no gold standard file %r" % gold)
+        names = parse_names(analyzers) or \
+            parse_names(self.config.get('analyzers')) or \
+            compare.ANALYZERS_TO_USE
+        missing = missing_settings(names, self.config)
+        if missing:
+            raise ValueError("Missing settings in the config: %s" %
+                             ', '.join(missing))
+        with self.lock:
+            job = Job(str(len(self.jobs) + 1), gold, names, language, domain)
+            self.jobs[job.id] = job
+        LOGGER.info("Queued job %s on %s" % (job.id, gold))
+        self.queue.put(job)
+        return job
+
+    def _run_jobs(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            self.run(job)
+
+    def run(self, job):
+        """Run a job, sending its documents to the shared workers
+        """
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            analyzers = [self.get_analyzer(name, job.language, job.domain)
+                         for name in job.names]
+            if not os.path.isdir(self.results_dir):
+                os.makedirs(self.results_dir)
+            job.results_fname = os.path.join(self.results_dir,
+                                             'results-%s.csv' % job.id)
+            compare.evaluate(compare.iter_evaluation_data(job.gold),
+                             store=job.store, dedup=DedupIndex(),
+                             results_fname=job.results_fname,
+                             analyzers=analyzers, workers=self.workers)
+            job.status = DONE
+        except Exception, exc:
+            LOGGER.exception(exc)
+            job.status = FAILED
+            job.error = str(exc)
+        LOGGER.info("Job %s is %s after %.1f s" % (job.id, job.status,
+                                                   time.time() - job.started))
+        job.finished.set()
+
+    def shutdown(self):
+        """Finish the running and queued jobs, then stop the workers
+        """
+        for _ in self.runners:
+            self.queue.put(None)
+        for runner in self.runners:
+            runner.join()
+        self.workers.close()
+        if self.cache:
+            self.cache.close()
+
+
+class ServiceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def send_json(self, status, data):
+        body = json.dumps(data)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.split('?')[0] != '/jobs':
+            self.send_error(404)
+            return
+        length = int(self.headers.getheader('Content-Length') or 0)
+        try:
+            params = json.loads(self.rfile.read(length) or '{}')
+            job = self.server.service.submit(
+                params.get('gold'), params.get('analyzers'),
+                params.get('language'), params.get('domain'))
+        except ValueError, exc:
+            self.send_json(400, {'error': str(exc)})
+            return
+        self.send_json(202, job.progress())
+
+    def do_GET(self):
+        url = urlparse.urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        service = self.server.service
+        if parts == ['metrics']:
+            body = INSTRUMENTS.render()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif parts == ['jobs']:
+            jobs = sorted(service.jobs.values(), key=lambda job: int(job.id))
+            self.send_json(200, [job.progress() for job in jobs])
+        elif len(parts) in (2, 3) and parts[0] == 'jobs' and \
+                parts[1] in service.jobs:
+            job = service.jobs[parts[1]]
+            if len(parts) == 2:
+                self.send_json(200, job.progress())
+            elif parts[2] == 'progress':
+                query = urlparse.parse_qs(url.query)
+                interval = float(query.get('interval',
+                                           [PROGRESS_INTERVAL])[0])
+                self.stream_progress(job, interval)
+            else:
+                self.send_error(404)
+        else:
+            self.send_error(404)
+
+    def stream_progress(self, job, interval):
+        """Write the progress of the job as a line of JSON every interval
+        seconds, and once more when it is done
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        while True:
+            finished = job.finished.is_set()
+            self.wfile.write(json.dumps(job.progress()) + '\n')
+            self.wfile.flush()
+            if finished:
+                break
+            job.finished.wait(interval)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(format % args)
+
+
+class HTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class UnixHTTPServer(SocketServer.ThreadingMixIn,
+                     SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def start_server(service, port=PORT, socket_fname=None):
+    """Serve the API of the service in a background thread, on a Unix socket
+    if socket_fname is given, otherwise on localhost:<port>
+    :return: the server, call shutdown() to stop it
+    """
+    if socket_fname:
+        if os.path.exists(socket_fname):
+            os.remove(socket_fname)
+        server = UnixHTTPServer(socket_fname, ServiceHandler)
+        LOGGER.info("Serving jobs on %s" % socket_fname)
+    else:
+        server = HTTPServer(('127.0.0.1', port), ServiceHandler)
+        LOGGER.info("Serving jobs on port %d" % server.server_address[1])
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def main(config_fname, port=PORT, socket_fname=None, max_jobs=MAX_JOBS,
+         results_dir='jobs', cache_fname=None, check=False):
+    compare.setup_logging()
+    config = compare.read_config(config_fname)
+    cache = None
+    if cache_fname:
+        cache = ResponseCache(cache_fname)
+    service = Service(config, max_jobs, results_dir, cache, check)
+    server = start_server(service, port, socket_fname)
+    print "Accepting jobs, press Ctrl-C to stop"
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+    try:
+        while True:
+            time.sleep(1)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    server.shutdown()
+    print "Finishing %d queued and running jobs" % sum(
+        1 for job in service.jobs.values() if not job.finished.is_set())
+    service.shutdown()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Run evaluations submitted over a local HTTP API")
+    parser.add_argument('config_fname', nargs='?', default=None,
+                        help="path to the config file")
+    parser.add_argument('--port', type=int, default=PORT,
+                        help="the port to accept jobs on")
+    parser.add_argument('--socket', default=None,
+                        help="a Unix socket to accept jobs on instead of a "
+                             "port")
+    parser.add_argument('--max-jobs', type=int, default=MAX_JOBS,
+                        help="the number of jobs that run at the same time")
+    parser.add_argument('--results-dir', default='jobs',
+                        help="a directory to write the results of jobs to")
+    parser.add_argument('--cache', default=None,
+                        help="a file to cache API responses in")
+    parser.add_argument('--check-credentials', action='store_true',
+                        help="check the credentials of each analyzer when "
+                             "it is built")
+    args = parser.parse_args()
+    main(args.config_fname, args.port, args.socket, args.max_jobs,
+         args.results_dir, args.cache, args.check_credentials)
@@ -0,0 +1,191 @@
+"""Split an evaluation into shards that run in separate processes or on
+separate hosts, and merge their partial results into the results of the
+whole run.
+
+Usage:
+
+python shard.py run <path to text file with annotated data> <config file>
+                --shards <n> [--shard-by hash|range] [-- <compare.py options>]
+python shard.py merge <partial results>... [--results <file>]
+                [--bootstrap <n>] [--processes <n>]
+
+To run shards on several hosts, run compare.py with --shard <i>/<n> on each
+of them, for i from 0 to n - 1, and merge the partial results files they
+write (results-<i>-of-<n>.csv).
+"""
+
+import os
+import sys
+import csv
+import heapq
+import zlib
+import argparse
+import logging
+import subprocess
+
+from scores import ScoreStore
+
+LOGGER = logging.getLogger('APICompare.Shard')
+
+# the script each shard runs, next to this one
+COMPARE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       'compare.py')
+
+
+def parse_shard(value):
+    """Parse a shard given as <index>/<number of shards>, e.g. 0/4
+    :return: an (index, number of shards) tuple
+    """
+    try:
+        index, count = [int(x) for x in value.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid shard %r" % value)
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError("Invalid shard %r" % value)
+    return index, count
+
+
+def shard_fname(fname, index, count):
+    """The name of the file of a shard, e.g. results-0-of-4.csv
+    """
+    base, dot, ext = fname.rpartition('.')
+    if not dot:
+        return '%s-%d-of-%d' % (fname, index, count)
+    return '%s-%d-of-%d.%s' % (base, index, count, ext)
+
+
+def shard_docs(docs, index, count, by='hash', total=None):
+    """Take the documents of one shard.
+    :param by: 'hash' to assign documents to shards by the hash of their ids,
+    or 'range' to split them into consecutive ranges
+    :param total: the number of documents, needed to split them into ranges
+    :return: a generator of the documents of the shard
+    """
+    for position, doc in enumerate(docs):
+        if by == 'range':
+            shard = position * count // total
+        else:
+            shard = (zlib.crc32(str(doc[0])) & 0xffffffff) % count
+        if shard == index:
+            yield doc
+
+
+def iter_results(fname):
+    """Read the rows of a results file.
+    :return names: the names of the analyzers, in the order of the columns
+    :return rows: a generator of rows, as lists of UTF-8 encoded fields
+    """
+    fh = open(fname, 'rb')
+    reader = csv.reader(fh, delimiter='\t')
+    names = reader.next()[3:]
+    return names, reader
+
+
+def merge(fnames, results_fname='results.csv', store=None):
+    """Merge the partial results of shards, in the order of doc ids, into
+    one results file, the same as the results of a single run.
+    :param store: a ScoreStore to collect the gold labels and outputs in
+    :return names: the names of the analyzers
+    """
+    names = None
+    readers = []
+    for fname in fnames:
+        shard_names, reader = iter_results(fname)
+        if names is None:
+            names = shard_names
+        elif shard_names != names:
+            raise ValueError("%s has results of %s, expected %s" %
+                             (fname, ', '.join(shard_names), ', '.join(names)))
+        readers.append(reader)
+    if names is None:
+        raise ValueError("No results to merge")
+    if store is None:
+        store = ScoreStore()
+    for name in names:
+        store.add_analyzer(name)
+
+    writer = csv.writer(open(results_fname, 'wb'), delimiter='\t')
+    writer.writerow(['doc_id', 'text', 'gold standard'] + names)
+    keyed = [((int(row[0]), row) for row in reader) for reader in readers]
+    num_docs = 0
+    for _, row in heapq.merge(*keyed):
+        writer.writerow(row)
+        doc_id, key = row[0], row[2] or None
+        store.add_doc(doc_id, key)
+        for name, label in zip(names, row[3:]):
+            store.set_output(doc_id, name, label)
+        num_docs += 1
+    LOGGER.info("Merged %d documents from %d shards" % (num_docs, len(fnames)))
+    return names
+
+
+def run(eval_data_fname, config_fname, count, by, args):
+    """Run every shard in a separate process and merge their results
+    :param args: more command line arguments for compare.py
+    :return: the names of the partial results files
+    """
+    processes = []
+    for index in range(count):
+        command = [sys.executable, COMPARE, eval_data_fname]
+        if config_fname:
+            command.append(config_fname)
+        command += ['--shard', '%d/%d' % (index, count), '--shard-by', by]
+        command += args
+        log = open(shard_fname('shard.log', index, count), 'w')
+        processes.append((subprocess.Popen(command, stdout=log,
+                                           stderr=subprocess.STDOUT), log))
+    failed = []
+    for index, (process, log) in enumerate(processes):
+        if process.wait():
+            failed.append(index)
+        log.close()
+    if failed:
+        raise RuntimeError("Shards %s failed, see their logs" %
+                           ', '.join(str(index) for index in failed))
+    return [shard_fname('results.csv', index, count)
+            for index in range(count)]
+
+
+if __name__ == "__main__":
+
+    from stats import format_evaluation
+
+    parser = argparse.ArgumentParser(
+        description="Run an evaluation in shards and merge their results")
+    commands = parser.add_subparsers(dest='command')
+    run_parser = commands.add_parser('run', help="run shards in processes")
+    run_parser.add_argument('eval_data_fname',
+                            help="path to the text file with annotated data")
+    run_parser.add_argument('config_fname', help="path to the config file")
+    run_parser.add_argument('--shards', type=int, required=True,
+                            help="the number of shards")
+    run_parser.add_argument('--shard-by', choices=['hash', 'range'],
+                            default='hash',
+                            help="how to assign documents to shards")
+    run_parser.add_argument('args', nargs=argparse.REMAINDER,
+                            help="more options for compare.py")
+    merge_parser = commands.add_parser('merge', help="merge partial results")
+    merge_parser.add_argument('fnames', nargs='+',
+                              help="the partial results of the shards")
+    for command_parser in (run_parser, merge_parser):
+        command_parser.add_argument('--results', default='results.csv',
+                                    help="the file to write the results to")
+        command_parser.add_argument('--bootstrap', type=int, default=1000,
+                                    help="the number of bootstrap replicates")
+        command_parser.add_argument('--processes', type=int, default=1,
+                                    help="the number of processes to "
+                                         "resample in")
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(levelname)s:%(name)s:%(message)s')
+    if options.command == 'run':
+        args = [arg for arg in options.args if arg != '--']
+        fnames = run(options.eval_data_fname, options.config_fname,
+                     options.shards, options.shard_by, args)
+    else:
+        fnames = options.fnames
+    store = ScoreStore()
+    merge(fnames, options.results, store)
+    print format_evaluation(store, replicates=options.bootstrap,
+                            processes=options.processes)
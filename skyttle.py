@@ -7,6 +7,8 @@ LOGGER = logging.getLogger('APICompare.Skyttle')
 
 class Skyttle(API):
 
+    batch_size = 50
+
     def __init__(self, mashape_auth, language='en', domain=None):
         self.name = 'skyttle'
         self.language = language
@@ -24,15 +26,67 @@ class Skyttle(API):
         else:
             return '-'
 
-    def analyse(self, text):
+    def score_label(self, score):
+        """Given the raw score, the positive minus the negative score,
+        output the label
+        """
+        if score == 0:
+            return '0'
+        elif score > 0:
+            return '+'
+        else:
+            return '-'
+
+    def get_label_and_score(self, scores):
+        return self.extract_label(scores), scores['pos'] - scores['neg']
+
+    def get_params(self, texts):
+        """Build the request parameters for a list of texts
+        """
+        params = [('text', text) for text in texts]
+        params += [('lang', self.language), ('keywords', 0), ('sentiment', 1)]
+        if self.domain:
+            params.append(('domain', self.domain))
+        return params
+
+    def analyse_with_score(self, text):
         """Assign the sentiment label for the text.
         :return label: +, -, or 0
+        :return score: the raw score the label is based on, the positive minus the
+        negative score
         """
         params = {'text': text, 'lang': self.language, 'keywords': 0,
                   'sentiment': 1}
         if self.domain:
             params['domain'] = self.domain
         headers = {'X-Mashape-Authorization': self.mashape_auth}
-        data = self.get_data(params, headers)
+        data = self.get_data(params, headers, text=text)
+        LOGGER.debug("Got response: %r" % data)
+        return self.get_label_and_score(data['docs'][0]['sentiment_scores'])
+
+    def fetch_batch(self, texts):
+        """Send the texts in one request and split the response into
+        responses for individual texts. Documents are returned in the order
+        of the texts.
+        """
+        headers = {'X-Mashape-Authorization': self.mashape_auth}
+        data = self.get_data(self.get_params(texts), headers)
         LOGGER.debug("Got response: %r" % data)
-        return self.extract_label(data['docs'][0]['sentiment_scores'])
+        if len(data['docs']) != len(texts):
+            raise ValueError("Sent %d documents, got %d" %
+                             (len(texts), len(data['docs'])))
+        return [{'docs': [doc]} for doc in data['docs']]
+
+    def analyse_batch(self, texts):
+        """Assign sentiment labels for a list of texts.
+        :return labels: a list of +, -, or 0
+        """
+        return [label for label, _ in self.analyse_batch_with_scores(texts)]
+
+    def analyse_batch_with_scores(self, texts):
+        """Assign sentiment labels for a list of texts.
+        :return: a list of (label, raw score) tuples
+        """
+        responses = self.get_batch_data(texts, self.fetch_batch)
+        return [self.get_label_and_score(data['docs'][0]['sentiment_scores'])
+                for data in responses]
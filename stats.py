@@ -0,0 +1,305 @@
+"""Confidence intervals and significance tests for the accuracy and error rate
+of the analyzers, from paired bootstrap resampling of the documents and
+McNemar's test.
+
+Usage:
+
+python stats.py <path to text file with annotated data> [--journal <file>]
+                [--replicates <n>] [--processes <n>] [--seed <n>]
+python stats.py --columns <results directory> [--replicates <n>] ...
+"""
+
+import argparse
+import math
+import multiprocessing
+
+import numpy as np
+
+from metrics import ERROR_WEIGHTS, MAX_ERRORS, store_metrics, format_metrics
+from scores import load_scores, SKIPPED
+from colstore import ColumnStore
+
+# the number of bootstrap replicates drawn at a time
+CHUNK_SIZE = 50
+# draw replicates from a multinomial over the distinct patterns of outcomes
+# if there are this many times fewer patterns than documents, as drawing
+# documents one by one is faster otherwise
+MULTINOMIAL_RATIO = 8
+# below this number of discordant documents, McNemar's test is exact
+EXACT_BELOW = 25
+
+
+def doc_outcomes(gold, labels):
+    """Score each output of each analyzer.
+    :param gold: an array of gold label codes, of shape (docs,)
+    :param labels: an array of predicted label codes, of shape (analyzers, docs)
+    :return hits: a bool array of shape (analyzers, docs), True where the
+    label is correct
+    :return errors: an array of the weighted errors, of the same shape
+    :return max_errors: an array of the maximum error of each document for
+    each analyzer, 0 for documents the analyzer was not sent
+    :return evaluated: a bool array, False for documents the analyzer was
+    not sent
+    """
+    valid = (gold >= 0) & (labels >= 0)
+    hits = valid & (labels == gold)
+    errors = np.where(valid, ERROR_WEIGHTS[np.maximum(gold, 0),
+                                           np.maximum(labels, 0)], 0)
+    evaluated = labels != SKIPPED
+    max_errors = np.where(evaluated & (gold >= 0),
+                          MAX_ERRORS[np.maximum(gold, 0)], 0)
+    return hits, errors, max_errors, evaluated
+
+
+def _bootstrap_chunk(args):
+    """Draw replicates and compute the accuracy and error rate of all
+    analyzers on each, every analyzer on the same resampled documents
+    """
+    # the outcomes of each analyzer (in columns) for each pattern
+    hits, errors, max_errors, evaluated, counts, inverse, num_replicates, \
+        seed = args
+    random = np.random.RandomState(seed)
+    num_docs = int(counts.sum())
+    num_patterns = len(counts)
+    # the number of times documents with each pattern of outcomes are drawn
+    # in each replicate
+    if inverse is None:
+        weights = random.multinomial(num_docs, counts / float(num_docs),
+                                     size=num_replicates)
+    else:
+        draws = inverse[random.randint(0, num_docs,
+                                       (num_replicates, num_docs))]
+        draws += np.arange(num_replicates)[:, None] * num_patterns
+        weights = np.bincount(draws.ravel(),
+                              minlength=num_replicates * num_patterns)
+        weights = weights.reshape(num_replicates, num_patterns)
+    weights = weights.astype(np.float32)
+
+    accuracy = weights.dot(hits) / np.maximum(weights.dot(evaluated), 1)
+    error_rate = weights.dot(errors) / np.maximum(weights.dot(max_errors), 1)
+    return accuracy, error_rate
+
+
+def bootstrap(gold, labels, replicates=1000, processes=1, seed=None):
+    """Paired bootstrap of the accuracy and error rate of the analyzers.
+    :param processes: the number of processes to draw replicates in
+    :return accuracy: an array of shape (replicates, analyzers), NaN if
+    there are no documents
+    :return error_rate: an array of the same shape
+    """
+    hits, errors, max_errors, evaluated = doc_outcomes(gold, labels)
+    num_analyzers, num_docs = hits.shape
+    if not num_docs:
+        empty = np.full((replicates, num_analyzers), np.nan, dtype=np.float32)
+        return empty, empty.copy()
+    # documents with the same outcomes for all analyzers are interchangeable,
+    # so replicates are drawn over the distinct patterns of outcomes
+    outcomes = np.vstack([hits, errors, max_errors, evaluated]).T
+    outcomes = outcomes.astype(np.int8)
+    patterns, inverse, counts = np.unique(outcomes, axis=0,
+                                          return_inverse=True,
+                                          return_counts=True)
+    patterns = patterns.astype(np.float32)
+    columns = [patterns[:, i * num_analyzers:(i + 1) * num_analyzers].copy()
+               for i in range(4)]
+    if len(counts) * MULTINOMIAL_RATIO <= num_docs:
+        inverse = None
+
+    # a seed for each chunk, so that results do not depend on processes
+    seeds = np.random.RandomState(seed).randint(0, 2 ** 31 - 1,
+                                                 -(-replicates // CHUNK_SIZE))
+    chunks = [tuple(columns) + (counts, inverse,
+                                min(CHUNK_SIZE, replicates - i * CHUNK_SIZE),
+                                chunk_seed)
+              for i, chunk_seed in enumerate(seeds)]
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_bootstrap_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_bootstrap_chunk(chunk) for chunk in chunks]
+    accuracy = np.concatenate([result[0] for result in results])
+    error_rate = np.concatenate([result[1] for result in results])
+    return accuracy, error_rate
+
+
+def confidence_intervals(samples, alpha=0.05):
+    """Percentile intervals of bootstrap samples
+    :return lows, highs: arrays with one bound per analyzer
+    """
+    lows = np.percentile(samples, 100 * alpha / 2, axis=0)
+    highs = np.percentile(samples, 100 * (1 - alpha / 2), axis=0)
+    return lows, highs
+
+
+def bootstrap_p_values(samples):
+    """Two-sided p-values of the differences between pairs of analyzers,
+    from the proportion of replicates where the difference changes sign
+    :return: an array of shape (analyzers, analyzers)
+    """
+    diffs = samples[:, :, None] - samples[:, None, :]
+    below = (diffs <= 0).mean(axis=0)
+    above = (diffs >= 0).mean(axis=0)
+    p_values = np.minimum(2 * np.minimum(below, above), 1.0)
+    np.fill_diagonal(p_values, 1.0)
+    return p_values
+
+
+def mcnemar_p_value(b, c):
+    """The two-sided p-value of McNemar's test, exact for few discordant
+    documents and with the chi-squared approximation otherwise
+    :param b: the number of documents only the first analyzer got right
+    :param c: the number of documents only the second analyzer got right
+    """
+    n = b + c
+    if n == 0:
+        return 1.0
+    if n < EXACT_BELOW:
+        k = min(b, c)
+        tail = sum(math.exp(math.lgamma(n + 1) - math.lgamma(i + 1) -
+                            math.lgamma(n - i + 1) - n * math.log(2))
+                   for i in range(k + 1))
+        return min(2 * tail, 1.0)
+    statistic = (abs(b - c) - 1) ** 2 / float(n)
+    return math.erfc(math.sqrt(statistic / 2))
+
+
+def mcnemar(gold, labels):
+    """McNemar's test between all pairs of analyzers
+    :return: an array of p-values of shape (analyzers, analyzers)
+    """
+    hits, _, _, evaluated = doc_outcomes(gold, labels)
+    hits = hits.astype(np.int64)
+    # discordant[i, j]: the number of documents i got right and j did not,
+    # among those both were sent
+    discordant = hits.dot(((1 - hits) * evaluated).T)
+    num_analyzers = len(hits)
+    p_values = np.ones((num_analyzers, num_analyzers))
+    for i in range(num_analyzers):
+        for j in range(i + 1, num_analyzers):
+            p_values[i, j] = p_values[j, i] = mcnemar_p_value(
+                discordant[i, j], discordant[j, i])
+    return p_values
+
+
+def format_intervals(title, names, values, lows, highs, reverse=False,
+                     alpha=0.05):
+    """Format a table of metric values with their confidence intervals,
+    best first
+    """
+    lines = ["%-15s%-12s%g%% CI" % ('Analyzer', title, 100 * (1 - alpha))]
+    order = np.argsort(values, kind='mergesort')
+    if not reverse:
+        order = order[::-1]
+    for i in order:
+        lines.append("%-15s%-12.3f%.3f - %.3f" % (names[i], values[i],
+                                                  lows[i], highs[i]))
+    return '\n'.join(lines)
+
+
+def format_p_values(title, names, p_values):
+    """Format a matrix of pairwise p-values
+    """
+    lines = ["%-15s" % title + ''.join("%10s" % name[:9] for name in names)]
+    for i, name in enumerate(names):
+        cells = ''.join("%10s" % ('-' if i == j else "%.4f" % p_values[i, j])
+                        for j in range(len(names)))
+        lines.append("%-15s%s" % (name, cells))
+    return '\n'.join(lines)
+
+
+def format_stats(store, names=None, replicates=1000, processes=1, seed=None,
+                 alpha=0.05):
+    """Run the bootstrap and the tests on the outputs in a ScoreStore and
+    format the results
+    """
+    names = names or store.names
+    gold = store.gold_array()
+    labels = store.label_matrix(names)
+    hits, errors, max_errors, evaluated = doc_outcomes(gold, labels)
+    accuracy = hits.sum(axis=1) / np.maximum(evaluated.sum(axis=1), 1.0)
+    error_rate = errors.sum(axis=1) / np.maximum(max_errors.sum(axis=1), 1.0)
+
+    accuracy_samples, error_rate_samples = bootstrap(
+        gold, labels, replicates, processes, seed)
+    sections = [
+        format_intervals('Accuracy', names, accuracy,
+                         *confidence_intervals(accuracy_samples, alpha),
+                         alpha=alpha),
+        format_intervals('Error rate', names, error_rate,
+                         *confidence_intervals(error_rate_samples, alpha),
+                         reverse=True, alpha=alpha),
+        format_p_values('McNemar p', names, mcnemar(gold, labels)),
+        format_p_values('Accuracy p', names,
+                        bootstrap_p_values(accuracy_samples)),
+        format_p_values('Error rate p', names,
+                        bootstrap_p_values(error_rate_samples)),
+    ]
+    return '\n\n'.join(sections)
+
+
+def format_evaluation(store, names=None, replicates=1000, processes=1,
+                      seed=None):
+    """Format the accuracy and error rate tables of a run, with confidence
+    intervals and significance tests unless replicates is 0, followed by the
+    table of per-class metrics, or a note if there are no documents, e.g.
+    in an empty shard
+    """
+    names = names or store.names
+    if not len(store):
+        return "No documents were evaluated"
+    if replicates:
+        tables = format_stats(store, names, replicates, processes, seed)
+    else:
+        name2metrics = store_metrics(store, names)
+        accuracy = sorted(names, key=lambda name:
+                          -name2metrics[name]['accuracy'])
+        error_rate = sorted(names, key=lambda name:
+                            name2metrics[name]['error_rate'])
+        lines = ["%-15s%s" % ('Analyzer', 'Accuracy')]
+        lines += ["%-15s%.3f" % (name, name2metrics[name]['accuracy'])
+                  for name in accuracy]
+        lines += ['', "%-15s%s" % ('Analyzer', 'Error rate')]
+        lines += ["%-15s%.3f" % (name, name2metrics[name]['error_rate'])
+                  for name in error_rate]
+        tables = '\n'.join(lines)
+    return tables + '\n\n' + format_metrics(store_metrics(store, names))
+
+
+def main(eval_data_fname, journal_fname, replicates, processes, seed, columns=None):
+    if columns:
+        store = ColumnStore(columns)
+    else:
+        from compare import iter_evaluation_data
+        store = load_scores(iter_evaluation_data(eval_data_fname),
+                            journal_fname)
+    print format_stats(store, replicates=replicates, processes=processes,
+                       seed=seed)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Confidence intervals and significance tests for a run")
+    parser.add_argument('eval_data_fname', nargs='?', default=None,
+                        help="path to the text file with annotated data")
+    parser.add_argument('--columns', default=None,
+                        help="a results directory written by compare.py, "
+                             "instead of the annotated data and the journal")
+    parser.add_argument('--journal', default='journal.tsv',
+                        help="the journal of the run")
+    parser.add_argument('--replicates', type=int, default=1000,
+                        help="the number of bootstrap replicates")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="the number of processes to resample in")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="the seed of the random number generator")
+    options = parser.parse_args()
+    if not options.eval_data_fname and not options.columns:
+        parser.error("either the annotated data or --columns is required")
+
+    main(options.eval_data_fname, options.journal, options.replicates,
+         options.processes, options.seed, options.columns)
@@ -0,0 +1,122 @@
+"""Recompute accuracy and error rate of each analyzer over a grid of
+thresholds on its raw scores, from the journal of a run, without calling
+the APIs.
+
+Usage:
+
+python sweep.py <path to text file with annotated data> [--journal <file>]
+                [--steps <n>]
+python sweep.py --columns <results directory> [--steps <n>]
+
+For a low threshold lo and a high threshold hi, a document is labelled '+' if
+its score is above hi, '-' if it is below lo, and '0' otherwise.
+"""
+
+import argparse
+
+import numpy as np
+
+from scores import load_scores, LABEL_CODES
+from colstore import ColumnStore
+
+NEG = LABEL_CODES['-']
+NEU = LABEL_CODES['0']
+POS = LABEL_CODES['+']
+
+
+def sweep(scores, gold, lows, highs):
+    """Compute accuracy and error rate for every pair of thresholds at once.
+    Documents without a score or a gold label are left out.
+    :param scores: a float array of raw scores
+    :param gold: an int array of gold label codes
+    :param lows: an array of low thresholds
+    :param highs: an array of high thresholds
+    :return accuracy: an array of shape (len(lows), len(highs)), NaN where
+    the low threshold is above the high one
+    :return error_rate: an array of the same shape
+    """
+    valid = ~np.isnan(scores) & (gold >= 0)
+    order = np.argsort(scores[valid], kind='mergesort')
+    sorted_scores = scores[valid][order]
+    sorted_gold = gold[valid][order]
+    num_docs = len(sorted_scores)
+
+    # cumulative[c][i]: the number of documents of class c among the i
+    # documents with the lowest scores
+    cumulative = np.zeros((3, num_docs + 1), dtype=np.int64)
+    for code in (NEG, NEU, POS):
+        cumulative[code, 1:] = np.cumsum(sorted_gold == code)
+    totals = cumulative[:, -1]
+
+    below = cumulative[:, np.searchsorted(sorted_scores, lows, 'left')]
+    above = totals[:, None] - \
+        cumulative[:, np.searchsorted(sorted_scores, highs, 'right')]
+    # documents of each class labelled '-', '+' and '0'
+    neg = below[:, :, None]
+    pos = above[:, None, :]
+    neu = totals[:, None, None] - neg - pos
+
+    hits = neg[NEG] + pos[POS] + neu[NEU]
+    errors = 2 * neg[POS] + neg[NEU] + 2 * pos[NEG] + pos[NEU] + \
+        neu[NEG] + neu[POS]
+    max_errors = totals[NEU] + 2 * (totals[NEG] + totals[POS])
+
+    invalid = lows[:, None] > highs[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        accuracy = np.where(invalid, np.nan, hits / float(max(num_docs, 1)))
+        error_rate = np.where(invalid, np.nan,
+                              errors / float(max(max_errors, 1)))
+    return accuracy, error_rate
+
+
+def get_grid(scores, steps):
+    """Evenly spaced thresholds over the range of the scores
+    """
+    scores = scores[~np.isnan(scores)]
+    return np.linspace(scores.min(), scores.max(), steps)
+
+
+def main(eval_data_fname, journal_fname, steps, columns=None):
+    if columns:
+        store = ColumnStore(columns)
+    else:
+        from compare import iter_evaluation_data
+        store = load_scores(iter_evaluation_data(eval_data_fname),
+                            journal_fname)
+    gold = store.gold_array()
+    names = store.names
+    scores = store.score_matrix(names)
+
+    print "%-15s%10s%9s%9s%12s%9s%9s" % ('Analyzer', 'Accuracy', 'Low', 'High',
+                                         'Error rate', 'Low', 'High')
+    for name, row in zip(names, scores):
+        if np.isnan(row).all():
+            continue
+        grid = get_grid(row, steps)
+        accuracy, error_rate = sweep(row, gold, grid, grid)
+        i, j = np.unravel_index(np.nanargmax(accuracy), accuracy.shape)
+        k, l = np.unravel_index(np.nanargmin(error_rate), error_rate.shape)
+        print "%-15s%10.3f%9.3f%9.3f%12.3f%9.3f%9.3f" % (
+            name, accuracy[i, j], grid[i], grid[j],
+            error_rate[k, l], grid[k], grid[l])
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Sweep thresholds on the raw scores of a run")
+    parser.add_argument('eval_data_fname', nargs='?', default=None,
+                        help="path to the text file with annotated data")
+    parser.add_argument('--columns', default=None,
+                        help="a results directory written by compare.py, "
+                             "instead of the annotated data and the journal")
+    parser.add_argument('--journal', default='journal.tsv',
+                        help="the journal of the run")
+    parser.add_argument('--steps', type=int, default=200,
+                        help="the number of thresholds to try on each side")
+    options = parser.parse_args()
+    if not options.eval_data_fname and not options.columns:
+        parser.error("either the annotated data or --columns is required")
+
+    main(options.eval_data_fname, options.journal, options.steps,
+         options.columns)
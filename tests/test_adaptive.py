@@ -0,0 +1,53 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+from collections import Counter
+
+from adaptive import shuffle_docs, SequentialRanking
+from scheduler import SKIPPED
+
+
+class TestCase(unittest.TestCase):
+
+    def test_shuffle_docs(self):
+        docs = [(i, str(i), '+') for i in range(100)]
+        actual = shuffle_docs(docs, seed=1)
+        self.assertNotEqual(actual, docs)
+        self.assertEqual(sorted(actual), docs)
+        self.assertEqual(shuffle_docs(docs, seed=1), actual)
+
+    def test_shuffle_docs__stratified(self):
+        docs = [(i, str(i), '+' if i < 80 else '-') for i in range(100)]
+        actual = shuffle_docs(docs, stratify=True, seed=1)
+        self.assertEqual(sorted(actual), docs)
+        # every prefix has about the proportion of labels of the whole
+        for size in (10, 20, 50):
+            counts = Counter(key for _, _, key in actual[:size])
+            self.assertTrue(abs(counts['-'] - size * 0.2) <= 1)
+
+    def test_sequential_ranking__settles_clear_ranks(self):
+        ranking = SequentialRanking(['good', 'bad'], check_every=10,
+                                    min_docs=10)
+        settled = []
+        for i in range(2000):
+            settled += ranking.add({'good': '+', 'bad': '-'}, '+')
+        self.assertEqual(sorted(settled), ['bad', 'good'])
+        self.assertTrue(ranking.counts['good'] < 2000)
+        self.assertEqual(ranking.bounds('good'), ranking.settled['good'])
+
+    def test_sequential_ranking__does_not_settle_ties(self):
+        ranking = SequentialRanking(['one', 'two'], check_every=10,
+                                    min_docs=10)
+        settled = []
+        for i in range(1000):
+            settled += ranking.add({'one': '+-'[i % 2], 'two': '+-'[i % 2]},
+                                   '+')
+        self.assertEqual(settled, [])
+
+    def test_sequential_ranking__ignores_skipped_and_unlabelled(self):
+        ranking = SequentialRanking(['one'])
+        ranking.add({'one': SKIPPED}, '+')
+        ranking.add({'one': '+'}, None)
+        ranking.add({'one': '+'}, '+')
+        self.assertEqual(ranking.counts['one'], 1)
+        self.assertEqual(ranking.accuracy('one'), 1.0)
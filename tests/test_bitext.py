@@ -0,0 +1,35 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+from mock import patch
+
+from bitext import Bitext
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.analyzer = Bitext('user', 'password')
+        self.analyzer.cache = None
+
+    def fetch(self, docs):
+        with patch.object(self.analyzer, 'get_data',
+                          return_value={'data': docs}):
+            return self.analyzer.fetch_batch(['good', 'bad', 'fine'])
+
+    def test_fetch_batch__splits_the_response_by_id(self):
+        responses = self.fetch([{'id': '2', 'global_value': 0.0},
+                                {'id': '0', 'global_value': 1.5},
+                                {'id': '1', 'global_value': -1.5}])
+        self.assertEqual([data['data'][0]['global_value']
+                          for data in responses], [1.5, -1.5, 0.0])
+
+    def test_fetch_batch__missing_and_duplicate_ids(self):
+        self.assertRaises(ValueError, self.fetch,
+                          [{'id': '0', 'global_value': 1.5},
+                           {'id': '2', 'global_value': 0.0}])
+        self.assertRaises(ValueError, self.fetch,
+                          [{'id': '0', 'global_value': 1.5},
+                           {'id': '0', 'global_value': 1.5},
+                           {'id': '1', 'global_value': -1.5},
+                           {'id': '2', 'global_value': 0.0}])
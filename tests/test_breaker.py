@@ -0,0 +1,73 @@
+# -*- coding: UTF-8 -*-
+
+import time
+import socket
+import unittest
+from mock import Mock, patch
+
+from breaker import CircuitBreaker, CircuitOpen, classify, RETRY, FAIL, \
+    FATAL, DOCUMENT
+from deadline import DeadlineExceeded
+from pool import HTTPError
+
+
+class TestCase(unittest.TestCase):
+
+    def test_classify(self):
+        self.assertEqual(classify(socket.error()), RETRY)
+        self.assertEqual(classify(HTTPError(502, 'Bad Gateway')), RETRY)
+        self.assertEqual(classify(HTTPError(503, 'Unavailable')), FAIL)
+        self.assertEqual(classify(HTTPError(429, 'Too Many Requests')), FAIL)
+        self.assertEqual(classify(HTTPError(403, 'Forbidden')), FATAL)
+        self.assertEqual(classify(HTTPError(400, 'Bad Request')), DOCUMENT)
+        self.assertEqual(classify(DeadlineExceeded()), FAIL)
+        self.assertEqual(classify(ValueError()), DOCUMENT)
+
+    def test_call__retries_transient_errors(self):
+        function = Mock(side_effect=[socket.error(), '+'])
+        breaker = CircuitBreaker('one')
+        with patch('breaker.time.sleep') as mock_sleep:
+            self.assertEqual(breaker.call(function), '+')
+        self.assertEqual(function.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertEqual(breaker.failures, 0)
+
+    def test_call__does_not_retry_errors_with_the_document(self):
+        function = Mock(side_effect=ValueError())
+        breaker = CircuitBreaker('one', threshold=1)
+        self.assertRaises(ValueError, breaker.call, function)
+        self.assertEqual(function.call_count, 1)
+        self.assertFalse(breaker.is_open)
+
+    def test_call__opens_after_consecutive_failures(self):
+        function = Mock(side_effect=socket.error())
+        breaker = CircuitBreaker('one', threshold=3, reset_after=60,
+                                 retries=1)
+        with patch('breaker.time.sleep'):
+            self.assertRaises(socket.error, breaker.call, function)
+            self.assertFalse(breaker.is_open)
+            self.assertRaises(socket.error, breaker.call, function)
+        self.assertTrue(breaker.is_open)
+        self.assertEqual(function.call_count, 3)
+        self.assertRaises(CircuitOpen, breaker.call, function)
+        self.assertEqual(function.call_count, 3)
+        breaker.stop()
+
+    def test_call__opens_at_once_on_fatal_errors(self):
+        function = Mock(side_effect=HTTPError(401, 'Unauthorized'))
+        breaker = CircuitBreaker('one', reset_after=60)
+        self.assertRaises(HTTPError, breaker.call, function)
+        self.assertTrue(breaker.is_open)
+        self.assertEqual(function.call_count, 1)
+        breaker.stop()
+
+    def test_probe__closes_when_the_provider_recovers(self):
+        function = Mock(side_effect=[HTTPError(401, 'Unauthorized'), '+'])
+        breaker = CircuitBreaker('one', reset_after=0.01)
+        self.assertRaises(HTTPError, breaker.call, function)
+        for _ in range(100):
+            if not breaker.is_open:
+                break
+            time.sleep(0.01)
+        self.assertFalse(breaker.is_open)
+        self.assertEqual(function.call_count, 2)
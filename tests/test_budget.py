@@ -0,0 +1,126 @@
+# -*- coding: UTF-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from mock import Mock
+
+from budget import Meters, Plan, QuotaExhausted, fit_budget, \
+    stratified_sample, journal_calls, share
+from journal import Journal
+
+
+def get_mock_analyzer(name, quota=None, cost=0.0):
+    analyzer = Mock(spec=['name', 'analyse', 'quota', 'cost'])
+    analyzer.name = name
+    analyzer.quota = quota
+    analyzer.cost = cost
+    return analyzer
+
+
+DOCS = [(i, u'text %d' % i, '+-0'[i % 3]) for i in range(300)]
+
+
+class TestCase(unittest.TestCase):
+
+    def test_charge__stops_before_the_quota(self):
+        meters = Meters()
+        analyzer = get_mock_analyzer('one', quota=2, cost=0.5)
+        meters.charge(analyzer)
+        meters.charge(analyzer)
+        self.assertRaises(QuotaExhausted, meters.charge, analyzer)
+        self.assertEqual(meters.calls['one'], 2)
+        self.assertEqual(meters.spent['one'], 1.0)
+
+    def test_charge__stops_before_the_budget(self):
+        meters = Meters()
+        meters.reset(budget=1.0)
+        cheap = get_mock_analyzer('cheap', cost=0.4)
+        free = get_mock_analyzer('free')
+        meters.charge(cheap)
+        meters.charge(cheap)
+        self.assertRaises(QuotaExhausted, meters.charge, cheap)
+        meters.charge(free)
+        self.assertEqual(meters.calls['free'], 1)
+
+    def test_stratified_sample(self):
+        sample = stratified_sample(DOCS, 0.1)
+        self.assertEqual(len(sample), 30)
+        self.assertEqual(sorted(sum(1 for doc_id, _, key in DOCS
+                                    if doc_id in sample and key == label)
+                                for label in '+-0'), [10, 10, 10])
+        self.assertTrue(sample <= stratified_sample(DOCS, 0.5))
+
+    def test_fit_budget(self):
+        costs = {'free': 0.0, 'cheap': 10.0, 'dear': 100.0}
+        caps = {'free': 1.0, 'cheap': 0.2, 'dear': 1.0}
+        fractions = fit_budget(costs, caps, 52.0)
+        self.assertEqual(fractions['free'], 1.0)
+        self.assertEqual(fractions['cheap'], 0.2)
+        self.assertAlmostEqual(fractions['dear'], 0.5)
+
+    def test_plan(self):
+        analyzers = [get_mock_analyzer('free'),
+                     get_mock_analyzer('dear', cost=0.1),
+                     get_mock_analyzer('limited', quota=150)]
+        plan = Plan(analyzers, DOCS, budget=3.0)
+        self.assertEqual(plan.calls, {'free': 300, 'dear': 300,
+                                      'limited': 300})
+        self.assertAlmostEqual(plan.fractions['dear'], 0.1)
+        self.assertEqual(plan.num_docs('free'), 300)
+        self.assertEqual(plan.num_docs('dear'), 30)
+        self.assertEqual(plan.num_docs('limited'), 150)
+        self.assertTrue(plan.selects('free', 1))
+        self.assertEqual(sum(plan.selects('dear', doc_id)
+                             for doc_id, _, _ in DOCS), 30)
+        self.assertIn('Estimated cost: 3.00 of 3.00', plan.format())
+
+    def test_record__counts_against_the_budget(self):
+        meters = Meters()
+        meters.reset(budget=1.0)
+        analyzer = get_mock_analyzer('one', cost=0.4)
+        meters.record(analyzer, 2)
+        self.assertRaises(QuotaExhausted, meters.charge, analyzer)
+        self.assertEqual(meters.calls['one'], 2)
+
+    def test_share(self):
+        analyzers = [get_mock_analyzer('limited', quota=100),
+                     get_mock_analyzer('free')]
+        analyzers[0].rate_limit = (1, 5)
+        self.assertEqual(share(analyzers, 9.0, 4), 2.25)
+        self.assertEqual(analyzers[0].quota, 25)
+        self.assertEqual(analyzers[0].rate_limit, (1, 20))
+        self.assertEqual(analyzers[1].quota, None)
+        self.assertFalse(hasattr(analyzers[1], 'rate_limit'))
+        self.assertEqual(share(analyzers, None, 2), None)
+
+    def test_journal_calls(self):
+        dirname = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(dirname, 'journal.tsv')
+            journal = Journal(fname)
+            journal.write(0, 'one', '+', 0.1)
+            journal.write(1, 'one', 'Error', 0.1)
+            journal.write(2, 'one', 'Skipped', 0.0)
+            journal.close()
+            analyzers = [get_mock_analyzer('one'), get_mock_analyzer('two')]
+            self.assertEqual(journal_calls(analyzers, DOCS, fname),
+                             {'one': 2, 'two': 0})
+        finally:
+            shutil.rmtree(dirname)
+
+    def test_plan__resumed(self):
+        analyzers = [get_mock_analyzer('dear', cost=0.1),
+                     get_mock_analyzer('limited', quota=150)]
+        done = dict((str(doc_id), {'dear': '+', 'limited': '+'})
+                    for doc_id in range(100))
+        plan = Plan(analyzers, DOCS, budget=15.0, done=done,
+                    used={'dear': 100, 'limited': 100})
+        self.assertEqual(plan.calls, {'dear': 200, 'limited': 200})
+        self.assertEqual(plan.spent, 10.0)
+        self.assertAlmostEqual(plan.fractions['dear'], 0.25)
+        # the sample takes a fraction of each label, rounded up
+        self.assertTrue(50 <= plan.num_docs('dear') <= 52)
+        self.assertTrue(min(plan.samples['dear']) >= 100)
+        self.assertIn('Estimated cost: 15.00 of 15.00', plan.format())
@@ -0,0 +1,53 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+from mock import Mock
+
+from cache import ResponseCache, CacheMiss, cached
+
+
+def get_mock_analyzer(name):
+    mock_analyzer = Mock()
+    mock_analyzer.name = name
+    mock_analyzer.cache_settings = Mock(return_value={'language': 'en'})
+    return mock_analyzer
+
+
+class TestCase(unittest.TestCase):
+
+    def test_get__counts_hits_and_misses(self):
+        cache = ResponseCache(':memory:')
+        self.assertEqual(cache.get('one', {}, u'text'), None)
+        cache.put('one', {}, u'text', {'score': 0.5})
+        self.assertEqual(cache.get('one', {}, u'text'), {'score': 0.5})
+        self.assertEqual(cache.hits['one'], 1)
+        self.assertEqual(cache.misses['one'], 1)
+
+    def test_get__keys_on_provider_and_settings(self):
+        cache = ResponseCache(':memory:')
+        cache.put('one', {'language': 'en'}, u'text', {'score': 0.5})
+        self.assertEqual(cache.get('two', {'language': 'en'}, u'text'), None)
+        self.assertEqual(cache.get('one', {'language': 'de'}, u'text'), None)
+
+    def test_get__cache_only_raises_on_misses(self):
+        cache = ResponseCache(':memory:', cache_only=True)
+        self.assertRaises(CacheMiss, cache.get, 'one', {}, u'text')
+
+    def test_put__evicts_least_recently_used(self):
+        cache = ResponseCache(':memory:', max_size=30)
+        cache.put('one', {}, u'a', 'x' * 10)
+        cache.put('one', {}, u'b', 'x' * 10)
+        cache.get('one', {}, u'a')
+        cache.put('one', {}, u'c', 'x' * 10)
+        self.assertEqual(cache.get('one', {}, u'b'), None)
+        self.assertEqual(cache.get('one', {}, u'a'), 'x' * 10)
+        self.assertEqual(cache.get('one', {}, u'c'), 'x' * 10)
+
+    def test_cached__calls_the_api_once(self):
+        analyzer = get_mock_analyzer('one')
+        analyzer.cache = ResponseCache(':memory:')
+        fetch = Mock(return_value={'score': 0.5})
+        cached(analyzer, u'text', fetch)
+        actual = cached(analyzer, u'text', fetch)
+        self.assertEqual(actual, {'score': 0.5})
+        self.assertEqual(fetch.call_count, 1)
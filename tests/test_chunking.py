@@ -0,0 +1,73 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+from mock import Mock
+
+from chunking import split_text, combine, analyse_chunks, analyse_in_parallel
+
+
+def sign_label(score):
+    if score > 0.2:
+        return '+'
+    elif score < -0.2:
+        return '-'
+    return '0'
+
+
+class TestCase(unittest.TestCase):
+
+    def test_split_text(self):
+        text = u'Great phone. Awful battery! Fine screen?'
+        self.assertEqual(split_text(text, 100), [text])
+        self.assertEqual(split_text(text, 28),
+                         [u'Great phone. Awful battery!', u'Fine screen?'])
+        self.assertEqual(split_text(text, 15),
+                         [u'Great phone.', u'Awful battery!', u'Fine screen?'])
+
+    def test_split_text__splits_long_sentences(self):
+        chunks = split_text(u'one two three four ' + u'x' * 12, 10)
+        self.assertEqual(chunks, [u'one two', u'three four', u'xxxxxxxxxx',
+                                  u'xx'])
+        self.assertTrue(all(len(chunk) <= 10 for chunk in chunks))
+
+    def test_combine__mean(self):
+        outputs = [('+', 0.9), ('-', -0.3)]
+        self.assertEqual(combine(outputs, [10, 10], 'mean', sign_label),
+                         ('+', 0.3))
+        label, score = combine(outputs, [10, 30], 'mean', sign_label)
+        self.assertEqual(label, '0')
+        self.assertAlmostEqual(score, 0.0)
+
+    def test_combine__mean_without_scores_weighs_labels_by_length(self):
+        outputs = [('+', None), ('+', None), ('-', None)]
+        self.assertEqual(combine(outputs, [5, 5, 20], 'mean'), ('-', None))
+
+    def test_combine__vote(self):
+        outputs = [('+', 0.9), ('+', 0.5), ('-', -0.9)]
+        label, _ = combine(outputs, [5, 5, 20], 'vote', sign_label)
+        self.assertEqual(label, '+')
+
+    def test_analyse_chunks(self):
+        analyzer = Mock(spec=['max_length', 'chunk_strategy', 'score_label'])
+        analyzer.max_length = 15
+        analyzer.chunk_strategy = 'mean'
+        analyzer.score_label = sign_label
+        scores = {u'Great phone.': 0.8, u'Awful battery!': -0.4, u'Ok.': 0.0}
+        analyse_texts = Mock(side_effect=lambda texts: [
+            (sign_label(scores[text]), scores[text]) for text in texts])
+        outputs = analyse_chunks(analyzer, [u'Ok.',
+                                            u'Great phone. Awful battery!'],
+                                 analyse_texts)
+        analyse_texts.assert_called_once_with(
+            [u'Ok.', u'Great phone.', u'Awful battery!'])
+        self.assertEqual(outputs[0], ('0', 0.0))
+        self.assertEqual(outputs[1][0], '0')
+        self.assertAlmostEqual(outputs[1][1], (12 * 0.8 - 14 * 0.4) / 26)
+
+    def test_analyse_in_parallel(self):
+        self.assertEqual(analyse_in_parallel(len, [u'a', u'bb', u'ccc']),
+                         [1, 2, 3])
+
+        def broken(text):
+            raise ValueError(text)
+        self.assertRaises(ValueError, analyse_in_parallel, broken, [u'a', u'b'])
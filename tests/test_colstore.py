@@ -0,0 +1,78 @@
+# -*- coding: UTF-8 -*-
+
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from colstore import ColumnWriter, ColumnStore
+from scores import ERROR, SKIPPED, MISSING
+from metrics import store_metrics
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = os.path.join(tempfile.mkdtemp(), 'results.cols')
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.dir))
+
+    def write(self, writer):
+        writer.append(0, u'good day', '+', {'one': '+', 'two': '-'},
+                      {'one': 0.9}, {'one': 0.1, 'two': 0.2})
+        writer.append(1, u'naïve\tbad', '-', {'one': '-', 'two': 'Error'})
+        writer.append(2, u'no key', None, {'one': '0', 'two': 'Skipped'})
+
+    def test_roundtrip(self):
+        writer = ColumnWriter(self.dir, ['one', 'two'])
+        self.write(writer)
+        writer.close()
+        store = ColumnStore(self.dir)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.names, ['one', 'two'])
+        self.assertTrue(isinstance(store.labels('one'), np.memmap))
+        self.assertEqual(store.gold_array().tolist(), [2, 0, MISSING])
+        self.assertEqual(store.label_matrix().tolist(),
+                         [[2, 0, 1], [0, ERROR, SKIPPED]])
+        self.assertAlmostEqual(store.scores('one')[0], 0.9, places=5)
+        self.assertTrue(np.isnan(store.scores('two')).all())
+        self.assertAlmostEqual(store.latencies('two')[0], 0.2, places=5)
+        self.assertEqual(store.text(1), u'naïve\tbad')
+        self.assertEqual(store.doc_id(2), u'2')
+        self.assertEqual(store.disagreements().tolist(), [0])
+        self.assertAlmostEqual(store_metrics(store)['two']['accuracy'], 0.0)
+
+    def test_readers_only_see_flushed_documents(self):
+        writer = ColumnWriter(self.dir, ['one', 'two'], flush_every=2)
+        self.write(writer)
+        self.assertEqual(len(ColumnStore(self.dir)), 2)
+        writer.close()
+        self.assertEqual(len(ColumnStore(self.dir)), 3)
+
+    def test_append(self):
+        writer = ColumnWriter(self.dir, ['one', 'two'])
+        self.write(writer)
+        writer.close()
+        writer = ColumnWriter(self.dir, ['one', 'two'], append=True)
+        writer.append(3, u'more', '+', {'one': '+', 'two': '+'})
+        writer.close()
+        store = ColumnStore(self.dir)
+        self.assertEqual([store.text(i) for i in range(4)],
+                         [u'good day', u'naïve\tbad', u'no key', u'more'])
+        self.assertRaises(ValueError, ColumnWriter, self.dir, ['one'],
+                          append=True)
+
+    def test_export_csv(self):
+        writer = ColumnWriter(self.dir, ['one', 'two'])
+        self.write(writer)
+        writer.close()
+        fname = os.path.join(os.path.dirname(self.dir), 'results.csv')
+        ColumnStore(self.dir).export_csv(fname)
+        rows = list(csv.reader(open(fname, 'rb'), delimiter='\t'))
+        self.assertEqual(rows[0], ['doc_id', 'text', 'gold standard', 'one', 'two'])
+        self.assertEqual(rows[2], ['1', 'na\xc3\xafve\tbad', '-', '-', 'Error'])
+        self.assertEqual(rows[3], ['2', 'no key', '', '0', 'Skipped'])
@@ -6,15 +6,17 @@ from mock import Mock, patch
 
 import compare
 from compare import read_evaluation_data
+from compare import iter_evaluation_data
 from compare import read_config
 from compare import process_one_doc
 from compare import initialize_analysers
 from compare import evaluate
 from compare import get_max_weighted_errors
+from compare import configure_analysers
 
 
 def get_mock_analyzer(name, output):
-    mock_analyzer = Mock()
+    mock_analyzer = Mock(spec=['name', 'analyse'])
     mock_analyzer.analyse = Mock(return_value=output)
     mock_analyzer.name = name
     return mock_analyzer
@@ -49,6 +51,23 @@ class TestCase(unittest.TestCase):
             self.assertEqual(act_doc_id2key, exp_doc_id2key)
             self.assertEqual(act_doc_id2doc, exp_doc_id2doc)
 
+    def test_iter_evaluation_data(self):
+        lines = ["a\t+", "b\tX", "", "c\t0"]
+        mock_open = Mock(return_value=lines)
+        with patch('compare.codecs.open', mock_open):
+            actual = list(iter_evaluation_data('test.txt'))
+            self.assertEqual(actual, [(0, 'a', '+'), (1, 'c', '0')])
+
+    def test_evaluate__computes_error_rate_incrementally(self):
+        exp_error_rate = {'one': 3 / 5.0}
+        mock_analyzer = get_mock_analyzer('one', '-')
+        docs = [(0, 'a', '+'), (1, 'b', '0'), (2, 'c', '-')]
+        with patch('compare.csv'), \
+                patch('compare.codecs'), \
+                patch('compare.ANALYZERS', [mock_analyzer]):
+            _, act_error_rate = evaluate(iter(docs))
+        self.assertEqual(sorted(act_error_rate.items()), sorted(exp_error_rate.items()))
+
     def test_process_one_doc(self):
         mock_analyzers = [
             get_mock_analyzer('one', '+'),
@@ -77,38 +96,119 @@ class TestCase(unittest.TestCase):
 
     def test_initialize_analysers(self):
         analysers_to_use = ['skyttle', 'chatterbox', 'datumbox', 'repustate',
-                            'bitext', 'alchemy', 'viralheat', 'semantria']
+                            'bitext', 'viralheat']
         config = {
-            'mashape_auth': '',
+            'mashape_auth': 'x',
             'language': 'en',
-            'datumbox_key': '',
-            'repustate_key': '',
-            'bitext_user': '',
-            'bitext_pwd': '',
-            'alchemy_key': '',
-            'semantria_consumer_key': '',
-            'semantria_consumer_secret': '',
-            'viralheat_key': '',
+            'datumbox_key': 'x',
+            'repustate_key': 'x',
+            'bitext_user': 'x',
+            'bitext_pwd': 'x',
+            'viralheat_key': 'x',
         }
-        with patch('compare.ANALYZERS_TO_USE', analysers_to_use):
+        with patch('compare.ANALYZERS_TO_USE', analysers_to_use), \
+                patch('compare.ANALYZERS', []):
             initialize_analysers(config)
-            self.assertEqual(len(compare.ANALYZERS), len(analysers_to_use))
+            self.assertEqual([x.name for x in compare.ANALYZERS],
+                             analysers_to_use)
+
+    def test_initialize_analysers__selects_analyzers_in_the_config(self):
+        config = {'datumbox_key': 'x', 'lymbix_key': 'x',
+                  'analyzers': 'lymbix, datumbox'}
+        with patch('compare.ANALYZERS', []):
+            initialize_analysers(config)
+            self.assertEqual([x.name for x in compare.ANALYZERS],
+                             ['lymbix', 'datumbox'])
+
+    def test_configure_analysers(self):
+        mock_analyzer = get_mock_analyzer('one', '+')
+        with patch('compare.ANALYZERS', [mock_analyzer]):
+            configure_analysers({'one_batch_size': '10'})
+            self.assertEqual(mock_analyzer.batch_size, 10)
 
     def test_evaluate(self):
         exp_accuracy = {'one': 1.0}
         exp_error_rate = {'one': 0.0}
         mock_analyzer = get_mock_analyzer('one', '+')
-        mock_process = Mock(return_value=(['+'], Counter({'one': 1}), Counter()))
-        doc_id2text = {0: 'Some text.'}
-        doc_id2key = {0: '+'}
-        with patch('compare.process_one_doc', mock_process), \
-                patch('compare.csv'), \
+        docs = [(0, 'Some text.', '+')]
+        with patch('compare.csv'), \
                 patch('compare.codecs'), \
                 patch('compare.ANALYZERS', [mock_analyzer]):
-            act_accuracy, act_error_rate = evaluate(doc_id2text, doc_id2key)
+            act_accuracy, act_error_rate = evaluate(docs)
             self.assertEqual(sorted(act_accuracy.items()), sorted(exp_accuracy.items()))
             self.assertEqual(sorted(act_error_rate.items()), sorted(exp_error_rate.items()))
 
+    def test_evaluate__writes_rows_in_doc_id_order(self):
+        mock_csv = Mock()
+        analyzers = [get_mock_analyzer('one', '+'), get_mock_analyzer('two', '-')]
+        docs = [(0, 'a', '+'), (1, 'b', '-'), (2, 'c', '0')]
+        with patch('compare.csv', mock_csv), \
+                patch('compare.codecs'), \
+                patch('compare.ANALYZERS', analyzers):
+            evaluate(docs)
+        rows = [args[0] for args, _ in mock_csv.writer.return_value.writerow.call_args_list]
+        self.assertEqual(rows[1:], [[0, 'a', '+', '+', '-'],
+                                    [1, 'b', '-', '+', '-'],
+                                    [2, 'c', '0', '+', '-']])
+
+    def test_evaluate__resumes_from_done_outputs(self):
+        exp_accuracy = {'one': 0.5}
+        mock_analyzer = get_mock_analyzer('one', '+')
+        mock_journal = Mock()
+        docs = [(0, 'a', '+'), (1, 'b', '+')]
+        done = {'0': {'one': ('-', None, 0.1)}}
+        with patch('compare.csv'), \
+                patch('compare.codecs'), \
+                patch('compare.ANALYZERS', [mock_analyzer]):
+            act_accuracy, _ = evaluate(docs, mock_journal, done)
+        self.assertEqual(sorted(act_accuracy.items()), sorted(exp_accuracy.items()))
+        mock_analyzer.analyse.assert_called_once_with('b')
+        self.assertEqual(mock_journal.write.call_args[0][:3], (1, 'one', '+'))
+
+    def test_evaluate__keeps_the_scores_of_resumed_documents(self):
+        mock_analyzer = get_mock_analyzer('one', '+')
+        mock_columns = Mock()
+        mock_manifest = Mock()
+        docs = [(0, 'a', '-'), (1, 'b', '+')]
+        done = {'0': {'one': ('-', -0.5, 0.25)}}
+        store = compare.ScoreStore(['one'])
+        with patch('compare.csv'), \
+                patch('compare.codecs'), \
+                patch('compare.ANALYZERS', [mock_analyzer]):
+            evaluate(docs, Mock(), done, store, columns=mock_columns,
+                     manifest=mock_manifest)
+        self.assertEqual(store.scores['one'][0], -0.5)
+        args = mock_columns.append.call_args_list[0][0]
+        self.assertEqual((args[4], args[5]), ({'one': -0.5}, {'one': 0.25}))
+        self.assertEqual(mock_manifest.write.call_args_list[0][0][3],
+                         {'one': -0.5})
+
+    def test_evaluate__reuses_outputs_from_a_previous_run(self):
+        mock_analyzer = get_mock_analyzer('one', '+')
+        mock_previous = Mock()
+        mock_previous.reuse = lambda docs, done, scores: (
+            done.setdefault('0', {'one': '-'}) and docs)
+        mock_manifest = Mock()
+        docs = [(0, 'a', '-'), (1, 'b', '+')]
+        with patch('compare.csv'), \
+                patch('compare.codecs'), \
+                patch('compare.ANALYZERS', [mock_analyzer]):
+            act_accuracy, _ = evaluate(docs, manifest=mock_manifest,
+                                       previous=mock_previous)
+        self.assertEqual(act_accuracy['one'], 1.0)
+        mock_analyzer.analyse.assert_called_once_with('b')
+        self.assertEqual([args[:3] for args, _
+                          in mock_manifest.write.call_args_list],
+                         [('a', '-', {'one': '-'}), ('b', '+', {'one': '+'})])
+
+    def test_parse_args__shards_have_their_own_files(self):
+        options = compare.parse_args(['gold.txt', '--shard', '1/4'])
+        self.assertEqual((options.cache, options.log, options.journal),
+                         ('cache-1-of-4.db', 'compare-1-of-4.log',
+                          'journal-1-of-4.tsv'))
+        options = compare.parse_args(['gold.txt', '--no-cache'])
+        self.assertEqual((options.cache, options.log), ('', 'compare.log'))
+
     def test_get_max_weighted_errors(self):
         doc_id2key = {'doc1': '0', 'doc2': '+'}
         actual = get_max_weighted_errors(doc_id2key)
@@ -0,0 +1,53 @@
+# -*- coding: UTF-8 -*-
+
+import time
+import unittest
+
+from deadline import run_with_deadline, DeadlineExceeded
+
+
+def respond_after(seconds, result):
+    def respond():
+        time.sleep(seconds)
+        return result
+    return respond
+
+
+class TestCase(unittest.TestCase):
+
+    def test_run_with_deadline(self):
+        self.assertEqual(run_with_deadline(lambda: 1), 1)
+        self.assertEqual(run_with_deadline(lambda: 1, deadline=1), 1)
+
+    def test_run_with_deadline__gives_up_after_the_deadline(self):
+        start = time.time()
+        self.assertRaises(DeadlineExceeded, run_with_deadline,
+                          respond_after(1, None), deadline=0.05)
+        self.assertTrue(time.time() - start < 0.5)
+
+    def test_run_with_deadline__raises_the_exception(self):
+        def broken():
+            raise ValueError()
+        self.assertRaises(ValueError, run_with_deadline, broken, deadline=1)
+
+    def test_run_with_deadline__takes_the_first_response(self):
+        start = time.time()
+        result = run_with_deadline(respond_after(1, 'slow'), hedge_after=0.05,
+                                   hedge=respond_after(0, 'hedge'))
+        self.assertEqual(result, 'hedge')
+        self.assertTrue(time.time() - start < 0.5)
+
+    def test_run_with_deadline__does_not_hedge_fast_calls(self):
+        hedges = []
+        result = run_with_deadline(lambda: 'fast', hedge_after=1,
+                                   hedge=lambda: hedges.append(1))
+        self.assertEqual(result, 'fast')
+        self.assertEqual(hedges, [])
+
+    def test_run_with_deadline__waits_for_the_hedge_if_the_call_fails(self):
+        def broken():
+            time.sleep(0.1)
+            raise ValueError()
+        result = run_with_deadline(broken, hedge_after=0.05,
+                                   hedge=respond_after(0.1, 'hedge'))
+        self.assertEqual(result, 'hedge')
@@ -0,0 +1,30 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+
+from dedup import DedupIndex, normalize_text, exact_text
+
+
+class TestCase(unittest.TestCase):
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text(u'RT @bob: Great  phone! http://t.co/x1'),
+                         normalize_text(u'great phone!  https://t.co/y2 '))
+        self.assertEqual(normalize_text(u'Ｇreat'), u'great')
+        self.assertNotEqual(normalize_text(u'great phone'),
+                            normalize_text(u'bad phone'))
+
+    def test_lookup(self):
+        index = DedupIndex()
+        self.assertEqual(index.lookup(0, u'Good'), None)
+        self.assertEqual(index.lookup(1, u'Bad'), None)
+        self.assertEqual(index.lookup(2, u'good '), 0)
+        self.assertEqual(index.lookup(3, u'bad'), 1)
+        self.assertEqual((index.num_docs, index.num_unique), (4, 2))
+        self.assertAlmostEqual(index.ratio(), 0.5)
+
+    def test_lookup__exact(self):
+        index = DedupIndex(exact_text)
+        index.lookup(0, u'Good')
+        self.assertEqual(index.lookup(1, u'good'), None)
+        self.assertEqual(index.lookup(2, u'Good'), 0)
@@ -0,0 +1,79 @@
+# -*- coding: UTF-8 -*-
+
+import Queue
+import urllib2
+import unittest
+from mock import patch
+
+from instrument import Histogram, Instruments, INSTRUMENTS, start_server
+
+
+class TestCase(unittest.TestCase):
+
+    def test_histogram__quantile(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.05, 0.5, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 2, 1])
+        self.assertAlmostEqual(histogram.quantile(0.4), 0.1)
+        self.assertAlmostEqual(histogram.quantile(0.6), 0.55)
+        self.assertAlmostEqual(histogram.quantile(1.0), 1.0)
+
+    def test_call(self):
+        instruments = Instruments()
+        with patch('instrument.time.time') as mock_time:
+            mock_time.return_value = 10.0
+            with instruments.call('skyttle') as call:
+                mock_time.return_value = 10.3
+                self.assertEqual(instruments.in_flight['skyttle'], 1)
+                call.status = 200
+                call.sent = 10
+                call.received = 100
+        self.assertEqual(instruments.in_flight['skyttle'], 0)
+        self.assertEqual(instruments.peak_in_flight['skyttle'], 1)
+        self.assertEqual(instruments.requests[('skyttle', '200')], 1)
+        self.assertAlmostEqual(instruments.latencies['skyttle'].total, 0.3)
+        self.assertEqual(instruments.received['skyttle'], 100)
+
+    def test_call__records_the_exception(self):
+        instruments = Instruments()
+
+        def fail():
+            with instruments.call('skyttle'):
+                raise IOError()
+
+        self.assertRaises(IOError, fail)
+        self.assertEqual(instruments.requests[('skyttle', 'IOError')], 1)
+        self.assertEqual(instruments.in_flight['skyttle'], 0)
+
+    def test_render(self):
+        instruments = Instruments()
+        with instruments.call('skyttle') as call:
+            call.status = 429
+        instruments.retry('skyttle')
+        instruments.analysed('skyttle', 2)
+        instruments.analysed('skyttle', exc=ValueError())
+        queue = Queue.Queue()
+        queue.put('doc')
+        instruments.watch_queue('skyttle', queue)
+        text = instruments.render()
+        self.assertIn('api_requests_total{provider="skyttle",status="429"} 1',
+                      text)
+        self.assertIn('api_request_duration_seconds_bucket'
+                      '{provider="skyttle",le="+Inf"} 1', text)
+        self.assertIn('api_retries_total{provider="skyttle"} 1', text)
+        self.assertIn('analyzer_documents_total{provider="skyttle"} 3', text)
+        self.assertIn('analyzer_errors_total{provider="skyttle",'
+                      'error="ValueError"} 1', text)
+        self.assertIn('analyzer_queued_documents{provider="skyttle"} 1', text)
+        self.assertIn('skyttle', instruments.format_summary())
+
+    def test_start_server(self):
+        server = start_server(0)
+        try:
+            url = 'http://127.0.0.1:%d/metrics' % server.server_address[1]
+            text = urllib2.urlopen(url).read()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(text, INSTRUMENTS.render())
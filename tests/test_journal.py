@@ -0,0 +1,52 @@
+# -*- coding: UTF-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from journal import Journal, read_journal
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.fname = os.path.join(self.dirname, 'journal.tsv')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_read_journal__leaves_out_errors(self):
+        journal = Journal(self.fname)
+        journal.write(0, 'one', '+', 0.1)
+        journal.write(0, 'two', 'Error', 0.1)
+        journal.write(1, 'one', '-', 0.1)
+        journal.close()
+        self.assertEqual(read_journal(self.fname), {'0': {'one': ('+', None, 0.1)},
+                                                   '1': {'one': ('-', None, 0.1)}})
+
+    def test_read_journal__skips_incomplete_lines(self):
+        with open(self.fname, 'w') as fh:
+            fh.write('0\tone\t+\t0.1\n1\tone')
+        self.assertEqual(read_journal(self.fname), {'0': {'one': ('+', None, 0.1)}})
+
+    def test_journal__appends(self):
+        journal = Journal(self.fname)
+        journal.write(0, 'one', '+', 0.1)
+        journal.close()
+        journal = Journal(self.fname, append=True)
+        journal.write(1, 'one', '0', 0.1)
+        journal.close()
+        self.assertEqual(read_journal(self.fname), {'0': {'one': ('+', None, 0.1)},
+                                                   '1': {'one': ('0', None, 0.1)}})
+
+    def test_read_journal__missing_file(self):
+        self.assertEqual(read_journal(self.fname), {})
+
+    def test_read_journal__keeps_scores_and_latencies(self):
+        journal = Journal(self.fname)
+        journal.write(0, 'one', '+', 0.25, 0.75)
+        journal.close()
+        self.assertEqual(read_journal(self.fname),
+                         {'0': {'one': ('+', 0.75, 0.25)}})
@@ -0,0 +1,58 @@
+# -*- coding: UTF-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from manifest import Manifest, ManifestWriter
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.fname = os.path.join(self.dirname, 'manifest.tsv')
+        manifest = ManifestWriter(self.fname)
+        manifest.write(u'Good', '+', {'one': '+', 'two': 'Error'},
+                       {'one': 0.5})
+        manifest.write(u'Bad', '-', {'one': '-', 'two': '-'})
+        manifest.write(u'Gone', '0', {'one': '0', 'two': '0'})
+        manifest.write(u'Failed', '0', {'one': 'Error', 'two': 'Timeout'})
+        manifest.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_reuse(self):
+        previous = Manifest(self.fname)
+        docs = [(0, u'Bad', '+'), (1, u'New', '0'), (2, u'Good', '+'),
+                (3, u'Failed', '0')]
+        done = {'2': {'two': '0'}}
+        scores = {}
+        self.assertEqual(list(previous.reuse(docs, done, scores)), docs)
+        self.assertEqual(done, {'0': {'one': '-', 'two': '-'},
+                                '2': {'one': '+', 'two': '0'}})
+        self.assertEqual(scores, {('0', 'one'): (None, None),
+                                  ('0', 'two'): (None, None),
+                                  ('2', 'one'): (0.5, None)})
+        self.assertEqual((previous.num_reused, previous.num_relabelled,
+                          previous.num_new, previous.num_removed),
+                         (2, 1, 2, 1))
+
+    def test_has_text(self):
+        previous = Manifest(self.fname)
+        self.assertTrue(previous.has_text(u'Good'))
+        self.assertFalse(previous.has_text(u'Failed'))
+        self.assertFalse(previous.has_text(u'New'))
+
+    def test_interrupted_write__keeps_the_previous_manifest(self):
+        manifest = ManifestWriter(self.fname)
+        manifest.write(u'Other', '+', {'one': '+'})
+        self.assertEqual(len(Manifest(self.fname)), 4)
+
+    def test_missing_manifest(self):
+        previous = Manifest(os.path.join(self.dirname, 'missing.tsv'))
+        self.assertEqual(list(previous.reuse([(0, u'Good', '+')], {}, {})),
+                         [(0, u'Good', '+')])
+        self.assertEqual(previous.num_new, 1)
@@ -0,0 +1,61 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+import numpy as np
+
+from metrics import confusion_matrices, compute_metrics, store_metrics
+from scores import ScoreStore
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        # codes: 0 is '-', 1 is '0', 2 is '+', -1 is missing
+        self.gold = np.array([2, 2, 1, 0, 0, -1], dtype=np.int8)
+        self.labels = np.array([[2, 0, 1, 0, 1, 2],
+                                [2, 2, 1, 0, 0, -1]], dtype=np.int8)
+
+    def test_confusion_matrices(self):
+        actual = confusion_matrices(self.gold, self.labels)
+        self.assertEqual(actual[0].tolist(), [[1, 1, 0], [0, 1, 0], [1, 0, 1]])
+        self.assertEqual(actual[1].tolist(), [[2, 0, 0], [0, 1, 0], [0, 0, 2]])
+
+    def test_compute_metrics(self):
+        actual = compute_metrics(self.gold, self.labels)
+        self.assertAlmostEqual(actual['accuracy'][0], 3 / 6.0)
+        self.assertAlmostEqual(actual['accuracy'][1], 5 / 6.0)
+        # errors of the first analyzer: '+' as '-' (2), '-' as '0' (1)
+        self.assertAlmostEqual(actual['error_rate'][0], 3 / 9.0)
+        self.assertAlmostEqual(actual['error_rate'][1], 0.0)
+        self.assertEqual(actual['f1'][1].tolist(), [1.0, 1.0, 1.0])
+        self.assertAlmostEqual(actual['macro_f1'][1], 1.0)
+        self.assertAlmostEqual(actual['kappa'][1], 1.0)
+        self.assertAlmostEqual(actual['precision'][0][1], 0.5)
+        self.assertAlmostEqual(actual['recall'][0][2], 0.5)
+
+    def test_compute_metrics__kappa(self):
+        gold = np.array([2, 2, 0, 0], dtype=np.int8)
+        labels = np.array([[2, 0, 2, 0]], dtype=np.int8)
+        # observed 0.5, expected 0.5
+        self.assertAlmostEqual(compute_metrics(gold, labels)['kappa'][0], 0.0)
+
+    def test_store_metrics(self):
+        store = ScoreStore(['one'])
+        store.add_doc(0, '+')
+        store.set_output(0, 'one', '+')
+        store.add_doc(1, '-')
+        store.set_output(1, 'one', 'Error')
+        actual = store_metrics(store)
+        self.assertAlmostEqual(actual['one']['accuracy'], 0.5)
+        self.assertAlmostEqual(actual['one']['coverage'], 0.5)
+
+    def test_compute_metrics__skipped(self):
+        # the second analyzer was not sent the last three documents
+        gold = np.array([2, 0, 1, 2, 2], dtype=np.int8)
+        labels = np.array([[2, 0, 0, 2, 0],
+                           [2, 1, -2, -2, -2]], dtype=np.int8)
+        actual = compute_metrics(gold, labels)
+        self.assertAlmostEqual(actual['accuracy'][0], 3 / 5.0)
+        self.assertAlmostEqual(actual['accuracy'][1], 1 / 2.0)
+        self.assertAlmostEqual(actual['error_rate'][1], 1 / 4.0)
+        self.assertAlmostEqual(actual['coverage'][1], 1.0)
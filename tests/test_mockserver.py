@@ -0,0 +1,65 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+
+from mockserver import MockServer, get_score
+from pool import POOLS
+from aiapplied import AIApplied
+from bitext import Bitext
+from chatterbox import Chatterbox
+from datumbox import Datumbox
+from lymbix import Lymbix
+from repustate import Repustate
+from sentigem import Sentigem
+from skyttle import Skyttle
+from viralheat import Viralheat
+
+
+def expected_label(text, threshold=0.2):
+    score = get_score(text)
+    if score > threshold:
+        return '+'
+    elif score < -threshold:
+        return '-'
+    return '0'
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockServer()
+        self.server.start()
+        self.texts = [u'good', u'bad', u'so-so', u'great service']
+
+    def tearDown(self):
+        POOLS.close()
+        self.server.stop()
+
+    def get_analyzers(self):
+        analyzers = [
+            AIApplied('x'), Bitext('x', 'x'), Chatterbox('x'), Datumbox('x'),
+            Lymbix('x'), Repustate('x'), Sentigem('x'), Skyttle('x'),
+            Viralheat('x'),
+        ]
+        for analyzer in analyzers:
+            analyzer.url = self.server.url(analyzer.name.lower())
+            analyzer.rate_limit = None
+        return analyzers
+
+    def test_analyse__parses_the_response_of_each_provider(self):
+        for analyzer in self.get_analyzers():
+            for text in self.texts:
+                self.assertTrue(analyzer.analyse(text) in ('+', '-', '0'))
+
+    def test_analyse_batch__matches_analyse(self):
+        for analyzer in [AIApplied('x'), Bitext('x', 'x'), Skyttle('x')]:
+            analyzer.url = self.server.url(analyzer.name.lower())
+            expected = [analyzer.analyse(text) for text in self.texts]
+            self.assertEqual(analyzer.analyse_batch(self.texts), expected)
+        self.assertEqual(self.server.requests['skyttle'], len(self.texts) + 1)
+
+    def test_analyse__uses_synthetic_scores(self):
+        analyzer = Repustate('x')
+        analyzer.url = self.server.url('repustate')
+        for text in self.texts:
+            self.assertEqual(analyzer.analyse(text), expected_label(text))
@@ -0,0 +1,76 @@
+# -*- coding: UTF-8 -*-
+
+import threading
+import unittest
+import BaseHTTPServer
+from mock import patch
+
+from pool import ConnectionPool, PoolManager
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+
+    def do_POST(self):
+        Handler.connections.add(self.client_address)
+        self.rfile.read(int(self.headers['Content-Length']))
+        body = '{"score": 0.5}'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        Handler.connections = set()
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.host = '127.0.0.1:%d' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_request__reuses_the_connection(self):
+        pool = ConnectionPool('http', self.host, size=1, timeout=5)
+        for _ in range(3):
+            status, _, body = pool.request('POST', '/', 'text=a')
+            self.assertEqual(status, 200)
+            self.assertEqual(body, '{"score": 0.5}')
+        pool.close()
+        self.assertEqual(len(Handler.connections), 1)
+
+    def test_pool_manager__takes_the_largest_settings_for_a_host(self):
+        pools = PoolManager()
+        first = pools.get('http', 'example.com', size=2, timeout=5)
+        second = pools.get('http', 'example.com', size=4, timeout=3)
+        self.assertIs(first, second)
+        self.assertEqual((first.size, first.timeout), (4, 5))
+        for _ in range(4):
+            self.assertTrue(first.slots.acquire(False))
+        self.assertFalse(first.slots.acquire(False))
+
+    def test_pool_manager__warns_once_about_conflicting_settings(self):
+        pools = PoolManager()
+        with patch('pool.LOGGER') as logger:
+            for _ in range(3):
+                pools.get('http', 'example.com', size=2, timeout=5)
+                pools.get('http', 'example.com', size=4, timeout=3)
+        self.assertEqual(logger.warning.call_count, 1)
+
+    def test_request__applies_a_raised_timeout_to_open_connections(self):
+        pool = ConnectionPool('http', self.host, size=1, timeout=5)
+        pool.request('POST', '/', 'text=a')
+        pool.timeout = 10
+        conn = pool._get_connection()
+        self.assertEqual(conn.sock.gettimeout(), 10)
+        conn.close()
@@ -0,0 +1,45 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+from mock import patch
+
+from ratelimit import TokenBucket, parse_rate_limit
+
+
+class TestCase(unittest.TestCase):
+
+    def test_parse_rate_limit(self):
+        self.assertEqual(parse_rate_limit('1/5'), (1.0, 5.0))
+        self.assertEqual(parse_rate_limit('10'), (10.0, 1.0))
+        self.assertEqual(parse_rate_limit('none'), None)
+
+    def test_acquire__does_not_wait_without_limit(self):
+        bucket = TokenBucket()
+        with patch('ratelimit.time.sleep') as mock_sleep:
+            for _ in range(10):
+                self.assertEqual(bucket.acquire(), 0.0)
+            self.assertFalse(mock_sleep.called)
+        self.assertEqual(bucket.throttled, 0.0)
+
+    def test_acquire__waits_only_when_over_the_limit(self):
+        with patch('ratelimit.time.sleep'), patch('ratelimit.time.time') as mock_time:
+            mock_time.return_value = 100.0
+            bucket = TokenBucket((1, 5))
+            self.assertEqual(bucket.acquire(), 0.0)
+            self.assertAlmostEqual(bucket.acquire(), 5.0)
+            mock_time.return_value = 120.0
+            self.assertEqual(bucket.acquire(), 0.0)
+        self.assertAlmostEqual(bucket.throttled, 5.0)
+
+    def test_backoff__pauses_and_slows_down(self):
+        bucket = TokenBucket()
+        with patch('ratelimit.time.sleep'), patch('ratelimit.time.time') as mock_time:
+            mock_time.return_value = 100.0
+            bucket.backoff()
+            self.assertAlmostEqual(bucket.acquire(), 1.0)
+            bucket.backoff()
+            self.assertAlmostEqual(bucket.acquire(), 2.0)
+            bucket.succeeded()
+            mock_time.return_value = 200.0
+            self.assertEqual(bucket.acquire(), 0.0)
+        self.assertEqual(bucket.backoffs, 2)
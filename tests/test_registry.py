@@ -0,0 +1,46 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+from mock import Mock, patch
+
+import registry
+from registry import build_analyzers, check_credentials, parse_names
+from pool import HTTPError
+
+
+class TestCase(unittest.TestCase):
+
+    def test_parse_names(self):
+        self.assertEqual(parse_names(' Skyttle,datumbox,'),
+                         ['skyttle', 'datumbox'])
+        self.assertEqual(parse_names(None), [])
+        self.assertRaises(ValueError, parse_names, 'skyttle,alchemy')
+
+    def test_build_analyzers__imports_only_the_selected_modules(self):
+        config = {'datumbox_key': 'x', 'sentigem_key': 'y'}
+        with patch('registry.importlib.import_module',
+                   wraps=registry.importlib.import_module) as mock_import:
+            analyzers = build_analyzers(['sentigem', 'datumbox'], config)
+        self.assertEqual([x.name for x in analyzers], ['sentigem', 'datumbox'])
+        self.assertEqual(analyzers[0].api_key, 'y')
+        self.assertEqual(sorted(args[0] for args, _
+                                in mock_import.call_args_list),
+                         ['datumbox', 'sentigem'])
+
+    def test_build_analyzers__checks_the_config_first(self):
+        with patch('registry.load_class') as mock_load_class:
+            try:
+                build_analyzers(['bitext', 'datumbox'],
+                                {'bitext_user': 'x', 'language': 'en'})
+            except ValueError, exc:
+                self.assertIn('bitext_pwd, datumbox_key', str(exc))
+            else:
+                self.fail("Missing settings were not reported")
+        self.assertFalse(mock_load_class.called)
+
+    def test_check_credentials(self):
+        analyzer = Mock(spec=['name', 'analyse'])
+        analyzer.analyse = Mock(side_effect=HTTPError(503, 'Unavailable'))
+        check_credentials(analyzer)
+        analyzer.analyse = Mock(side_effect=HTTPError(401, 'Unauthorized'))
+        self.assertRaises(HTTPError, check_credentials, analyzer)
@@ -0,0 +1,343 @@
+# -*- coding: UTF-8 -*-
+
+import time
+import socket
+import threading
+import unittest
+from mock import Mock, patch
+
+from scheduler import Scheduler, FairQueue, Lane, WorkerPool, SKIPPED, \
+    TIMEOUT
+from dedup import DedupIndex
+
+
+def get_mock_analyzer(name, side_effect):
+    mock_analyzer = Mock(spec=['name', 'analyse'])
+    mock_analyzer.analyse = Mock(side_effect=side_effect)
+    mock_analyzer.name = name
+    return mock_analyzer
+
+
+class TestCase(unittest.TestCase):
+
+    def test_run__yields_documents_in_order(self):
+        def slow(text):
+            time.sleep(0.01)
+            return '-'
+        analyzers = [get_mock_analyzer('fast', lambda text: '+'),
+                     get_mock_analyzer('slow', slow)]
+        docs = [(i, 'text %d' % i, '+') for i in range(20)]
+        actual = list(Scheduler(analyzers).run(docs))
+        self.assertEqual([doc for doc, _ in actual], docs)
+        for _, outputs in actual:
+            self.assertEqual(outputs, {'fast': '+', 'slow': '-'})
+
+    def test_run__fast_analyzer_does_not_wait_for_slow_one(self):
+        done = []
+        def fast(text):
+            done.append(text)
+            return '+'
+        def slow(text):
+            time.sleep(0.05)
+            return '0'
+        analyzers = [get_mock_analyzer('fast', fast),
+                     get_mock_analyzer('slow', slow)]
+        docs = [(i, str(i), '+') for i in range(10)]
+        results = Scheduler(analyzers).run(docs)
+        next(results)
+        self.assertEqual(len(done), 10)
+
+    def test_run__deals_with_analyzer_errors(self):
+        def broken(text):
+            raise ValueError(text)
+        analyzers = [get_mock_analyzer('broken', broken)]
+        _, outputs = list(Scheduler(analyzers).run([(0, 'a', '+')]))[0]
+        self.assertEqual(outputs['broken'][0], None)
+        self.assertTrue(isinstance(outputs['broken'][1], ValueError))
+
+    def test_run__no_documents(self):
+        analyzers = [get_mock_analyzer('one', lambda text: '+')]
+        self.assertEqual(list(Scheduler(analyzers).run([])), [])
+
+    def test_run__sends_documents_in_batches(self):
+        class BatchAnalyzer:
+            name = 'batch'
+            batch_size = 5
+            def __init__(self):
+                self.batches = []
+            def analyse_batch(self, texts):
+                self.batches.append(texts)
+                return ['+' for _ in texts]
+        analyzer = BatchAnalyzer()
+        docs = [(i, str(i), '+') for i in range(12)]
+        actual = list(Scheduler([analyzer]).run(docs))
+        self.assertEqual([outputs for _, outputs in actual], [{'batch': '+'}] * 12)
+        self.assertTrue(all(len(batch) <= 5 for batch in analyzer.batches))
+        self.assertEqual(sum(analyzer.batches, []), [str(i) for i in range(12)])
+
+    def test_run__falls_back_to_single_documents_if_a_batch_fails(self):
+        class BatchAnalyzer:
+            name = 'batch'
+            batch_size = 5
+            def analyse_batch(self, texts):
+                raise ValueError()
+            def analyse(self, text):
+                return '-'
+        docs = [(i, str(i), '+') for i in range(3)]
+        actual = list(Scheduler([BatchAnalyzer()]).run(docs))
+        self.assertEqual([outputs for _, outputs in actual], [{'batch': '-'}] * 3)
+
+    def test_run__runs_concurrent_workers_for_an_analyzer(self):
+        lock = threading.Lock()
+        state = {'running': 0, 'max_running': 0}
+        def slow(text):
+            with lock:
+                state['running'] += 1
+                state['max_running'] = max(state['max_running'], state['running'])
+            time.sleep(0.02)
+            with lock:
+                state['running'] -= 1
+            return '+'
+        analyzer = get_mock_analyzer('slow', slow)
+        analyzer.concurrency = 4
+        docs = [(i, str(i), '+') for i in range(12)]
+        actual = list(Scheduler([analyzer]).run(docs))
+        self.assertEqual([doc for doc, _ in actual], docs)
+        self.assertEqual(state['max_running'], 4)
+
+    def test_run__skips_documents_already_done(self):
+        analyzer = get_mock_analyzer('one', lambda text: '+')
+        docs = [(0, 'a', '+'), (1, 'b', '+')]
+        done = {'0': {'one': '-'}}
+        actual = list(Scheduler([analyzer]).run(docs, done))
+        self.assertEqual([outputs for _, outputs in actual], [{'one': '-'}, {'one': '+'}])
+        analyzer.analyse.assert_called_once_with('b')
+
+    def test_run__reports_each_result(self):
+        on_result = Mock()
+        analyzer = get_mock_analyzer('one', lambda text: '+')
+        list(Scheduler([analyzer], on_result=on_result).run([(0, 'a', '+')]))
+        (doc, name, output, latency, score), _ = on_result.call_args
+        self.assertEqual((doc, name, output), ((0, 'a', '+'), 'one', '+'))
+
+    def test_retire__stops_sending_documents(self):
+        one = get_mock_analyzer('one', lambda text: '+')
+        two = get_mock_analyzer('two', lambda text: '-')
+        docs = [(i, str(i), '+') for i in range(50)]
+        scheduler = Scheduler([one, two], max_ahead=1)
+        actual = []
+        for doc, outputs in scheduler.run(docs):
+            actual.append(outputs)
+            if doc[0] == 10:
+                scheduler.retire('one')
+        self.assertEqual(len(actual), 50)
+        self.assertEqual(actual[-1], {'one': SKIPPED, 'two': '-'})
+        self.assertTrue(one.analyse.call_count < 50)
+        self.assertEqual(two.analyse.call_count, 50)
+
+    def test_retire__stops_reading_documents_when_all_are_retired(self):
+        one = get_mock_analyzer('one', lambda text: '+')
+        docs = iter([(i, str(i), '+') for i in range(50)])
+        scheduler = Scheduler([one], max_ahead=1)
+        for doc, outputs in scheduler.run(docs):
+            if doc[0] == 10:
+                scheduler.retire('one')
+        self.assertTrue(len(list(docs)) > 0)
+
+    def test_run__sends_duplicates_once(self):
+        on_result = Mock()
+        analyzer = get_mock_analyzer('one', lambda text: text[0])
+        docs = [(0, '+a', '+'), (1, '-b', '-'), (2, '+A', '+'), (3, '+a ', '+')]
+        scheduler = Scheduler([analyzer], on_result=on_result,
+                              dedup=DedupIndex())
+        actual = list(scheduler.run(docs))
+        self.assertEqual([doc for doc, _ in actual], docs)
+        self.assertEqual([outputs for _, outputs in actual],
+                         [{'one': '+'}, {'one': '-'}, {'one': '+'}, {'one': '+'}])
+        self.assertEqual(analyzer.analyse.call_count, 2)
+        reported = sorted(args[0][0] for args, _ in on_result.call_args_list)
+        self.assertEqual(reported, [0, 1, 2, 3])
+
+    def test_run__reports_duplicates_of_documents_already_done(self):
+        analyzer = Mock(spec=['name', 'analyse', 'analyse_with_score'])
+        analyzer.name = 'one'
+        analyzer.analyse_with_score = Mock(return_value=('+', 0.7))
+        reported = threading.Event()
+        on_result = Mock(side_effect=lambda *args: reported.set())
+        def docs():
+            yield (0, 'good', '+')
+            reported.wait(5)
+            yield (1, 'Good', '+')
+            yield (2, 'bad', '-')
+        scheduler = Scheduler([analyzer], on_result=on_result,
+                              dedup=DedupIndex())
+        actual = list(scheduler.run(docs()))
+        self.assertEqual([outputs for _, outputs in actual],
+                         [{'one': '+'}] * 3)
+        self.assertEqual(analyzer.analyse_with_score.call_count, 2)
+        reported = sorted((args[0][0], args[4])
+                          for args, _ in on_result.call_args_list)
+        self.assertEqual(reported, [(0, 0.7), (1, 0.7), (2, 0.7)])
+        on_result.assert_any_call((1, 'Good', '+'), 'one', '+', 0.0, 0.7)
+        self.assertEqual(scheduler.first_outputs, {0: ('+', 0.7),
+                                                   2: ('+', 0.7)})
+        self.assertEqual(scheduler.first_scores, {})
+
+    def test_run__times_out_documents_after_the_deadline(self):
+        def stuck(text):
+            if text == 'stuck':
+                time.sleep(1)
+            return '+'
+        analyzer = Mock(spec=['name', 'analyse', 'deadline'])
+        analyzer.analyse = Mock(side_effect=stuck)
+        analyzer.name = 'one'
+        analyzer.deadline = 0.05
+        docs = [(0, 'a', '+'), (1, 'stuck', '+'), (2, 'b', '+')]
+        start = time.time()
+        actual = list(Scheduler([analyzer]).run(docs))
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertEqual([outputs['one'] for _, outputs in actual],
+                         ['+', TIMEOUT, '+'])
+
+    def test_run__keeps_the_deadline_across_retries(self):
+        def failing(text):
+            time.sleep(0.06)
+            raise socket.error()
+        analyzer = Mock(spec=['name', 'analyse', 'deadline',
+                              'transient_retries'])
+        analyzer.analyse = Mock(side_effect=failing)
+        analyzer.name = 'one'
+        analyzer.deadline = 0.1
+        analyzer.transient_retries = 5
+        start = time.time()
+        with patch('breaker.random.uniform', return_value=0.05):
+            actual = list(Scheduler([analyzer]).run([(0, 'a', '+')]))
+        self.assertTrue(time.time() - start < 0.3)
+        self.assertEqual(actual[0][1], {'one': TIMEOUT})
+        self.assertEqual(analyzer.analyse.call_count, 1)
+
+    def test_run__skips_documents_while_the_circuit_is_open(self):
+        analyzer = Mock(spec=['name', 'analyse', 'circuit_threshold',
+                              'circuit_reset', 'transient_retries'])
+        analyzer.analyse = Mock(side_effect=socket.error())
+        analyzer.name = 'down'
+        analyzer.circuit_threshold = 2
+        analyzer.circuit_reset = 60
+        analyzer.transient_retries = 0
+        docs = [(i, str(i), '+') for i in range(10)]
+        actual = list(Scheduler([analyzer]).run(docs))
+        outputs = [outputs['down'] for _, outputs in actual]
+        self.assertEqual(outputs[2:], [SKIPPED] * 8)
+        self.assertEqual(analyzer.analyse.call_count, 2)
+
+    def test_run__stops_an_analyzer_at_its_quota(self):
+        from budget import QuotaExhausted
+        calls = []
+        def metered(text):
+            if len(calls) == 3:
+                raise QuotaExhausted()
+            calls.append(text)
+            return '+'
+        analyzers = [get_mock_analyzer('metered', metered),
+                     get_mock_analyzer('free', lambda text: '-')]
+        docs = [(i, str(i), '+') for i in range(10)]
+        actual = list(Scheduler(analyzers).run(docs))
+        self.assertEqual([outputs['metered'] for _, outputs in actual],
+                         ['+'] * 3 + [SKIPPED] * 7)
+        self.assertEqual([outputs['free'] for _, outputs in actual], ['-'] * 10)
+
+    def test_run__sends_the_documents_in_the_plan(self):
+        plan = Mock()
+        plan.selects = lambda name, doc_id: doc_id % 2 == 0
+        analyzer = get_mock_analyzer('one', lambda text: '+')
+        docs = [(i, str(i), '+') for i in range(4)]
+        actual = list(Scheduler([analyzer], plan=plan).run(docs))
+        self.assertEqual([outputs['one'] for _, outputs in actual],
+                         ['+', SKIPPED, '+', SKIPPED])
+        self.assertEqual(analyzer.analyse.call_count, 2)
+
+    def test_fair_queue__takes_from_the_lanes_in_turn(self):
+        tasks = FairQueue()
+        first = Lane(None, set())
+        second = Lane(None, set())
+        tasks.add_lane(first)
+        tasks.add_lane(second)
+        for i in range(3):
+            tasks.put(first, (i, 'first'))
+        tasks.put(second, (0, 'second'))
+        actual = [tasks.get() for _ in range(4)]
+        self.assertEqual([(lane is first, task) for lane, task in actual],
+                         [(True, (0, 'first')), (False, (0, 'second')),
+                          (True, (1, 'first')), (True, (2, 'first'))])
+        tasks.close()
+        self.assertEqual(tasks.get(), None)
+
+    def test_run__shares_workers_between_runs(self):
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+        def analyse(text):
+            with lock:
+                in_flight.append(text)
+                peak.append(len(in_flight))
+            time.sleep(0.005)
+            with lock:
+                in_flight.remove(text)
+            return '+'
+        analyzer = get_mock_analyzer('one', analyse)
+        analyzer.concurrency = 2
+        workers = WorkerPool([analyzer])
+        results = {}
+        def run(name):
+            docs = [(i, '%s %d' % (name, i), '+') for i in range(20)]
+            results[name] = list(Scheduler([analyzer], workers=workers)
+                                 .run(docs))
+        runs = [threading.Thread(target=run, args=(name,))
+                for name in ('a', 'b', 'c')]
+        for thread in runs:
+            thread.start()
+        for thread in runs:
+            thread.join()
+        workers.close()
+        for name in ('a', 'b', 'c'):
+            self.assertEqual([outputs for _, outputs in results[name]],
+                             [{'one': '+'}] * 20)
+        self.assertEqual(len(workers.workers), 2)
+        self.assertLessEqual(max(peak), 2)
+
+    def test_run__shares_workers_between_variants_of_an_analyzer(self):
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+        def analyse(label):
+            def analyse(text):
+                with lock:
+                    in_flight.append(text)
+                    peak.append(len(in_flight))
+                time.sleep(0.005)
+                with lock:
+                    in_flight.remove(text)
+                return label
+            return analyse
+        english = get_mock_analyzer('one', analyse('+'))
+        german = get_mock_analyzer('one', analyse('-'))
+        english.concurrency = german.concurrency = 2
+        workers = WorkerPool()
+        results = {}
+        def run(analyzer):
+            docs = [(i, '%d' % i, '+') for i in range(20)]
+            results[analyzer] = list(Scheduler([analyzer], workers=workers)
+                                     .run(docs))
+        runs = [threading.Thread(target=run, args=(analyzer,))
+                for analyzer in (english, german)]
+        for thread in runs:
+            thread.start()
+        for thread in runs:
+            thread.join()
+        workers.close()
+        self.assertEqual([outputs for _, outputs in results[english]],
+                         [{'one': '+'}] * 20)
+        self.assertEqual([outputs for _, outputs in results[german]],
+                         [{'one': '-'}] * 20)
+        self.assertEqual(len(workers.workers), 2)
+        self.assertLessEqual(max(peak), 2)
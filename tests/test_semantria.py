@@ -0,0 +1,112 @@
+# -*- coding: UTF-8 -*-
+
+import sys
+import threading
+import unittest
+from mock import MagicMock, patch
+
+from deadline import DeadlineExceeded
+from instrument import INSTRUMENTS
+
+# the Semantria SDK is not needed to test the routing of documents
+with patch.dict(sys.modules, {'semantria': MagicMock()}):
+    import semantria_api
+
+
+class FakeSession:
+    """Processes the queued documents, returning them from
+    getProcessedDocuments in batches as given by the test
+    """
+
+    def __init__(self):
+        self.Error = MagicMock()
+        self.lock = threading.Lock()
+        self.queued = {}
+        self.queued_event = threading.Event()
+        # lists of texts of the documents returned by each poll, None for
+        # all the documents that are still queued
+        self.polls = []
+
+    def queueBatch(self, docs):
+        with self.lock:
+            for doc in docs:
+                self.queued[doc['text']] = doc
+        self.queued_event.set()
+        return 202
+
+    def getProcessedDocuments(self):
+        with self.lock:
+            if not self.polls or not self.queued:
+                return 202
+            texts = self.polls.pop(0)
+            if texts is None:
+                texts = list(self.queued)
+            if any(text not in self.queued for text in texts):
+                self.polls.insert(0, texts)
+                return 202
+            return [self.process(self.queued.pop(text)) for text in texts]
+
+    def process(self, doc):
+        if doc['text'] == 'broken':
+            return {'id': doc['id'], 'status': 'FAILED'}
+        return {'id': doc['id'], 'status': 'PROCESSED',
+                'sentiment_score': {'good': 0.5, 'bad': -0.5}.get(doc['text'],
+                                                                   0.0)}
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        with patch.object(semantria_api, 'semantria') as mock_semantria:
+            mock_semantria.Session.return_value = self.session
+            self.analyzer = semantria_api.Semantria('key', 'secret')
+        self.analyzer.poll_interval = 0.01
+        INSTRUMENTS.reset()
+
+    def analyse_all(self, texts):
+        """Analyse the texts in concurrent threads
+        :return: a dict of texts to their outputs or exceptions
+        """
+        results = {}
+
+        def analyse(text):
+            try:
+                results[text] = self.analyzer.analyse_with_score(text)
+            except Exception, exc:
+                results[text] = exc
+
+        threads = [threading.Thread(target=analyse, args=(text,))
+                   for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_get_data__routes_documents_returned_out_of_order(self):
+        self.session.polls = [['neutral'], ['bad', 'good']]
+        results = self.analyse_all(['good', 'bad', 'neutral'])
+        self.assertEqual(results, {'good': ('+', 0.5), 'bad': ('-', -0.5),
+                                   'neutral': ('0', 0.0)})
+        self.assertFalse(self.analyzer.waiting)
+
+    def test_get_data__failed_document(self):
+        self.session.polls = [None]
+        results = self.analyse_all(['broken', 'good'])
+        self.assertIsInstance(results['broken'], ValueError)
+        self.assertEqual(results['good'], ('+', 0.5))
+
+    def test_get_data__gives_up_on_a_missing_document(self):
+        self.analyzer.deadline = 0.05
+        self.assertRaises(DeadlineExceeded, self.analyzer.get_data, 'good')
+        self.assertFalse(self.analyzer.waiting)
+        self.assertFalse(self.analyzer.outgoing)
+
+    def test_collect_documents__records_the_status_of_polls(self):
+        self.session.polls = [None]
+        self.analyse_all(['good'])
+        statuses = set(status for provider, status in INSTRUMENTS.requests
+                       if provider == 'semantria')
+        self.assertIn('202', statuses)
+        self.assertNotIn('200', statuses)
@@ -0,0 +1,129 @@
+# -*- coding: UTF-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import urllib2
+from mock import Mock, patch
+
+from service import Service, start_server, DONE, FAILED
+
+
+def get_mock_analyzer(name, output):
+    mock_analyzer = Mock(spec=['name', 'analyse', 'language'])
+    mock_analyzer.analyse = Mock(return_value=output)
+    mock_analyzer.name = name
+    return mock_analyzer
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.gold = os.path.join(self.dirname, 'gold.txt')
+        with open(self.gold, 'w') as fh:
+            fh.write('Good.\t+\nBad.\t-\nGood again.\t+\nFine.\t0\n')
+        self.built = []
+
+        def build_analyzer(name, config):
+            analyzer = get_mock_analyzer(name, '+')
+            analyzer.language = config.get('language')
+            self.built.append(analyzer)
+            return analyzer
+
+        self.patcher = patch('service.build_analyzer', build_analyzer)
+        self.patcher.start()
+        self.service = Service({'datumbox_key': 'key', 'language': 'en'},
+                               max_jobs=2,
+                               results_dir=os.path.join(self.dirname, 'jobs'))
+
+    def tearDown(self):
+        self.service.shutdown()
+        self.patcher.stop()
+        shutil.rmtree(self.dirname)
+
+    def test_run__reuses_analyzers_between_jobs(self):
+        jobs = [self.service.submit(self.gold, 'datumbox') for _ in range(3)]
+        jobs.append(self.service.submit(self.gold, 'datumbox', language='de'))
+        for job in jobs:
+            job.finished.wait(5)
+            self.assertEqual(job.status, DONE)
+            progress = job.progress()
+            self.assertEqual(progress['documents'], 4)
+            self.assertEqual(progress['metrics']['datumbox']['accuracy'], 0.5)
+            self.assertTrue(os.path.exists(progress['results']))
+        self.assertEqual([analyzer.language for analyzer in self.built],
+                         ['en', 'de'])
+        self.assertEqual(self.built[0].analyse.call_count, 12)
+
+    def test_get_analyzer__checks_credentials_without_holding_the_lock(self):
+        self.service.check = True
+        checking = threading.Event()
+        checked = threading.Event()
+        def check_credentials(analyzer):
+            checking.set()
+            checked.wait(5)
+        with patch('service.check_credentials', check_credentials):
+            analyzers = []
+            getters = [threading.Thread(
+                target=lambda: analyzers.append(
+                    self.service.get_analyzer('datumbox')))
+                for _ in range(2)]
+            for getter in getters:
+                getter.start()
+            self.assertTrue(checking.wait(5))
+            start = time.time()
+            job = self.service.submit(self.gold, 'datumbox', language='de')
+            self.assertLess(time.time() - start, 1)
+            checked.set()
+            for getter in getters:
+                getter.join(5)
+            job.finished.wait(5)
+        self.assertEqual(len(self.built), 2)
+        self.assertIs(analyzers[0], analyzers[1])
+
+    def test_get_analyzer__builds_again_after_an_error(self):
+        with patch('service.check_credentials',
+                   side_effect=[IOError('rejected'), None]):
+            self.service.check = True
+            self.assertRaises(IOError, self.service.get_analyzer, 'datumbox')
+            analyzer = self.service.get_analyzer('datumbox')
+        self.assertIs(analyzer, self.built[1])
+        self.assertIs(self.service.get_analyzer('datumbox'), analyzer)
+
+    def test_run__reports_failed_jobs(self):
+        with patch('service.compare.evaluate', side_effect=IOError('gone')):
+            job = self.service.submit(self.gold, 'datumbox')
+            job.finished.wait(5)
+        self.assertEqual((job.status, job.error), (FAILED, 'gone'))
+
+    def test_submit__rejects_unknown_analyzers_and_missing_settings(self):
+        self.assertRaises(ValueError, self.service.submit, self.gold, 'nope')
+        self.assertRaises(ValueError, self.service.submit, self.gold,
+                          'skyttle')
+        self.assertRaises(ValueError, self.service.submit,
+                          os.path.join(self.dirname, 'missing.txt'))
+
+    def test_server(self):
+        server = start_server(self.service, port=0)
+        url = 'http://127.0.0.1:%d' % server.server_address[1]
+        try:
+            job = json.load(urllib2.urlopen(
+                url + '/jobs', json.dumps({'gold': self.gold,
+                                           'analyzers': 'datumbox'})))
+            lines = urllib2.urlopen('%s/jobs/%s/progress?interval=0.01' %
+                                    (url, job['id'])).read().splitlines()
+            self.assertEqual(json.loads(lines[-1])['status'], DONE)
+            self.assertEqual(json.load(urllib2.urlopen(url + '/jobs'))[0]['id'],
+                             job['id'])
+            try:
+                urllib2.urlopen(url + '/jobs', json.dumps({'gold': 'nope'}))
+                self.fail()
+            except urllib2.HTTPError, exc:
+                self.assertEqual(exc.code, 400)
+        finally:
+            server.shutdown()
@@ -0,0 +1,89 @@
+# -*- coding: UTF-8 -*-
+
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+import argparse
+from mock import Mock, patch
+
+from shard import parse_shard, shard_fname, shard_docs, merge, run
+from scores import ScoreStore, ERROR
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_results(self, fname, names, rows):
+        fname = os.path.join(self.dir, fname)
+        with open(fname, 'wb') as fh:
+            writer = csv.writer(fh, delimiter='\t')
+            writer.writerow(['doc_id', 'text', 'gold standard'] + names)
+            for row in rows:
+                writer.writerow(row)
+        return fname
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('1/4'), (1, 4))
+        self.assertRaises(argparse.ArgumentTypeError, parse_shard, '4/4')
+        self.assertRaises(argparse.ArgumentTypeError, parse_shard, 'a')
+
+    def test_shard_fname(self):
+        self.assertEqual(shard_fname('results.csv', 1, 4), 'results-1-of-4.csv')
+        self.assertEqual(shard_fname('journal', 0, 2), 'journal-0-of-2')
+
+    def test_shard_docs(self):
+        docs = [(i, str(i), '+') for i in range(100)]
+        for by in ('hash', 'range'):
+            shards = [list(shard_docs(docs, i, 3, by, len(docs)))
+                      for i in range(3)]
+            self.assertEqual(sorted(sum(shards, [])), docs)
+            self.assertTrue(all(shard for shard in shards))
+        self.assertEqual(list(shard_docs(docs, 0, 2, 'range', 100)), docs[:50])
+
+    def test_merge(self):
+        names = ['one', 'two']
+        first = self.write_results('results-0-of-2.csv', names, [
+            ['0', 'good\tday', '+', '+', 'Error'],
+            ['3', 'so so', '0', '0', '-']])
+        second = self.write_results('results-1-of-2.csv', names, [
+            ['1', 'bad', '-', '-', '-'],
+            ['2', 'no key', '', '+', '0']])
+        merged = os.path.join(self.dir, 'results.csv')
+        store = ScoreStore()
+        self.assertEqual(merge([first, second], merged, store), names)
+        rows = list(csv.reader(open(merged, 'rb'), delimiter='\t'))
+        self.assertEqual([row[0] for row in rows], ['doc_id', '0', '1', '2', '3'])
+        self.assertEqual(rows[1][1], 'good\tday')
+        self.assertEqual(store.doc_ids, ['0', '1', '2', '3'])
+        self.assertEqual(store.gold_array().tolist(), [2, 0, -1, 1])
+        self.assertEqual(store.label_matrix().tolist(),
+                         [[2, 0, 2, 1], [ERROR, 0, 1, 0]])
+
+    def test_merge__different_analyzers(self):
+        first = self.write_results('a.csv', ['one'], [])
+        second = self.write_results('b.csv', ['two'], [])
+        self.assertRaises(ValueError, merge, [first, second],
+                          os.path.join(self.dir, 'results.csv'))
+
+    def test_run__finds_compare_from_any_directory(self):
+        mock_popen = Mock()
+        mock_popen.return_value.wait.return_value = 0
+        cwd = os.getcwd()
+        os.chdir(self.dir)
+        try:
+            with patch('shard.subprocess.Popen', mock_popen):
+                run('gold.txt', None, 2, 'hash', [])
+        finally:
+            os.chdir(cwd)
+        for args, _ in mock_popen.call_args_list:
+            script = args[0][1]
+            self.assertTrue(os.path.isabs(script))
+            self.assertTrue(os.path.exists(script))
+            self.assertEqual(os.path.basename(script), 'compare.py')
@@ -0,0 +1,82 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+import numpy as np
+
+import stats
+from stats import doc_outcomes, bootstrap, confidence_intervals, \
+    bootstrap_p_values, mcnemar_p_value, mcnemar, format_evaluation
+from scores import ScoreStore
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.gold = random.randint(0, 3, 2000).astype(np.int8)
+        noise = random.randint(0, 3, (2, 2000))
+        # the first analyzer is right 90% of the time, the second 60%
+        rates = np.array([[0.9], [0.6]])
+        self.labels = np.where(random.rand(2, 2000) < rates, self.gold,
+                               noise).astype(np.int8)
+
+    def test_doc_outcomes(self):
+        gold = np.array([2, 2, 1, -1, 0], dtype=np.int8)
+        labels = np.array([[2, 0, -1, 2, -2]], dtype=np.int8)
+        hits, errors, max_errors, evaluated = doc_outcomes(gold, labels)
+        self.assertEqual(hits.tolist(), [[True, False, False, False, False]])
+        self.assertEqual(errors.tolist(), [[0, 2, 0, 0, 0]])
+        self.assertEqual(max_errors.tolist(), [[2, 2, 1, 0, 0]])
+        self.assertEqual(evaluated.tolist(), [[True, True, True, True, False]])
+
+    def test_bootstrap(self):
+        accuracy, error_rate = bootstrap(self.gold, self.labels, 200, seed=1)
+        self.assertEqual(accuracy.shape, (200, 2))
+        lows, highs = confidence_intervals(accuracy)
+        hits = doc_outcomes(self.gold, self.labels)[0].mean(axis=1)
+        self.assertTrue(((lows < hits) & (hits < highs)).all())
+        self.assertTrue(bootstrap_p_values(accuracy)[0, 1] < 0.01)
+        self.assertTrue((error_rate[:, 0] < error_rate[:, 1]).all())
+
+    def test_bootstrap__drawing_documents(self):
+        # resampling documents one by one must agree with the multinomial
+        # over patterns of outcomes
+        expected = bootstrap(self.gold, self.labels, 500, seed=1)[0].mean(axis=0)
+        ratio = stats.MULTINOMIAL_RATIO
+        stats.MULTINOMIAL_RATIO = 10 ** 9
+        try:
+            actual = bootstrap(self.gold, self.labels, 500, seed=1)[0]
+        finally:
+            stats.MULTINOMIAL_RATIO = ratio
+        self.assertEqual(actual.shape, (500, 2))
+        np.testing.assert_allclose(actual.mean(axis=0), expected, atol=0.005)
+
+    def test_bootstrap__seed(self):
+        first = bootstrap(self.gold, self.labels, 120, seed=3)[0]
+        second = bootstrap(self.gold, self.labels, 120, seed=3)[0]
+        np.testing.assert_array_equal(first, second)
+
+    def test_bootstrap__no_documents(self):
+        gold = np.zeros(0, dtype=np.int8)
+        labels = np.zeros((2, 0), dtype=np.int8)
+        accuracy, error_rate = bootstrap(gold, labels, 100)
+        self.assertEqual(accuracy.shape, (100, 2))
+        self.assertTrue(np.isnan(accuracy).all())
+        self.assertTrue(np.isnan(error_rate).all())
+
+    def test_format_evaluation__no_documents(self):
+        self.assertEqual(format_evaluation(ScoreStore(['one', 'two'])),
+                         "No documents were evaluated")
+
+    def test_mcnemar_p_value(self):
+        self.assertEqual(mcnemar_p_value(0, 0), 1.0)
+        # exact: 2 * P(X <= 1) for X ~ Binomial(10, 0.5)
+        self.assertAlmostEqual(mcnemar_p_value(1, 9), 2 * 11 / 1024.0)
+        # chi-squared with continuity correction: (|40 - 20| - 1)^2 / 60
+        self.assertAlmostEqual(mcnemar_p_value(40, 20), 0.01417, places=4)
+
+    def test_mcnemar(self):
+        p_values = mcnemar(self.gold, self.labels)
+        self.assertEqual(p_values[0, 0], 1.0)
+        self.assertEqual(p_values[0, 1], p_values[1, 0])
+        self.assertTrue(p_values[0, 1] < 0.01)
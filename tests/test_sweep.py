@@ -0,0 +1,57 @@
+# -*- coding: UTF-8 -*-
+
+import unittest
+import numpy as np
+
+from sweep import sweep
+from scores import ScoreStore, LABEL_CODES
+
+
+def brute_force(scores, gold, low, high):
+    hits = errors = max_errors = 0
+    labels = dict((code, label) for label, code in LABEL_CODES.items())
+    for score, code in zip(scores, gold):
+        key = labels[code]
+        label = '+' if score > high else '-' if score < low else '0'
+        hits += label == key
+        if label != key:
+            errors += 1 if '0' in (label, key) else 2
+        max_errors += 1 if key == '0' else 2
+    return hits / float(len(scores)), errors / float(max_errors)
+
+
+class TestCase(unittest.TestCase):
+
+    def test_sweep__matches_labelling_each_document(self):
+        rnd = np.random.RandomState(0)
+        scores = rnd.uniform(-1, 1, 200).astype(np.float32)
+        gold = rnd.randint(0, 3, 200).astype(np.int8)
+        grid = np.linspace(-1, 1, 21)
+        accuracy, error_rate = sweep(scores, gold, grid, grid)
+        for i, low in enumerate(grid):
+            for j, high in enumerate(grid):
+                if low > high:
+                    self.assertTrue(np.isnan(accuracy[i, j]))
+                    continue
+                exp_accuracy, exp_error_rate = brute_force(scores, gold, low, high)
+                self.assertAlmostEqual(accuracy[i, j], exp_accuracy)
+                self.assertAlmostEqual(error_rate[i, j], exp_error_rate)
+
+    def test_sweep__leaves_out_missing_scores(self):
+        scores = np.array([0.5, np.nan, -0.5], dtype=np.float32)
+        gold = np.array([2, 0, 0], dtype=np.int8)
+        accuracy, error_rate = sweep(scores, gold, np.array([0.0]), np.array([0.0]))
+        self.assertEqual(accuracy[0, 0], 1.0)
+        self.assertEqual(error_rate[0, 0], 0.0)
+
+    def test_score_store(self):
+        store = ScoreStore(['one'])
+        store.add_doc(0, '+')
+        store.add_doc(1, '0')
+        store.set_output(0, 'one', '+', 0.5)
+        store.set_output(1, 'two', '-')
+        self.assertEqual(store.gold_array().tolist(), [2, 1])
+        self.assertEqual(store.label_matrix().tolist(), [[2, -1], [-1, 0]])
+        scores = store.score_matrix()
+        self.assertEqual(scores[0, 0], 0.5)
+        self.assertTrue(np.isnan(scores[1]).all())
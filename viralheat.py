@@ -1,12 +1,17 @@
-import urllib, urllib2, json
 import logging
-import time
+from api import API
 
 
 LOGGER = logging.getLogger('APICompare.Viralheat')
 
 
-class Viralheat:
+class Viralheat(API):
+
+    concurrency = 1
+    # the API allows 1 call per 5 seconds
+    rate_limit = (1, 5)
+    # the API allows max 360 char long texts
+    max_length = 360
 
     def __init__(self, api_key):
         self.name = 'viralheat'
@@ -26,19 +31,37 @@ class Viralheat:
         else:
             return '0'
 
-    def analyse(self, text):
+    def score_label(self, score):
+        """Given the raw score returned by analyse_with_score, output the
+        label
+        """
+        if score >= 0.1:
+            return '+'
+        elif score <= -0.1:
+            return '-'
+        else:
+            return '0'
+
+    def analyse_with_score(self, text):
         """Assign the sentiment label for the text.
         :return label: +, -, or 0
+        :return score: the raw score the label is based on, the probability of the mood,
+        negative for the negative mood and 0 for the neutral one
         """
-        # the API allows 1 call per 5 seconds
-        time.sleep(5)
-        # the API allows max 360 char long texts
-        if len(text) > 360:
-            LOGGER.warning('The input text is over the 360 char limit, truncated')
-            text = text[360:]
+        # longer texts are split into chunks by the scheduler, see chunking.py
+        if len(text) > self.max_length:
+            LOGGER.warning('The input text is over the %d char limit, '
+                           'truncated' % self.max_length)
+            text = text[:self.max_length]
         params = {'text': text, 'api_key': self.api_key}
-        request = urllib2.Request(self.url, urllib.urlencode(params))
-        response = urllib2.urlopen(request)
-        data = json.loads(response.read())
+        data = self.get_data(params, text=text)
         LOGGER.debug('Got response %r' % data)
-        return self.extract_label(data['mood'], data['prob'])
+        label = self.extract_label(data['mood'], data['prob'])
+        mood = data['mood'].replace("'", "")
+        if mood == 'positive':
+            score = data['prob']
+        elif mood == 'negative':
+            score = -data['prob']
+        else:
+            score = 0.0
+        return label, score